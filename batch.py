@@ -0,0 +1,212 @@
+# batch.py – chạy pipeline rectify → OCR → dịch cho cả thư mục ảnh, không cần Qt
+#
+#   python batch.py scans/ -o out/ --workers 4 --io-workers 8
+#
+# Ảnh đã có đủ artifact (_boxes.json / _vi.txt / _en.txt) sẽ được bỏ qua,
+# nên có thể chạy lại sau khi bị ngắt giữa chừng. Mọi artifact được ghi qua
+# file tạm + `os.replace` (`blocks.atomic_write`) nên không có file ghi dở.
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from blocks import atomic_write, boxes_path, read_boxes, write_boxes
+from config import CONFIG
+from layout import page_text
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"}
+
+
+# ----------------------------------------------------------------------
+# Tên file artifact – cùng quy ước với OCRTab
+# ----------------------------------------------------------------------
+def artifact_paths(img_path: Path) -> dict[str, Path]:
+    base = img_path.with_suffix("")
+    return {
+        "boxes": boxes_path(img_path),
+        "vi": base.with_name(base.name + "_" + CONFIG.vi_filename),
+        "en": base.with_name(base.name + "_" + CONFIG.en_filename),
+    }
+
+
+# ----------------------------------------------------------------------
+# Stage 1 – rectify (CPU-bound, chạy trong process pool)
+# ----------------------------------------------------------------------
+def _rectify_one(src: str, dst: str, rectify: bool = True) -> str:
+    import cv2
+    import numpy as np
+    from ui.document_cropper import rectify_to_a4
+
+    img = cv2.imread(src)
+    if img is None:
+        raise RuntimeError(f"Không đọc được ảnh {src}")
+
+    def write_jpeg(tmp: Path):
+        if not cv2.imwrite(str(tmp), img, [int(cv2.IMWRITE_JPEG_QUALITY), CONFIG.jpeg_quality]):
+            raise RuntimeError(f"Không ghi được {dst}")
+
+    dst_path = Path(dst)
+    if rectify:
+        img, H = rectify_to_a4(img)
+        atomic_write(dst_path.with_name(dst_path.stem + "_H.npy"), lambda tmp: np.save(tmp, H))
+    # ảnh đích ghi sau cùng: có file = rectify đã xong
+    atomic_write(dst_path, write_jpeg)
+    return dst
+
+
+# ----------------------------------------------------------------------
+# Stage 2 – OCR + dịch (I/O-bound, asyncio + services, giới hạn số trang đồng thời)
+# ----------------------------------------------------------------------
+async def _ocr_translate_one(img_path: Path, translate: bool) -> None:
+    # import muộn: process con của stage 1 không cần tạo client Vision/Groq
+    from services import groq_service, vision_service
+
+    paths = artifact_paths(img_path)
+    if paths["boxes"].exists():
+        # OCR đã chạy ở lần trước – không gọi lại Vision
+        blocks = read_boxes(img_path)
+    else:
+        content = await asyncio.to_thread(img_path.read_bytes)
+        blocks, _ = await vision_service().ocr_layout(content)
+        await asyncio.to_thread(write_boxes, img_path, blocks)
+
+    vi_text = page_text(blocks.box, blocks.texts(), h_ref=blocks.glyph_height() or None)
+    _write_text(paths["vi"], vi_text)
+
+    if translate and vi_text.strip():
+        # dịch theo dòng để tận dụng bộ nhớ dịch (TM) giữa các trang
+        en_lines = await groq_service().translate_blocks(vi_text.split("\n"))
+        _write_text(paths["en"], "\n".join(en_lines))
+
+
+def _write_text(path: Path, text: str) -> None:
+    atomic_write(path, lambda tmp: tmp.write_text(text, encoding="utf-8"))
+
+
+def _is_done(img_path: Path, translate: bool) -> bool:
+    paths = artifact_paths(img_path)
+    need = ["boxes", "vi"] + (["en"] if translate else [])
+    return all(paths[k].exists() for k in need)
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+def output_stems(sources: list[Path]) -> dict[Path, str]:
+    """Tên artifact của từng ảnh: `a.png` → "a"; trùng tên khác đuôi (`a.png` +
+    `a.jpg`) thì thêm đuôi gốc ("a_png", "a_jpg") để không ghi đè lên nhau."""
+    by_stem: dict[str, list[Path]] = {}
+    for src in sources:
+        by_stem.setdefault(src.stem.casefold(), []).append(src)
+    out = {}
+    for group in by_stem.values():
+        for src in group:
+            out[src] = src.stem if len(group) == 1 else f"{src.stem}_{src.suffix.lstrip('.')}"
+    seen: dict[str, Path] = {}
+    for src, stem in out.items():
+        other = seen.setdefault(stem.casefold(), src)
+        if other is not src:
+            raise ValueError(f"{other.name} và {src.name} cho ra cùng file output {stem}.jpg")
+    return out
+
+
+def run_batch(
+    src_dir: Path,
+    out_dir: Path,
+    *,
+    workers: int | None = None,
+    io_workers: int = 4,
+    translate: bool = True,
+    rectify: bool = True,
+) -> dict:
+    """Chạy cả pipeline cho mọi ảnh trong `src_dir`; trả về thống kê."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sources = sorted(p for p in src_dir.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    stats = {"total": len(sources), "skipped": 0, "done": 0, "failed": 0}
+
+    t0 = time.perf_counter()
+    pending: list[tuple[Path, Path]] = []
+    for src, stem in output_stems(sources).items():
+        dst = out_dir / (stem + ".jpg")
+        if _is_done(dst, translate):
+            stats["skipped"] += 1
+        else:
+            pending.append((src, dst))
+    logging.info("%d ảnh, %d đã xong – còn %d", len(sources), stats["skipped"], len(pending))
+
+    with ProcessPoolExecutor(max_workers=workers) as cpu_pool:
+        asyncio.run(_run_pages(pending, cpu_pool, io_workers, translate, rectify, stats, t0))
+
+    elapsed = time.perf_counter() - t0
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["pages_per_min"] = round(stats["done"] / elapsed * 60, 2) if elapsed > 0 else 0.0
+    return stats
+
+
+async def _run_pages(pending, cpu_pool, io_workers, translate, rectify, stats, t0) -> None:
+    loop = asyncio.get_running_loop()
+    io_sem = asyncio.Semaphore(io_workers)
+
+    async def one(src: Path, dst: Path):
+        # Stage 1: rectify trong process pool; ảnh đã rectify từ lần trước thì dùng lại
+        if not dst.exists():
+            try:
+                await loop.run_in_executor(cpu_pool, _rectify_one, str(src), str(dst), rectify)
+            except Exception as e:
+                logging.warning("Rectify lỗi %s: %s", src.name, e)
+                stats["failed"] += 1
+                return
+        # Stage 2 bắt đầu ngay khi từng trang rectify xong
+        async with io_sem:
+            try:
+                await _ocr_translate_one(dst, translate)
+            except Exception as e:
+                logging.warning("OCR/dịch lỗi %s: %s", dst.name, e)
+                stats["failed"] += 1
+                return
+        stats["done"] += 1
+        _log_progress(stats, len(pending), t0)
+
+    await asyncio.gather(*(one(src, dst) for src, dst in pending))
+
+
+def _log_progress(stats: dict, n_pending: int, t0: float) -> None:
+    elapsed = time.perf_counter() - t0
+    rate = stats["done"] / elapsed * 60 if elapsed > 0 else 0.0
+    logging.info("[%d/%d] %.1f trang/phút", stats["done"] + stats["failed"], n_pending, rate)
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Batch rectify → OCR → translate")
+    ap.add_argument("src", type=Path, help="thư mục ảnh chụp/scan")
+    ap.add_argument("-o", "--out", type=Path, default=None,
+                    help="thư mục output (mặc định: <src>/out)")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="số process rectify (mặc định: số CPU)")
+    ap.add_argument("--io-workers", type=int, default=4,
+                    help="số trang OCR/dịch chạy đồng thời")
+    ap.add_argument("--no-translate", action="store_true", help="chỉ OCR, không dịch")
+    ap.add_argument("--no-rectify", action="store_true",
+                    help="ảnh đầu vào đã là trang A4 phẳng (scan)")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s %(levelname)s: %(message)s")
+    stats = run_batch(
+        args.src,
+        args.out or args.src / "out",
+        workers=args.workers,
+        io_workers=args.io_workers,
+        translate=not args.no_translate,
+        rectify=not args.no_rectify,
+    )
+    logging.info("Xong %(done)d / %(total)d trang (bỏ qua %(skipped)d, lỗi %(failed)d) "
+                 "trong %(elapsed_s)ss – %(pages_per_min)s trang/phút", stats)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# benchmarks/bench_pdf.py – thời gian xuất PDF mỗi trang + bộ nhớ khi số trang tăng
+#
+#   python -m benchmarks.bench_pdf --pages 120
+#   python -m benchmarks.bench_pdf --pages 120 --no-background --font fonts/DejaVuSans.ttf
+#
+# Trang giả lập (ảnh A4 có chữ + ~400 block dịch); bộ nhớ đo bằng tracemalloc
+# (cấp phát Python/numpy) tại vài mốc trong lúc xuất.
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from blocks import BlockStore
+from pdf_export import ExportPage, PdfExporter
+from ui.document_cropper import A4_PX_PORTRAIT
+
+WORDS = "the contract is valid from signing date until both parties fulfil obligations".split()
+
+
+def synthetic_page(rng: np.random.Generator, img_path: Path) -> ExportPage:
+    w, h = A4_PX_PORTRAIT
+    img = np.full((h, w, 3), 235, np.uint8)
+    boxes, texts = [], []
+    for y in range(200, h - 200, 80):
+        x = 150
+        while x < w - 400:
+            word = WORDS[rng.integers(len(WORDS))]
+            bw = 28 * len(word)
+            cv2.putText(img, word, (x, y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (20, 20, 20), 3)
+            boxes.append([x, y, bw, 50])
+            texts.append(word)
+            x += bw + 30
+    cv2.imwrite(str(img_path), img, [int(cv2.IMWRITE_JPEG_QUALITY), 95])
+    return ExportPage(BlockStore(np.array(boxes), texts), (w, h), img_path)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="PDF export latency + memory")
+    ap.add_argument("--pages", type=int, default=100)
+    ap.add_argument("--font", type=Path, default=None, help="file TTF (mặc định: tự tìm)")
+    ap.add_argument("--no-background", action="store_true")
+    ap.add_argument("-o", "--out", type=Path, default=None)
+    args = ap.parse_args(argv)
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_pdf_"))
+    rng = np.random.default_rng(0)
+    # 1 ảnh nền dùng lại cho mọi trang (tạo ảnh không tính vào thời gian xuất)
+    template = synthetic_page(rng, tmp / "page.jpg")
+    out = args.out or tmp / "out.pdf"
+
+    marks = {1, args.pages // 4, args.pages // 2, args.pages}
+    tracemalloc.start()
+    ex = PdfExporter(out, background=not args.no_background, font=args.font)
+    print(f"{'page':>6}{'ms':>8}{'traced MB':>11}")
+    for n in range(1, args.pages + 1):
+        dt = ex.add_page(template)
+        if n in marks:
+            cur, _ = tracemalloc.get_traced_memory()
+            print(f"{n:>6}{dt * 1000:>8.1f}{cur / 1e6:>11.1f}")
+    st = ex.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{st['pages']} trang ({st['parts']} phần): {st['page_ms_avg']:.1f} ms/trang (max {st['page_ms_max']:.1f}), "
+          f"ghi file {st['save_ms']:.0f} ms, {st['bytes'] / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB")
+    print(f"→ {out}")
+
+
+if __name__ == "__main__":
+    main()
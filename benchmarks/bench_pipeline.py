@@ -0,0 +1,228 @@
+# benchmarks/bench_pipeline.py – đo từng stage của pipeline, không cần mạng/credentials
+#
+#   python -m benchmarks.bench_pipeline --synthetic 10
+#   python -m benchmarks.bench_pipeline captures/raw/*.jpg --latency-ms 400 --jitter-ms 100
+#   python -m benchmarks.bench_pipeline --synthetic 10 --error-rate 0.1 --compare old.json
+#   APP_BACKEND=record python -m benchmarks.bench_pipeline captures/raw/*.jpg   # ghi response thật
+#
+# Mặc định chạy với APP_BACKEND=replay (replay.py): Vision/Groq trả response đã
+# ghi trong recordings/, request chưa ghi thì dùng response giả lập. Kết quả
+# (median/p90 từng stage + số từng trang) ghi ra JSON để so sánh giữa các lần chạy.
+import os
+
+os.environ.setdefault("APP_BACKEND", "replay")      # trước khi import config
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import BACKEND, BASE_DIR, CONFIG
+
+STAGES = ["rectify", "encode", "vision", "parse", "load_layout", "gather", "translate"]
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+
+class Timer:
+    """Gom thời gian (ms) và số lỗi theo stage."""
+
+    def __init__(self):
+        self.ms: dict[str, list[float]] = {s: [] for s in STAGES}
+        self.errors: dict[str, int] = {s: 0 for s in STAGES}
+
+    def run(self, stage: str, row: dict, fn, *args, **kw):
+        t0 = time.perf_counter()
+        try:
+            res = fn(*args, **kw)
+        except Exception as e:
+            self.errors[stage] += 1
+            row[stage] = None
+            row.setdefault("errors", []).append(f"{stage}: {e}")
+            raise
+        dt = (time.perf_counter() - t0) * 1000
+        self.ms[stage].append(dt)
+        row[stage] = round(dt, 3)
+        return res
+
+    def summary(self) -> dict:
+        out = {}
+        for s in STAGES:
+            v = sorted(self.ms[s])
+            out[s] = {
+                "n": len(v),
+                "errors": self.errors[s],
+                "median_ms": round(statistics.median(v), 3) if v else None,
+                "p90_ms": round(v[min(len(v) - 1, int(0.9 * len(v)))], 3) if v else None,
+                "mean_ms": round(statistics.mean(v), 3) if v else None,
+                "max_ms": round(v[-1], 3) if v else None,
+            }
+        return out
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_page(name: str, img: np.ndarray, view, timer: Timer, granularity: str) -> dict:
+    from PyQt5.QtGui import QImage, QPixmap
+
+    from ocr import _annotate, parse_response
+    from preprocess import encode_for_upload
+    from translator import translate_blocks
+    from ui.document_cropper import rectify_to_a4
+
+    row: dict = {"name": name}
+    document = granularity != "word"
+    try:
+        try:
+            page, _ = timer.run("rectify", row, rectify_to_a4, img)
+        except RuntimeError:
+            page = img                      # không thấy khung trang: coi như ảnh scan phẳng
+        upload, scale = timer.run("encode", row, encode_for_upload, page)
+        resp = timer.run("vision", row, _annotate, upload, document)
+        blocks = timer.run("parse", row,
+                           lambda: parse_response(resp, document).scaled(1 / scale).grouped(granularity))
+        row["blocks"] = len(blocks)
+
+        h, w = page.shape[:2]
+        rgb = np.ascontiguousarray(page[:, :, ::-1]) if page.ndim == 3 else page
+        fmt = QImage.Format_RGB888 if page.ndim == 3 else QImage.Format_Grayscale8
+        pix = QPixmap.fromImage(QImage(rgb.data, w, h, rgb.strides[0], fmt))
+        timer.run("load_layout", row, view.load_layout, blocks, (w, h), None, background=pix)
+        timer.run("gather", row, view.gather_text_lines)
+        timer.run("translate", row, translate_blocks, blocks.texts(), tm=None)
+    except Exception:
+        pass                                # đã ghi vào row["errors"]; trang sau vẫn chạy
+    return row
+
+
+def load_samples(paths: list[Path], n_synthetic: int) -> list[tuple[str, np.ndarray]]:
+    from benchmarks.bench_rectify import synthetic_photo
+
+    samples = []
+    for p in paths:
+        img = cv2.imread(str(p))
+        if img is None:
+            print(f"bỏ qua {p} (không đọc được)")
+            continue
+        samples.append((p.name, img))
+    rng = np.random.default_rng(0)
+    for i in range(n_synthetic):
+        samples.append((f"synthetic-{i}", synthetic_photo(rng)[0]))
+    return samples
+
+
+def compare(cur: dict, prev_path: Path) -> None:
+    prev = json.loads(prev_path.read_text(encoding="utf-8"))
+    print(f"\nso với {prev_path.name} ({prev['meta'].get('commit')}, {prev['meta']['time']}):")
+    print(f"{'stage':<13}{'before':>10}{'after':>10}{'Δ':>9}")
+    for s in STAGES:
+        a = prev["stages"].get(s, {}).get("median_ms")
+        b = cur["stages"][s]["median_ms"]
+        if a is None or b is None:
+            continue
+        d = (b - a) / a * 100 if a else 0.0
+        print(f"{s:<13}{a:>10.2f}{b:>10.2f}{d:>+8.1f}%")
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Offline per-stage pipeline benchmark")
+    ap.add_argument("images", nargs="*", type=Path)
+    ap.add_argument("--synthetic", type=int, default=0, help="thêm N ảnh chụp giả lập")
+    ap.add_argument("--rounds", type=int, default=1, help="chạy lại cả bộ ảnh N lần")
+    ap.add_argument("--granularity", default=CONFIG.ocr_granularity,
+                    choices=["word", "line", "paragraph"])
+    ap.add_argument("--latency-ms", type=float, default=CONFIG.replay_latency_ms)
+    ap.add_argument("--jitter-ms", type=float, default=CONFIG.replay_jitter_ms)
+    ap.add_argument("--error-rate", type=float, default=CONFIG.replay_error_rate)
+    ap.add_argument("--strict", action="store_true",
+                    help="request chưa ghi → lỗi thay vì response giả lập")
+    ap.add_argument("-o", "--out", type=Path, default=None,
+                    help="file JSON kết quả (mặc định: benchmarks/results/pipeline-<thời gian>.json)")
+    ap.add_argument("--compare", type=Path, help="file JSON của lần chạy trước")
+    args = ap.parse_args(argv)
+
+    samples = load_samples(args.images, args.synthetic)
+    if not samples:
+        ap.error("cần ít nhất 1 ảnh hoặc --synthetic N")
+
+    import replay
+    settings = replay.configure(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                error_rate=args.error_rate,
+                                on_miss="error" if args.strict else "synthetic")
+
+    from PyQt5.QtWidgets import QApplication
+    from translator import POLICY
+    from ui.layout_view import LayoutView
+
+    app = QApplication.instance() or QApplication([])
+    view = LayoutView(editable=False)
+    view.resize(800, 1100)
+
+    timer = Timer()
+    pages = []
+    for r in range(args.rounds):
+        for name, img in samples:
+            row = run_page(name, img, view, timer, args.granularity)
+            row["round"] = r
+            pages.append(row)
+            app.processEvents()
+
+    result = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "backend": BACKEND,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "granularity": args.granularity,
+            "rounds": args.rounds,
+            "images": len(samples),
+            "replay": vars(settings),
+            "recordings": {"hits": replay.STORE.hits, "misses": replay.STORE.misses},
+            "config": {k: getattr(CONFIG, k) for k in (
+                "max_ocr_side", "ocr_grayscale", "ocr_upload_quality", "rectify_detect_side",
+                "rectify_gray", "translate_protocol", "translate_chunk_tokens",
+                "translate_concurrency")},
+        },
+        "stages": timer.summary(),
+        "models": POLICY.snapshot(),
+        "pages": pages,
+    }
+
+    print(f"{len(samples)} ảnh × {args.rounds} vòng, backend {BACKEND} "
+          f"(bản ghi: {replay.STORE.hits} hit / {replay.STORE.misses} miss)")
+    print(f"{'stage':<13}{'n':>5}{'err':>5}{'median ms':>11}{'p90 ms':>9}{'max ms':>9}")
+    for s, st in result["stages"].items():
+        if st["n"]:
+            print(f"{s:<13}{st['n']:>5}{st['errors']:>5}{st['median_ms']:>11.2f}"
+                  f"{st['p90_ms']:>9.2f}{st['max_ms']:>9.2f}")
+        else:
+            print(f"{s:<13}{0:>5}{st['errors']:>5}{'-':>11}{'-':>9}{'-':>9}")
+
+    out = args.out or RESULTS_DIR / f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"→ {out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
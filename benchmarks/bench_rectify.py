@@ -0,0 +1,123 @@
+# benchmarks/bench_rectify.py – rectify_to_a4: dò trên ảnh gốc vs pyramid + sub-pixel
+#
+#   python -m benchmarks.bench_rectify captures/raw/*.jpg
+#   python -m benchmarks.bench_rectify captures/raw/*.jpg --gt corners.json
+#   python -m benchmarks.bench_rectify --synthetic 20          # ảnh giả lập, biết sẵn 4 góc
+#
+# corners.json: {"<tên file>": [[x, y] × 4 theo TL, TR, BR, BL], ...}
+# Không có ground truth → sai số góc tính so với cách cũ (dò trên ảnh gốc).
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ui.document_cropper import A4_PX_PORTRAIT, rectify_to_a4
+
+VARIANTS = [
+    # (tên, detect_side, subpix, gray)
+    ("full-res (cũ)", 0, False, False),
+    ("pyr1024+subpix", 1024, True, False),
+    ("pyr512+subpix", 512, True, False),
+    ("pyr1024+subpix-gray", 1024, True, True),
+]
+
+
+def synthetic_photo(rng: np.random.Generator, size=(2048, 1536)) -> tuple[np.ndarray, np.ndarray]:
+    """Trang A4 có chữ, chiếu phối cảnh ngẫu nhiên lên nền tối; trả về (ảnh, 4 góc thật)."""
+    pw, ph = A4_PX_PORTRAIT[0] // 2, A4_PX_PORTRAIT[1] // 2
+    page = np.full((ph, pw, 3), 235, np.uint8)
+    for y in range(120, ph - 80, 36):
+        cv2.putText(page, "Lorem ipsum dolor sit amet 0123", (80, y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (20, 20, 20), 2, cv2.LINE_AA)
+
+    W, H = size
+    cx, cy = W / 2, H / 2
+    half_h = H * rng.uniform(0.36, 0.44)
+    half_w = half_h * pw / ph
+    base = np.array([[cx - half_w, cy - half_h], [cx + half_w, cy - half_h],
+                     [cx + half_w, cy + half_h], [cx - half_w, cy + half_h]])
+    corners = (base + rng.normal(0, H * 0.025, (4, 2))).astype(np.float32)
+
+    src = np.array([[0, 0], [pw - 1, 0], [pw - 1, ph - 1], [0, ph - 1]], np.float32)
+    M = cv2.getPerspectiveTransform(src, corners)
+    bg = np.full((H, W, 3), 50, np.uint8)
+    img = cv2.warpPerspective(page, M, (W, H), dst=bg, borderMode=cv2.BORDER_TRANSPARENT)
+    img = cv2.GaussianBlur(img, (3, 3), 0.8)
+    noise = rng.normal(0, 4, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8), corners
+
+
+def corners_of(H: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """4 góc ảnh gốc mà homography H đã dùng (ngược từ khung ảnh warp)."""
+    h, w = shape[:2]
+    dst = np.array([[[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]]], np.float32)
+    return cv2.perspectiveTransform(dst, np.linalg.inv(H))[0]
+
+
+def run(img: np.ndarray, side: int, subpix: bool, gray: bool, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        warped, H = rectify_to_a4(img, detect_side=side, subpix=subpix, gray=gray)
+        times.append(time.perf_counter() - t0)
+    return min(times), corners_of(H, warped.shape)
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Rectify latency + corner error")
+    ap.add_argument("images", nargs="*", type=Path)
+    ap.add_argument("--gt", type=Path, help="JSON 4 góc thật theo tên file")
+    ap.add_argument("--synthetic", type=int, default=0, help="thêm N ảnh giả lập")
+    ap.add_argument("--repeat", type=int, default=3, help="lấy thời gian nhỏ nhất của N lần")
+    args = ap.parse_args(argv)
+
+    gt = json.loads(args.gt.read_text()) if args.gt else {}
+    samples = []                               # (tên, ảnh, góc thật | None)
+    for p in args.images:
+        img = cv2.imread(str(p))
+        if img is None:
+            print(f"bỏ qua {p} (không đọc được)")
+            continue
+        ref = gt.get(p.name)
+        samples.append((p.name, img, np.array(ref, np.float32) if ref else None))
+    rng = np.random.default_rng(0)
+    for i in range(args.synthetic):
+        img, ref = synthetic_photo(rng)
+        samples.append((f"synthetic-{i}", img, ref))
+    if not samples:
+        ap.error("cần ít nhất 1 ảnh hoặc --synthetic N")
+
+    rows: dict[str, list[tuple[float, float]]] = {v[0]: [] for v in VARIANTS}
+    failed: dict[str, int] = {v[0]: 0 for v in VARIANTS}
+    for name, img, ref in samples:
+        results = {}
+        for vname, side, subpix, gray in VARIANTS:
+            try:
+                results[vname] = run(img, side, subpix, gray, args.repeat)
+            except RuntimeError:
+                failed[vname] += 1
+        base = results.get(VARIANTS[0][0])
+        truth = ref if ref is not None else (base[1] if base else None)
+        for vname, (dt, corners) in results.items():
+            err = float(np.linalg.norm(corners - truth, axis=1).max()) if truth is not None else float("nan")
+            rows[vname].append((dt, err))
+
+    n_gt = sum(ref is not None for *_, ref in samples)
+    print(f"{len(samples)} ảnh ({n_gt} có ground truth; còn lại so với cách cũ)")
+    print(f"{'variant':<22}{'median ms':>10}{'max ms':>9}{'err px':>9}{'max err':>9}{'fail':>6}")
+    for vname, res in rows.items():
+        if not res:
+            print(f"{vname:<22}{'-':>10}{'-':>9}{'-':>9}{'-':>9}{failed[vname]:>6}")
+            continue
+        ms = [r[0] * 1000 for r in res]
+        errs = [r[1] for r in res]
+        print(f"{vname:<22}{statistics.median(ms):>10.1f}{max(ms):>9.1f}"
+              f"{statistics.mean(errs):>9.2f}{max(errs):>9.2f}{failed[vname]:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# benchmarks/bench_startup.py – thời gian khởi động app + chi phí import từng module
+#
+#   python -m benchmarks.bench_startup
+#   python -m benchmarks.bench_startup --runs 5 --top 30
+#   python -m benchmarks.bench_startup --target ocr --target translator
+#
+# Mỗi lần đo chạy 1 process Python mới (cache import của process hiện tại không
+# ảnh hưởng). Chi phí import lấy từ `python -X importtime`: "self" là thời gian
+# của riêng module, "cumulative" gồm cả các module nó kéo theo. Bảng gộp theo
+# package gốc (cv2, numpy, PyQt5, google…) cho biết ai chiếm phần lớn thời gian.
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from config import BASE_DIR
+
+# đo trong process con: import → QApplication → MainWindow → show + 1 vòng event
+_WINDOW_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import logging
+logging.disable(logging.CRITICAL)
+from PyQt5.QtWidgets import QApplication
+from ui.main_window import MainWindow
+t1 = time.perf_counter()
+app = QApplication([])
+win = MainWindow()
+t2 = time.perf_counter()
+import json, sys
+heavy = ("google.cloud.vision", "groq", "matplotlib", "reportlab")
+loaded = [m for m in heavy if m in sys.modules]     # trước event loop (warm-up nạp sau đó)
+win.show()
+app.processEvents()
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "construct_ms": (t2 - t1) * 1000,
+                  "shown_ms": (t3 - t0) * 1000, "loaded": loaded}))
+win.close()
+from PyQt5.QtCore import QThreadPool
+QThreadPool.globalInstance().waitForDone()      # warm-up client/webcam chạy nền
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BASE_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_times(target: str) -> list[tuple[str, int, int, int]]:
+    """[(module, độ sâu, self µs, cumulative µs)] khi import `target` trong process mới."""
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                         cwd=BASE_DIR, env=_child_env(), capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(f"import {target} lỗi:\n{res.stderr[-2000:]}")
+    rows = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cum_us, name = int(parts[0]), int(parts[1]), parts[2]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((name.strip(), depth, self_us, cum_us))
+    return rows
+
+
+def by_package(rows) -> dict[str, int]:
+    out: dict[str, int] = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        out[name.split(".")[0]] += self_us
+    return dict(out)
+
+
+def window_times(runs: int) -> list[dict]:
+    out = []
+    for _ in range(runs):
+        res = subprocess.run([sys.executable, "-c", _WINDOW_SCRIPT], cwd=BASE_DIR,
+                             env=_child_env(), capture_output=True, text=True)
+        if res.returncode != 0:
+            raise RuntimeError(f"MainWindow lỗi:\n{res.stderr[-2000:]}")
+        out.append(json.loads(res.stdout.strip().splitlines()[-1]))
+    return out
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Startup time + per-module import cost")
+    ap.add_argument("--target", action="append",
+                    help="module cần đo import (mặc định: ui.main_window)")
+    ap.add_argument("--runs", type=int, default=3, help="số lần đo thời gian hiện cửa sổ")
+    ap.add_argument("--top", type=int, default=20, help="số dòng mỗi bảng")
+    ap.add_argument("--no-window", action="store_true", help="chỉ đo import")
+    ap.add_argument("-o", "--out", type=Path, help="ghi kết quả ra file JSON")
+    args = ap.parse_args(argv)
+
+    result: dict = {"imports": {}}
+    for target in args.target or ["ui.main_window"]:
+        rows = import_times(target)
+        total = sum(r[2] for r in rows)
+        pkgs = sorted(by_package(rows).items(), key=lambda kv: -kv[1])
+        result["imports"][target] = {
+            "total_ms": round(total / 1000, 1),
+            "packages_ms": {k: round(v / 1000, 1) for k, v in pkgs},
+            "modules": [{"module": n, "depth": d, "self_ms": round(s / 1000, 2),
+                         "cumulative_ms": round(c / 1000, 2)} for n, d, s, c in rows],
+        }
+
+        print(f"\nimport {target}: {total / 1000:.0f} ms, {len(rows)} module")
+        print(f"{'package':<28}{'self ms':>9}{'%':>7}")
+        for name, us in pkgs[:args.top]:
+            print(f"{name:<28}{us / 1000:>9.1f}{100 * us / total:>6.1f}%")
+        print(f"\n{'module':<44}{'self ms':>9}{'cum ms':>9}")
+        for name, _, s, c in sorted(rows, key=lambda r: -r[3])[:args.top]:
+            print(f"{name:<44}{s / 1000:>9.1f}{c / 1000:>9.1f}")
+
+    if not args.no_window:
+        runs = window_times(max(1, args.runs))
+        med = {k: round(statistics.median(r[k] for r in runs), 1)
+               for k in ("import_ms", "construct_ms", "shown_ms")}
+        result["window"] = {"runs": runs, "median": med}
+        print(f"\nMainWindow ({len(runs)} lần, median): import {med['import_ms']:.0f} ms, "
+              f"dựng cửa sổ {med['construct_ms']:.0f} ms, hiện sau {med['shown_ms']:.0f} ms")
+        loaded = sorted({m for r in runs for m in r["loaded"]})
+        print("SDK nặng đã nạp lúc khởi động: " + (", ".join(loaded) if loaded else "không"))
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"→ {args.out}")
+
+
+if __name__ == "__main__":
+    main()
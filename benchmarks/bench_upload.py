@@ -0,0 +1,73 @@
+# benchmarks/bench_upload.py – so sánh dung lượng upload và độ chính xác OCR
+#
+#   python -m benchmarks.bench_upload captures/*.jpg            # chỉ đo bytes / thời gian encode
+#   python -m benchmarks.bench_upload captures/*.jpg --ocr      # gọi Vision để đo độ chính xác
+#
+# Độ chính xác = F1 theo từ so với OCR ảnh gốc (không tiền xử lý).
+import argparse
+import time
+from collections import Counter
+from pathlib import Path
+
+from preprocess import encode_for_upload
+
+VARIANTS = [
+    # (tên, max_side, grayscale, normalize, quality)
+    ("2048-color-q85", 2048, False, False, 85),
+    ("2048-gray-q85", 2048, True, False, 85),
+    ("2048-gray-clahe-q85", 2048, True, True, 85),
+    ("1600-gray-q80", 1600, True, False, 80),
+    ("1280-gray-q75", 1280, True, False, 75),
+]
+
+
+def word_f1(ref: list[str], hyp: list[str]) -> float:
+    if not ref and not hyp:
+        return 1.0
+    common = sum((Counter(ref) & Counter(hyp)).values())
+    if common == 0:
+        return 0.0
+    p, r = common / len(hyp), common / len(ref)
+    return 2 * p * r / (p + r)
+
+
+def _ocr_words(upload: bytes) -> list[str]:
+    from ocr import _ocr_bytes
+    blocks, _ = _ocr_bytes(upload, "bench", use_cache=False, preprocess=False)
+    return blocks.texts()
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Upload bytes vs. OCR accuracy")
+    ap.add_argument("images", nargs="+", type=Path)
+    ap.add_argument("--ocr", action="store_true", help="gọi Vision để đo độ chính xác")
+    args = ap.parse_args(argv)
+
+    rows: dict[str, list[tuple[int, float, float | None]]] = {v[0]: [] for v in VARIANTS}
+    raw_total = 0
+    for img_path in args.images:
+        content = img_path.read_bytes()
+        raw_total += len(content)
+        ref = _ocr_words(content) if args.ocr else None
+
+        for name, side, gray, norm, q in VARIANTS:
+            t0 = time.perf_counter()
+            upload, _ = encode_for_upload(content, max_side=side, grayscale=gray,
+                                          normalize=norm, quality=q)
+            dt = time.perf_counter() - t0
+            f1 = word_f1(ref, _ocr_words(upload)) if args.ocr else None
+            rows[name].append((len(upload), dt, f1))
+
+    n = len(args.images)
+    print(f"{n} ảnh, gốc trung bình {raw_total / n / 1024:.0f} KB")
+    print(f"{'variant':<22}{'KB':>8}{'saved':>8}{'encode ms':>11}{'word F1':>9}")
+    for name, res in rows.items():
+        kb = sum(r[0] for r in res) / n / 1024
+        saved = 1 - sum(r[0] for r in res) / raw_total
+        ms = sum(r[1] for r in res) / n * 1000
+        f1 = f"{sum(r[2] for r in res) / n:.3f}" if args.ocr else "-"
+        print(f"{name:<22}{kb:>8.0f}{saved:>8.0%}{ms:>11.1f}{f1:>9}")
+
+
+if __name__ == "__main__":
+    main()
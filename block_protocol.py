@@ -0,0 +1,51 @@
+# block_protocol.py – giao thức dịch theo ID block (JSON Lines)
+#
+# Request  (mỗi dòng 1 block):  {"id": 12, "vi": "Họ và tên"}
+# Response (mỗi dòng 1 block):  {"id": 12, "en": "Full name"}
+#
+# Mỗi bản dịch đi kèm ID nên thiếu/hỏng 1 dòng chỉ ảnh hưởng đúng block đó,
+# không đẩy lệch các block phía sau như khi tách theo " ### ".
+import json
+
+PROMPT_HEADER = (
+    "Bạn là một dịch giả chuyên nghiệp cho các giấy tờ của bộ phận 1 cửa tại trung tâm hành chính công. "
+    "Dịch sang tiếng Anh chính xác và tự nhiên từng block dưới đây.\n"
+    "Input: mỗi dòng là một JSON object {\"id\": <số>, \"vi\": <tiếng Việt>}.\n"
+    "Output: mỗi dòng đúng một JSON object {\"id\": <cùng số>, \"en\": <tiếng Anh>}, "
+    "giữ nguyên id, đủ mọi id, không thêm giải thích hay markdown.\n\n"
+)
+
+
+def encode_request(items: dict[int, str]) -> str:
+    lines = (json.dumps({"id": i, "vi": txt}, ensure_ascii=False, separators=(",", ":"))
+             for i, txt in items.items())
+    return PROMPT_HEADER + "\n".join(lines)
+
+
+def parse_line(line: str, expected: set[int]) -> tuple[int, str] | None:
+    """Parse 1 dòng output; trả về (id, en) nếu hợp lệ, ngược lại None."""
+    line = line.strip().rstrip(",")
+    if not line.startswith("{"):
+        return None                       # ``` fence, lời dẫn, dòng trống…
+    try:
+        obj = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    bid, en = obj.get("id"), obj.get("en")
+    if isinstance(bid, str) and bid.isdigit():
+        bid = int(bid)
+    if not isinstance(bid, int) or bid not in expected or not isinstance(en, str):
+        return None
+    return bid, en.strip()
+
+
+def parse_response(text: str, expected: set[int]) -> dict[int, str]:
+    """Lấy các bản dịch hợp lệ theo ID; ID lạ, trùng hoặc thiếu đều bị bỏ qua."""
+    out: dict[int, str] = {}
+    for line in text.splitlines():
+        res = parse_line(line, expected)
+        if res and res[0] not in out:
+            out[res[0]] = res[1]
+    return out
@@ -0,0 +1,304 @@
+# blocks.py – kho block OCR dạng cột (NumPy) thay cho list[dict]
+from pathlib import Path
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class BlockStore:
+    """Các block OCR của 1 trang, lưu theo cột.
+
+    * `box`  : int32 (n, 4) – [x, y, w, h] theo pixel ảnh gốc
+    * `text` : object (n,)  – chuỗi
+    * `conf` : float32 (n,) – độ tin cậy Vision (NaN nếu không có)
+    * `line_id`, `par_id` : int32 (n,) – nhóm dòng / đoạn (-1 nếu không có)
+    * `words` : BlockStore cấp từ (con) khi store này là dòng/đoạn, ngược lại None
+
+    Lấy tập con bằng slice cho ra view (không copy); scale, lọc, median
+    chiều cao… đều là phép toán trên mảng.
+    """
+
+    __slots__ = ("box", "text", "conf", "line_id", "par_id", "words")
+
+    def __init__(self, box, text, conf=None, line_id=None, par_id=None, words=None):
+        n = len(text)
+        self.box = np.asarray(box, dtype=np.int32).reshape(n, 4)
+        self.text = np.asarray(text, dtype=object).reshape(n)
+        self.conf = (np.full(n, np.nan, np.float32) if conf is None
+                     else np.asarray(conf, dtype=np.float32))
+        self.line_id = (np.full(n, -1, np.int32) if line_id is None
+                        else np.asarray(line_id, dtype=np.int32))
+        self.par_id = (np.full(n, -1, np.int32) if par_id is None
+                       else np.asarray(par_id, dtype=np.int32))
+        self.words = words
+
+    # ------------------------------------------------------------------
+    # Dựng từ nguồn khác
+    # ------------------------------------------------------------------
+    @classmethod
+    def empty(cls) -> "BlockStore":
+        return cls(np.empty((0, 4), np.int32), [])
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "BlockStore":
+        """Từ list[dict] kiểu `_boxes.json` ({"text", "box": [x, y, w, h]})."""
+        if not records:
+            return cls.empty()
+        words = None
+        if any("words" in r for r in records):
+            words = cls.from_records([w for r in records for w in r.get("words", ())])
+        return cls(
+            [r["box"] for r in records],
+            [r["text"] for r in records],
+            conf=[r.get("conf", np.nan) for r in records],
+            line_id=[r.get("line", -1) for r in records],
+            par_id=[r.get("par", -1) for r in records],
+            words=words,
+        )
+
+    @classmethod
+    def from_polygons(cls, texts: list[str], polys: list[list[tuple[int, int]]],
+                      conf=None, line_id=None, par_id=None) -> "BlockStore":
+        """Từ đa giác 4 đỉnh (Vision bounding_poly) → box [x, y, w, h] (vector hoá)."""
+        if not texts:
+            return cls.empty()
+        pts = np.asarray(polys, dtype=np.int32).reshape(len(texts), -1, 2)
+        lo, hi = pts.min(axis=1), pts.max(axis=1)
+        return cls(np.hstack([lo, hi - lo]), texts, conf, line_id, par_id)
+
+    @classmethod
+    def concat(cls, parts: list["BlockStore"]) -> "BlockStore":
+        """Nối nhiều store; id dòng/đoạn của phần sau được đánh lại để không trùng."""
+        parts = [p for p in parts if len(p)]
+        if len(parts) <= 1:
+            return parts[0] if parts else cls.empty()
+        shifted, off = [], 0
+        for p in parts:
+            q = p._shift_ids(off)
+            off = max(off, q._max_id() + 1)
+            shifted.append(q)
+        return cls._stack(shifted)
+
+    @classmethod
+    def _stack(cls, parts: list["BlockStore"]) -> "BlockStore":
+        words = [p.words for p in parts if p.words is not None]
+        return cls(
+            np.concatenate([p.box for p in parts]),
+            np.concatenate([p.text for p in parts]),
+            np.concatenate([p.conf for p in parts]),
+            np.concatenate([p.line_id for p in parts]),
+            np.concatenate([p.par_id for p in parts]),
+            words=cls._stack(words) if words else None,
+        )
+
+    def _max_id(self) -> int:
+        m = max(self.line_id.max(initial=-1), self.par_id.max(initial=-1))
+        return int(max(m, self.words._max_id() if self.words is not None else -1))
+
+    def _shift_ids(self, off: int) -> "BlockStore":
+        if off == 0:
+            return self
+        return BlockStore(self.box, self.text, self.conf,
+                          np.where(self.line_id >= 0, self.line_id + off, -1),
+                          np.where(self.par_id >= 0, self.par_id + off, -1),
+                          words=self.words._shift_ids(off) if self.words is not None else None)
+
+    # ------------------------------------------------------------------
+    # Cột tiện dụng
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __getitem__(self, idx) -> "BlockStore":
+        """slice → view; mask/mảng chỉ số → bản sao nhỏ."""
+        if isinstance(idx, (int, np.integer)):
+            idx = slice(idx, idx + 1 if idx != -1 else None)
+        sub = BlockStore(self.box[idx], self.text[idx], self.conf[idx],
+                         self.line_id[idx], self.par_id[idx])
+        if self.words is not None:
+            sub.words = self.words[sub._child_mask(self.words)]
+        return sub
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.box[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.box[:, 1]
+
+    @property
+    def w(self) -> np.ndarray:
+        return self.box[:, 2]
+
+    @property
+    def h(self) -> np.ndarray:
+        return self.box[:, 3]
+
+    def texts(self) -> list[str]:
+        return [t.strip() for t in self.text]
+
+    def median_height(self, default: float = 0.0) -> float:
+        return float(np.median(self.h)) if len(self) else default
+
+    def glyph_height(self, default: float = 0.0) -> float:
+        """Chiều cao chữ: lấy theo từ con nếu có (box dòng/đoạn cao hơn chữ)."""
+        src = self.words if self.words is not None and len(self.words) else self
+        return src.median_height(default)
+
+    # ------------------------------------------------------------------
+    # Phân cấp từ → dòng → đoạn
+    # ------------------------------------------------------------------
+    def grouped(self, level: str) -> "BlockStore":
+        """Gom store cấp từ thành dòng ("line") hoặc đoạn ("paragraph").
+
+        Cần `line_id`/`par_id` (có từ `document_text_detection`); không có thì
+        trả về chính nó. Các từ được giữ lại làm `words` của store mới.
+        """
+        if level == "word" or not len(self) or (self.par_id < 0).all():
+            return self
+        key = self.line_id if level == "line" else self.par_id
+        order = np.argsort(key, kind="stable")
+        k = key[order]
+        starts = np.r_[0, np.nonzero(np.diff(k))[0] + 1]
+        ends = np.r_[starts[1:], len(k)]
+
+        b = self.box[order]
+        x1 = np.minimum.reduceat(b[:, 0], starts)
+        y1 = np.minimum.reduceat(b[:, 1], starts)
+        x2 = np.maximum.reduceat(b[:, 0] + b[:, 2], starts)
+        y2 = np.maximum.reduceat(b[:, 1] + b[:, 3], starts)
+        txt = self.text[order]
+        texts = [" ".join(t.strip() for t in txt[s:e] if t.strip())
+                 for s, e in zip(starts, ends)]
+        conf = np.add.reduceat(self.conf[order], starts) / (ends - starts)
+        line_id = k[starts] if level == "line" else None
+        return BlockStore(np.stack([x1, y1, x2 - x1, y2 - y1], axis=1), texts, conf,
+                          line_id, self.par_id[order][starts], words=self)
+
+    def _child_mask(self, words: "BlockStore") -> np.ndarray:
+        """Từ nào thuộc các dòng (line_id ≥ 0) hoặc đoạn (còn lại) của store này."""
+        is_line = self.line_id >= 0
+        return (np.isin(words.line_id, self.line_id[is_line])
+                | np.isin(words.par_id, self.par_id[~is_line]))
+
+    def children(self, i: int) -> "BlockStore":
+        """Các từ của block thứ `i` (rỗng nếu store là cấp từ)."""
+        if self.words is None:
+            return BlockStore.empty()
+        return self.words[self[i]._child_mask(self.words)]
+
+    # ------------------------------------------------------------------
+    # Biến đổi (trả về store mới, không sửa tại chỗ)
+    # ------------------------------------------------------------------
+    def scaled(self, sx: float, sy: float | None = None) -> "BlockStore":
+        sy = sx if sy is None else sy
+        if sx == 1.0 and sy == 1.0:
+            return self
+        f = np.array([sx, sy, sx, sy], dtype=np.float64)
+        return BlockStore(np.rint(self.box * f), self.text, self.conf,
+                          self.line_id, self.par_id,
+                          words=self.words.scaled(sx, sy) if self.words is not None else None)
+
+    def translated(self, dx: int, dy: int) -> "BlockStore":
+        """Dời toàn bộ box (và từ con) đi (dx, dy) pixel."""
+        return BlockStore(self.box + (dx, dy, 0, 0), self.text, self.conf,
+                          self.line_id, self.par_id,
+                          words=self.words.translated(dx, dy) if self.words is not None else None)
+
+    def with_text(self, texts) -> "BlockStore":
+        """Cùng hình học, text mới (vd. bản dịch) – không copy dict từng block."""
+        return BlockStore(self.box, list(texts), self.conf, self.line_id, self.par_id,
+                          words=self.words)
+
+    def overlap_ratio(self, rect: tuple[int, int, int, int]) -> np.ndarray:
+        """Tỉ lệ diện tích mỗi box nằm trong `rect` = (x, y, w, h)."""
+        rx, ry, rw, rh = rect
+        x, y, w, h = self.x, self.y, self.w, self.h
+        ix = np.clip(np.minimum(x + w, rx + rw) - np.maximum(x, rx), 0, None)
+        iy = np.clip(np.minimum(y + h, ry + rh) - np.maximum(y, ry), 0, None)
+        return ix * iy / np.maximum(1, w * h)
+
+    # ------------------------------------------------------------------
+    # Serialize
+    # ------------------------------------------------------------------
+    def to_records(self) -> list[dict]:
+        """list[dict] cho `_boxes.json` (giữ nguyên định dạng cũ)."""
+        out = []
+        has_conf = ~np.isnan(self.conf)
+        for i, (t, b) in enumerate(zip(self.text, self.box.tolist())):
+            rec = {"text": t, "box": b}
+            if has_conf[i]:
+                rec["conf"] = round(float(self.conf[i]), 4)
+            if self.line_id[i] >= 0:
+                rec["line"] = int(self.line_id[i])
+            if self.par_id[i] >= 0:
+                rec["par"] = int(self.par_id[i])
+            if self.words is not None:
+                rec["words"] = self.children(i).to_records()
+            out.append(rec)
+        return out
+
+    def _arrays(self, prefix: str = "") -> dict[str, np.ndarray]:
+        cols = {"box": self.box, "text": self.text.astype(str), "conf": self.conf,
+                "line_id": self.line_id, "par_id": self.par_id}
+        out = {prefix + k: v for k, v in cols.items()}
+        if self.words is not None:
+            out.update(self.words._arrays(prefix + "w_"))
+        return out
+
+    def save_npz(self, path: Path) -> None:
+        np.savez_compressed(path, **self._arrays())
+
+    @classmethod
+    def load_npz(cls, path: Path) -> "BlockStore":
+        with np.load(path, allow_pickle=False) as z:
+            return cls._from_arrays(z, "")
+
+    @classmethod
+    def _from_arrays(cls, z, prefix: str) -> "BlockStore":
+        words = cls._from_arrays(z, prefix + "w_") if prefix + "w_box" in z else None
+        return cls(z[prefix + "box"], z[prefix + "text"].tolist(), z[prefix + "conf"],
+                   z[prefix + "line_id"], z[prefix + "par_id"], words=words)
+
+
+# ----------------------------------------------------------------------
+# Artifact `<ảnh>_boxes.json` (+ bản nhị phân `<ảnh>_boxes.npz`)
+# ----------------------------------------------------------------------
+def boxes_path(img_path: Path, suffix: str = ".json") -> Path:
+    base = img_path.with_suffix("")
+    return base.with_name(f"{base.name}_boxes{suffix}")
+
+
+def atomic_write(path: Path, write) -> Path:
+    """`write(tmp)` ghi ra file tạm cùng thư mục (giữ đuôi file) rồi `os.replace`.
+
+    Bị ngắt giữa chừng thì không để lại file dở – batch coi file tồn tại là
+    stage đó đã xong.
+    """
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}-{threading.get_ident()}.tmp{path.suffix}")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def write_boxes(img_path: Path, blocks: BlockStore) -> None:
+    # .json (file batch dùng làm dấu "đã OCR") ghi sau cùng
+    atomic_write(boxes_path(img_path, ".npz"), blocks.save_npz)
+    data = json.dumps(blocks.to_records(), ensure_ascii=False, indent=2)
+    atomic_write(boxes_path(img_path), lambda tmp: tmp.write_text(data, encoding="utf-8"))
+
+
+def read_boxes(img_path: Path) -> BlockStore:
+    """Ưu tiên `.npz` (nhanh); không có thì đọc `.json` của các phiên bản cũ."""
+    npz = boxes_path(img_path, ".npz")
+    if npz.exists():
+        return BlockStore.load_npz(npz)
+    return BlockStore.from_records(
+        json.loads(boxes_path(img_path).read_text(encoding="utf-8")))
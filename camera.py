@@ -0,0 +1,188 @@
+# camera.py – đọc webcam trong thread riêng, GUI chỉ lấy frame mới nhất
+#
+# * Producer: cap.read() → xoay → thu nhỏ + BGR→RGB vào buffer cấp phát sẵn.
+# * Slot chỉ giữ frame mới nhất; GUI chậm thì frame cũ bị bỏ, không dồn hàng.
+# * 3 buffer preview xoay vòng: producer không bao giờ ghi vào buffer GUI
+#   đang đọc hoặc buffer mới nhất chưa được lấy.
+# * `analyze` (tuỳ chọn) chạy trên ảnh preview mỗi `analyze_every` frame, kết
+#   quả gắn vào các PreviewFrame sau đó (vd. dò khung trang).
+from dataclasses import dataclass
+from typing import Any, Callable
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+_ROT = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180,
+        270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+
+def rotate(frame: np.ndarray, deg: int) -> np.ndarray:
+    return frame if deg == 0 else cv2.rotate(frame, _ROT[deg])
+
+
+@dataclass
+class PreviewFrame:
+    rgb: np.ndarray          # (h, w, 3) uint8, C-contiguous – đưa thẳng vào QImage
+    t_capture: float         # perf_counter() lúc cap.read() trả về
+    seq: int
+    full_size: tuple[int, int]   # (w, h) frame gốc sau khi xoay
+    slot: int
+    scale: float = 1.0       # kích thước preview / frame gốc
+    info: Any = None         # kết quả `analyze` gần nhất
+
+
+class RateMeter:
+    """FPS trượt (EMA trên khoảng cách giữa 2 lần tick)."""
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.fps = 0.0
+        self._last = None
+
+    def tick(self, now: float):
+        if self._last is not None and now > self._last:
+            inst = 1.0 / (now - self._last)
+            self.fps = inst if self.fps == 0 else self.fps + self.alpha * (inst - self.fps)
+        self._last = now
+
+
+class FrameGrabber:
+    """Thread đọc webcam; `acquire_preview`/`release_preview` cho GUI, `latest_full` cho chụp."""
+
+    def __init__(self, cap: cv2.VideoCapture,
+                 analyze: Callable[[np.ndarray, float], Any] | None = None,
+                 analyze_every: int = CONFIG.detect_every_n):
+        self.cap = cap
+        self.analyze = analyze
+        self.analyze_every = max(1, analyze_every)
+        self._info = None
+        self.rotate_deg = 0
+        self._preview_size = (640, 480)   # khung tối đa (w, h) – giữ tỉ lệ
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._bufs: list[np.ndarray] = []
+        self._small: np.ndarray | None = None
+        self._latest: PreviewFrame | None = None
+        self._reading: int | None = None    # slot GUI đang đọc
+        self._full: np.ndarray | None = None
+        self._full_rot = 0                  # góc xoay đã áp cho `_full`
+        self._seq = 0
+        self.cam_rate = RateMeter()
+        self.read_ms = 0.0                  # thời gian cap.read() (EMA)
+        self._thread = threading.Thread(target=self._run, name="webcam", daemon=True)
+
+    # ------------------------------------------------------------------
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def set_preview_size(self, w: int, h: int):
+        with self._lock:
+            self._preview_size = (max(1, w), max(1, h))
+
+    # ------------------------------------------------------------------
+    # Producer
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            t = time.perf_counter()
+            self.read_ms += 0.1 * ((t - t0) * 1000 - self.read_ms)
+            if not ret:
+                time.sleep(0.01)
+                continue
+            self.cam_rate.tick(t)
+            deg = self.rotate_deg           # đọc 1 lần: GUI có thể đổi giữa chừng
+            frame = rotate(frame, deg)
+            try:
+                self._publish(frame, t, deg)
+            except Exception as e:          # pragma: no cover
+                logging.warning("Preview frame dropped: %s", e)
+
+    def _publish(self, frame: np.ndarray, t: float, deg: int = 0):
+        fh, fw = frame.shape[:2]
+        with self._lock:
+            bw, bh = self._preview_size
+            s = min(bw / fw, bh / fh, 1.0)
+            size = (max(1, round(fw * s)), max(1, round(fh * s)))
+            if not self._bufs or self._bufs[0].shape[:2] != (size[1], size[0]):
+                self._bufs = [np.empty((size[1], size[0], 3), np.uint8) for _ in range(3)]
+                self._small = np.empty((size[1], size[0], 3), np.uint8)
+                self._latest = None
+                self._reading = None
+            busy = {self._reading, self._latest.slot if self._latest else None}
+            slot = next(i for i in range(3) if i not in busy)
+            dst, small = self._bufs[slot], self._small
+
+        # ngoài lock: resize + đổi màu vào buffer có sẵn (không cấp phát mỗi frame)
+        cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=dst)
+        if self.analyze is not None and self._seq % self.analyze_every == 0:
+            self._info = self.analyze(small, t)
+
+        with self._lock:
+            self._seq += 1
+            self._full = frame
+            self._full_rot = deg
+            self._latest = PreviewFrame(dst, t, self._seq, (fw, fh), slot,
+                                        size[0] / fw, self._info)
+            self._new_frame.notify_all()
+
+    # ------------------------------------------------------------------
+    # Consumer (GUI thread)
+    # ------------------------------------------------------------------
+    def acquire_preview(self) -> PreviewFrame | None:
+        """Frame mới chưa hiển thị (hoặc None); dùng xong gọi `release_preview`."""
+        with self._lock:
+            f = self._latest
+            if f is None:
+                return None
+            self._reading = f.slot
+            self._latest = None             # slot này giờ thuộc GUI
+            return f
+
+    def release_preview(self):
+        with self._lock:
+            self._reading = None
+
+    def latest_full(self) -> np.ndarray | None:
+        """Frame gốc (đã xoay) mới nhất – producer không sửa lại mảng này."""
+        with self._lock:
+            return self._full
+
+    def grab_burst(self, n: int, timeout: float = 2.0) -> list[np.ndarray]:
+        """Frame gốc mới nhất + (n-1) frame kế tiếp; chặn cho tới khi đủ hoặc hết giờ.
+
+        Mọi frame trả về cùng góc xoay + kích thước: đổi góc giữa burst thì bỏ
+        các frame hướng cũ, gom lại từ frame đầu tiên theo hướng mới.
+        Không gọi từ GUI thread (mất ~n / fps giây).
+        """
+        out: list[np.ndarray] = []
+        kind = None
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            seq = self._seq
+            while True:
+                if self._full is not None:
+                    cur = (self._full_rot, self._full.shape)
+                    if cur != kind:
+                        out.clear()
+                        kind = cur
+                    out.append(self._full)
+                if len(out) >= n:
+                    break
+                left = deadline - time.monotonic()
+                if left <= 0 or not self._new_frame.wait_for(lambda: self._seq > seq, left):
+                    break
+                seq = self._seq
+        return out
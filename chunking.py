@@ -0,0 +1,28 @@
+# chunking.py – chia block OCR thành các request dịch theo ngân sách token
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token (≈ 3 ký tự/token cho tiếng Việt có dấu)."""
+    return max(1, (len(text) + 2) // 3)
+
+
+def pack_chunks(texts: list[str], budget: int, sep_tokens: int = 2) -> list[list[int]]:
+    """Gom các block liên tiếp thành chunk có tổng token ≤ `budget`.
+
+    Giữ nguyên thứ tự block (block cạnh nhau thường cùng ngữ cảnh).
+    Block nào một mình đã vượt ngân sách thì đứng riêng 1 chunk.
+    Trả về list chỉ số block của từng chunk.
+    """
+    chunks: list[list[int]] = []
+    cur: list[int] = []
+    cur_tok = 0
+    for i, txt in enumerate(texts):
+        tok = estimate_tokens(txt) + sep_tokens
+        if cur and cur_tok + tok > budget:
+            chunks.append(cur)
+            cur, cur_tok = [], 0
+        cur.append(i)
+        cur_tok += tok
+    if cur:
+        chunks.append(cur)
+    return chunks
@@ -9,19 +9,81 @@ load_dotenv()
 BASE_DIR = Path(__file__).resolve().parent
 CAPTURE_DIR = BASE_DIR / "captures"
 CAPTURE_DIR.mkdir(exist_ok=True)       # tự tạo thư mục nếu chưa có
+CACHE_DIR   = BASE_DIR / "cache"        # cache OCR (tạo khi cần)
+TM_PATH     = BASE_DIR / "translation_memory.sqlite3"
+RECORDINGS_DIR = BASE_DIR / "recordings"   # response Vision/Groq đã ghi (replay.py)
+METRICS_DIR = BASE_DIR / "metrics"        # spans.jsonl + metrics.prom (metrics.py)
 
 @dataclass(frozen=True)
 class Config:
     webcam_index: int = 1
     capture_width: int = 2048
     capture_height: int = 1536
-    max_ocr_side: int = 2048
+    detect_every_n: int = 3             # dò khung trang trên preview mỗi N frame
+    detect_max_side: int = 480          # cạnh dài ảnh dùng để dò khung trang
+    quad_smoothing: float = 0.5         # hệ số EMA làm mượt 4 góc
+    quad_stable_tol: float = 0.01       # góc xê dịch ≤ tỉ lệ này của đường chéo = đứng yên
+    auto_capture: bool = False          # tự chụp khi trang đứng yên + đủ nét
+    auto_capture_stable_s: float = 1.0
+    auto_capture_min_sharpness: float = 100.0   # phương sai Laplacian tối thiểu
+    burst_frames: int = 5               # số frame mỗi lần chụp, giữ frame tốt nhất (1 = chụp đơn)
+    quality_gate: bool = True           # chặn trang mờ / loá / lệch sáng trước khi OCR
+    quality_side: int = 800             # cạnh dài ảnh dùng để chấm chất lượng
+    quality_min_sharpness: float = 60.0
+    quality_max_glare: float = 0.01     # tỉ lệ pixel cháy sáng tối đa trên trang
+    quality_min_brightness: float = 70.0
+    quality_max_brightness: float = 240.0
+    rectify_detect_side: int = 1024     # dò khung trang trên ảnh pyramid ≤ cạnh này (0 = ảnh gốc)
+    rectify_gray: bool = False          # chỉ warp kênh xám (nhanh hơn, đủ cho OCR)
+    max_ocr_side: int = 2048            # cạnh dài nhất của ảnh upload lên Vision (0 = giữ nguyên)
+    ocr_grayscale: bool = False         # upload ảnh xám
+    ocr_normalize: bool = False         # cân bằng tương phản (CLAHE) trước khi upload
+    ocr_upload_quality: int = 85        # chất lượng JPEG khi encode lại để upload
     jpeg_quality: int = 100
     vi_filename: str = "vi.txt"
     en_filename: str = "en.txt"
+    ocr_granularity: str = "word"       # "word" (text_detection) | "line" | "paragraph" (document_text_detection)
+    ocr_cache_max_mb: int = 200         # 0 = tắt cache OCR
+    tm_fuzzy_threshold: float = 0.85    # điểm tối thiểu để TM gợi ý bản dịch gần đúng
+    tm_suggest: bool = True             # dịch xong thì tìm bản gần đúng trong TM để gợi ý (không tự thay)
+    translate_chunk_tokens: int = 1500  # ngân sách token (ước lượng) cho mỗi request dịch
+    translate_concurrency: int = 4      # số request dịch chạy song song
+    translate_protocol: str = "jsonl"   # "jsonl" (block có ID) | "delimiter" (nối bằng ###)
+    translate_max_retries: int = 2      # số lần gửi lại các ID bị thiếu
+    speculative: bool = False           # tự OCR + dịch ngay sau khi chụp
+    pdf_font: str = ""                  # file TTF có dấu tiếng Việt cho PDF ("" = tự tìm)
+    pdf_background: bool = True         # in bản dịch đè lên ảnh trang
+    pdf_image_dpi: int = 150            # độ phân giải ảnh nền nhúng vào PDF
+    pdf_image_quality: int = 70
+    pdf_box_opacity: float = 0.85       # nền trắng che chữ Việt dưới mỗi block dịch
+    pdf_chunk_pages: int = 20           # ghi PDF con mỗi N trang rồi nối (giới hạn RAM khi xuất)
+    session_ocr_workers: int = 2        # phiên nhiều trang: số trang OCR cùng lúc
+    session_translate_workers: int = 2  # … và số trang dịch cùng lúc
+    session_queue_size: int = 4         # giới hạn mỗi hàng đợi giữa các stage
+    vision_concurrency: int = 4         # số request Vision đồng thời (services.py)
+    vision_timeout_s: float = 30.0
+    groq_timeout_s: float = 60.0
+    hedge: bool = True                  # primary chậm quá deadline → gửi thêm request tới model dự phòng
+    hedge_quantile: float = 0.95        # deadline = quantile latency của primary …
+    hedge_factor: float = 1.0           # … × hệ số này, kẹp trong [hedge_min_s, hedge_max_s]
+    hedge_min_s: float = 2.0
+    hedge_max_s: float = 20.0
+    hedge_default_s: float = 8.0        # deadline khi chưa đủ `hedge_min_samples` lần gọi
+    hedge_min_samples: int = 20
+    model_stats_window: int = 200       # số lần gọi gần nhất mỗi model dùng để tính quantile
+    breaker_failures: int = 3           # primary lỗi liên tiếp bấy nhiêu lần → mở circuit breaker
+    breaker_cooldown_s: float = 60.0    # đi thẳng model dự phòng trong bấy lâu rồi mới thử lại primary
+    metrics: bool = False               # đo thời gian từng stage (bật/tắt được ở tab Metrics)
+    metrics_pages: int = 20             # số trang gần nhất giữ lại cho panel
+    metrics_prom_interval_s: float = 10.0   # chu kỳ ghi lại metrics.prom
+    replay_latency_ms: float = 0.0      # APP_BACKEND=replay: độ trễ giả lập mỗi request
+    replay_jitter_ms: float = 0.0
+    replay_error_rate: float = 0.0      # tỉ lệ request bị lỗi giả lập
+    replay_on_miss: str = "synthetic"   # request chưa ghi: "synthetic" (sinh response giả) | "error"
 
 CONFIG = Config()
 
 CREDENTIALS  = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL_NAME   = os.getenv("GROQ_MODEL_ID", "openai/gpt-oss-120b")
+BACKEND      = os.getenv("APP_BACKEND", "live")   # "live" | "record" | "replay" (replay.py)
@@ -0,0 +1,236 @@
+# layout.py – phân tích bố cục từ hình học box: dòng, cột, thứ tự đọc
+#
+# * Mọi ngưỡng tính theo chiều cao chữ (median h) nên dùng chung cho toạ độ
+#   pixel (batch) lẫn pt (LayoutView).
+# * Ứng viên cùng dòng lấy qua lưới ô (cell hashing) rồi lọc bằng NumPy,
+#   không so từng cặp block.
+# * Thứ tự đọc: XY-cut trên box của các dòng – cắt theo khe dọc (cột) trước,
+#   rồi khe ngang (khối trên/dưới).
+from typing import Mapping
+
+import numpy as np
+
+LINE_OVERLAP = 0.5   # chồng dọc tối thiểu (theo box thấp hơn) để cùng dòng
+WORD_GAP = 1.5       # khoảng trống ngang tối đa giữa 2 từ cùng dòng (× h)
+COLUMN_GAP = 2.0     # khe dọc tối thiểu để tách cột (× h)
+ROW_GAP = 0.8        # khe ngang tối thiểu để tách khối trên/dưới (× h)
+
+
+def _components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Nhãn thành phần liên thông (nhãn = chỉ số nhỏ nhất) – lan nhãn + nhảy con trỏ."""
+    lab = np.arange(n)
+    while True:
+        m = np.minimum(lab[a], lab[b])
+        new = lab.copy()
+        np.minimum.at(new, a, m)
+        np.minimum.at(new, b, m)
+        new = new[new]
+        if np.array_equal(new, lab):
+            return lab
+        lab = new
+
+
+def group_lines(box: np.ndarray, h_ref: float) -> np.ndarray:
+    """Nhãn dòng cho từng box [x, y, w, h]."""
+    n = len(box)
+    if n < 2:
+        return np.zeros(n, np.int64)
+    x, y, w, h = (box[:, k].astype(np.float64) for k in range(4))
+    gap = WORD_GAP * h_ref
+    cell = 2.0 * h_ref
+
+    # mỗi box (nới ngang gap/2) được gắn vào mọi ô lưới nó phủ
+    c0 = np.floor((x - gap / 2) / cell).astype(np.int64)
+    c1 = np.floor((x + w + gap / 2) / cell).astype(np.int64)
+    r0 = np.floor(y / cell).astype(np.int64)
+    r1 = np.floor((y + h) / cell).astype(np.int64)
+    nc, nr = c1 - c0 + 1, r1 - r0 + 1
+    cnt = nc * nr
+    owner = np.repeat(np.arange(n), cnt)
+    k = np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+    col = c0[owner] + k % nc[owner]
+    row = r0[owner] + k // nc[owner]
+    key = (row - row.min()) * (col.max() - col.min() + 1) + (col - col.min())
+
+    # cặp ứng viên = 2 box chung 1 ô
+    order = np.argsort(key, kind="stable")
+    key, owner = key[order], owner[order]
+    pa, pb = [], []
+    for s in range(1, len(key)):
+        same = key[s:] == key[:-s]
+        if not same.any():
+            break
+        pa.append(owner[:-s][same])
+        pb.append(owner[s:][same])
+    if not pa:
+        return np.arange(n)
+    a, b = np.concatenate(pa), np.concatenate(pb)
+    a, b = np.minimum(a, b), np.maximum(a, b)
+    uniq = np.unique(a * n + b)
+    a, b = uniq // n, uniq % n
+
+    # lọc: chồng dọc đủ nhiều + khoảng trống ngang đủ nhỏ
+    v_overlap = np.minimum(y[a] + h[a], y[b] + h[b]) - np.maximum(y[a], y[b])
+    h_gap = np.maximum(x[a], x[b]) - np.minimum(x[a] + w[a], x[b] + w[b])
+    keep = (v_overlap >= LINE_OVERLAP * np.minimum(h[a], h[b])) & (h_gap <= gap)
+    return _components(n, a[keep], b[keep])
+
+
+def _xy_cut(lbox: np.ndarray, idx: np.ndarray, h_ref: float, col: int,
+            out: list[int], cols: list[int], next_col: list[int]):
+    if len(idx) > 1:
+        b = lbox[idx]
+        for axis, gap in ((0, COLUMN_GAP * h_ref), (1, ROW_GAP * h_ref)):
+            lo = b[:, axis]
+            hi = lo + b[:, axis + 2]
+            order = np.argsort(lo, kind="stable")
+            reach = np.maximum.accumulate(hi[order])
+            cuts = np.nonzero(lo[order][1:] - reach[:-1] >= gap)[0] + 1
+            if len(cuts):
+                for part in np.split(order, cuts):
+                    c = col
+                    if axis == 0:
+                        c = next_col[0]
+                        next_col[0] += 1
+                    _xy_cut(lbox, idx[part], h_ref, c, out, cols, next_col)
+                return
+        idx = idx[np.lexsort((b[:, 0], b[:, 1]))]   # lá: trên → dưới, trái → phải
+    out.extend(idx.tolist())
+    cols.extend([col] * len(idx))
+
+
+# ----------------------------------------------------------------------
+# PageLayout – cache kết quả, cập nhật cục bộ khi 1 block bị kéo đi
+# ----------------------------------------------------------------------
+class PageLayout:
+    """Dòng / cột / thứ tự đọc của 1 trang, khoá theo id block.
+
+    `move`/`upsert`/`remove` chỉ nhóm lại các dòng bị ảnh hưởng; thứ tự đọc
+    được tính lại lười ở lần truy vấn sau.
+    """
+
+    def __init__(self, boxes, ids=None, h_ref: float | None = None):
+        self._box = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).copy()
+        n = len(self._box)
+        self._ids = list(range(n)) if ids is None else [int(i) for i in ids]
+        self._row = {bid: r for r, bid in enumerate(self._ids)}
+        self._alive = np.ones(n, bool)
+        if h_ref is None:
+            h_ref = float(np.median(self._box[:, 3])) if n else 12.0
+        self.h_ref = max(h_ref, 1.0)
+        self._label = group_lines(self._box, self.h_ref)
+        self._next_label = n
+        self._cache: tuple[list[list[int]], list[int]] | None = None
+
+    def __contains__(self, bid: int) -> bool:
+        r = self._row.get(bid)
+        return r is not None and bool(self._alive[r])
+
+    def box(self, bid: int) -> np.ndarray:
+        return self._box[self._row[bid]]
+
+    # ------------------------------------------------------------------
+    # Cập nhật
+    # ------------------------------------------------------------------
+    def move(self, bid: int, x: float, y: float):
+        r = self._row[bid]
+        self._relabel(r, (x, y, self._box[r, 2], self._box[r, 3]))
+
+    def upsert(self, bid: int, box):
+        r = self._row.get(bid)
+        if r is None:
+            r = self._row[bid] = len(self._ids)
+            self._ids.append(bid)
+            self._box = np.vstack([self._box, np.zeros((1, 4))])
+            self._alive = np.append(self._alive, False)
+            self._label = np.append(self._label, self._next_label)
+            self._next_label += 1
+        self._relabel(r, box)
+
+    def remove(self, bid: int):
+        r = self._row.get(bid)
+        if r is None or not self._alive[r]:
+            return
+        self._alive[r] = False
+        self._regroup(np.nonzero(self._alive & (self._label == self._label[r]))[0])
+
+    def _relabel(self, r: int, box):
+        old = self._alive & (self._label == self._label[r])
+        old[r] = False
+        self._box[r] = box
+        self._alive[r] = True
+
+        # block lân cận vị trí mới → cả dòng chứa chúng
+        x, y, w, h = self._box[r]
+        b = self._box
+        gap = WORD_GAP * self.h_ref
+        near = (self._alive & (b[:, 0] <= x + w + gap) & (b[:, 0] + b[:, 2] >= x - gap)
+                & (b[:, 1] <= y + h) & (b[:, 1] + b[:, 3] >= y))
+        near = self._alive & np.isin(self._label, self._label[near])
+        near[r] = True
+        # dòng cũ có thể bị tách đôi khi block rời đi
+        self._regroup(np.nonzero(old)[0])
+        self._regroup(np.nonzero(near)[0])
+
+    def _regroup(self, rows: np.ndarray):
+        if len(rows):
+            sub = group_lines(self._box[rows], self.h_ref)
+            self._label[rows] = sub + self._next_label
+            self._next_label += len(rows)
+        self._cache = None
+
+    # ------------------------------------------------------------------
+    # Truy vấn
+    # ------------------------------------------------------------------
+    def _compute(self) -> tuple[list[list[int]], list[int]]:
+        if self._cache is not None:
+            return self._cache
+        rows = np.nonzero(self._alive)[0]
+        if not len(rows):
+            self._cache = ([], [])
+            return self._cache
+        b = self._box[rows]
+        _, inv = np.unique(self._label[rows], return_inverse=True)
+        order = np.lexsort((b[:, 0], inv))          # theo dòng, trong dòng theo x
+        inv_s = inv[order]
+        starts = np.r_[0, np.nonzero(np.diff(inv_s))[0] + 1]
+
+        x1 = np.minimum.reduceat(b[order, 0], starts)
+        y1 = np.minimum.reduceat(b[order, 1], starts)
+        x2 = np.maximum.reduceat(b[order, 0] + b[order, 2], starts)
+        y2 = np.maximum.reduceat(b[order, 1] + b[order, 3], starts)
+        lbox = np.stack([x1, y1, x2 - x1, y2 - y1], axis=1)
+
+        seq, cols = [], []
+        _xy_cut(lbox, np.arange(len(lbox)), self.h_ref, 0, seq, cols, [1])
+        members = np.split(rows[order], starts[1:])
+        ids = self._ids
+        self._cache = ([[ids[r] for r in members[li]] for li in seq], cols)
+        return self._cache
+
+    def lines(self) -> list[list[int]]:
+        """Các dòng theo thứ tự đọc; mỗi dòng là list id block trái → phải."""
+        return self._compute()[0]
+
+    def line_columns(self) -> list[int]:
+        """Số hiệu cột của từng dòng trong `lines()` (0 = vùng trải toàn trang)."""
+        return self._compute()[1]
+
+    def reading_order(self) -> list[int]:
+        return [bid for line in self.lines() for bid in line]
+
+    def text(self, texts: Mapping[int, str]) -> str:
+        out = []
+        for line in self.lines():
+            s = " ".join(t for t in (texts.get(bid, "").strip() for bid in line) if t)
+            if s:
+                out.append(s)
+        return "\n".join(out)
+
+
+def page_text(box: np.ndarray, texts: list[str], h_ref: float | None = None) -> str:
+    """Text cả trang theo thứ tự đọc – dùng ngoài GUI (batch).
+
+    `h_ref` = chiều cao chữ khi box là dòng/đoạn (mặc định median chiều cao box).
+    """
+    return PageLayout(box, h_ref=h_ref).text(dict(enumerate(texts)))
@@ -1,14 +1,26 @@
+import time
+_T0 = time.perf_counter()        # trước mọi import nặng – đo thời gian khởi động
+
 import sys, logging
+from PyQt5.QtCore import QThreadPool, QTimer
 from PyQt5.QtWidgets import QApplication
 from ui.main_window import MainWindow
 
 def main():
     logging.basicConfig(level=logging.INFO,
                         format="%(asctime)s %(levelname)s: %(message)s")
+    t_import = time.perf_counter()
     app = QApplication(sys.argv)
     win = MainWindow()
     win.show()
-    sys.exit(app.exec())
+    # singleShot(0) chạy khi event loop đã vào → cửa sổ đã hiện
+    QTimer.singleShot(0, lambda: logging.info(
+        "Startup: import %.0f ms, window shown after %.0f ms "
+        "(chi tiết: python -m benchmarks.bench_startup)",
+        (t_import - _T0) * 1000, (time.perf_counter() - _T0) * 1000))
+    code = app.exec()
+    QThreadPool.globalInstance().waitForDone(3000)   # worker nền (webcam, client) xong mới thoát
+    sys.exit(code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,195 @@
+# metrics.py – đo thời gian từng stage (span), xuất JSON Lines + Prometheus text
+#
+#   with metrics.span("vision", bytes=len(upload)) as s:
+#       resp = ...
+#       s.set(blocks=len(blocks))
+#
+# * Tắt (mặc định `CONFIG.metrics`): `span()` trả về 1 object rỗng dùng chung –
+#   chỉ tốn 1 lần gọi hàm, không cấp phát, không đọc đồng hồ.
+# * Mã trang: truyền `page=` hoặc đặt cho cả đoạn code bằng `with page_scope(id)`
+#   (contextvar: theo được qua `asyncio.to_thread`, task con của `gather`).
+# * Bật: mỗi span 1 dòng trong METRICS_DIR/spans.jsonl; histogram theo stage
+#   ghi ra METRICS_DIR/metrics.prom (tối đa mỗi `metrics_prom_interval_s`);
+#   `recent_pages()` cho panel trong app.
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import threading
+import time
+
+from config import CONFIG, METRICS_DIR
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_enabled = CONFIG.metrics
+_page: ContextVar[str | None] = ContextVar("metrics_page", default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **tags):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class Span:
+    __slots__ = ("stage", "page", "tags", "t0", "wall")
+
+    def __init__(self, stage: str, page: str | None, tags: dict):
+        self.stage, self.page, self.tags = stage, page, tags
+
+    def set(self, **tags):
+        self.tags.update(tags)
+
+    def __enter__(self):
+        self.wall = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.t0) * 1000
+        if exc_type is not None:
+            self.tags["error"] = f"{exc_type.__name__}: {exc}"
+        RECORDER.record(self, ms)
+        return False
+
+
+def span(stage: str, page: str | None = None, **tags):
+    if not _enabled:
+        return _NULL
+    return Span(stage, page or _page.get(), tags)
+
+
+@contextmanager
+def page_scope(page_id: str | None):
+    """Các span bên trong (kể cả ở thread / task con) gắn mã trang này."""
+    token = _page.set(page_id)
+    try:
+        yield
+    finally:
+        _page.reset(token)
+
+
+def current_page() -> str | None:
+    """Mã trang hiện tại – để mang sang thread của pool (contextvar không tự theo)."""
+    return _page.get()
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = on
+    if not on:
+        RECORDER.flush()
+
+
+# ----------------------------------------------------------------------
+# Lưu + xuất
+# ----------------------------------------------------------------------
+class Recorder:
+    def __init__(self, keep_pages: int = CONFIG.metrics_pages):
+        self.keep_pages = keep_pages
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[str, dict[str, float]]" = OrderedDict()
+        # (stage, model) → [đếm theo bucket…, +Inf], tổng ms, số lần, số lỗi
+        self._hist: dict[tuple[str, str], list] = {}
+        self._fh = None
+        self._last_prom = 0.0
+
+    def record(self, sp: Span, ms: float) -> None:
+        line = json.dumps({"ts": round(sp.wall, 3), "stage": sp.stage, "page": sp.page,
+                           "ms": round(ms, 3), **sp.tags}, ensure_ascii=False, default=str)
+        with self._lock:
+            if sp.page is not None:
+                stages = self._pages.get(sp.page)
+                if stages is None:
+                    stages = self._pages[sp.page] = {}
+                    while len(self._pages) > self.keep_pages:
+                        self._pages.popitem(last=False)
+                stages[sp.stage] = stages.get(sp.stage, 0.0) + ms
+
+            key = (sp.stage, str(sp.tags.get("model", "")))
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = [[0] * (len(BUCKETS_MS) + 1), 0.0, 0, 0]
+            i = next((k for k, b in enumerate(BUCKETS_MS) if ms <= b), len(BUCKETS_MS))
+            h[0][i] += 1
+            h[1] += ms
+            h[2] += 1
+            h[3] += "error" in sp.tags
+
+            try:
+                if self._fh is None:
+                    METRICS_DIR.mkdir(parents=True, exist_ok=True)
+                    self._fh = open(METRICS_DIR / "spans.jsonl", "a", encoding="utf-8")
+                self._fh.write(line + "\n")
+            except OSError as e:        # pragma: no cover
+                logging.warning("Không ghi được spans.jsonl: %s", e)
+            due = time.monotonic() - self._last_prom >= CONFIG.metrics_prom_interval_s
+        if due:
+            self.flush()
+
+    def recent_pages(self) -> list[tuple[str, dict[str, float]]]:
+        """[(mã trang, {stage: ms})] – trang mới nhất trước."""
+        with self._lock:
+            return [(p, dict(st)) for p, st in reversed(self._pages.items())]
+
+    def prometheus(self) -> str:
+        with self._lock:
+            hist = {k: (list(v[0]), v[1], v[2], v[3]) for k, v in self._hist.items()}
+        out = ["# HELP doc_stage_duration_ms Stage duration in milliseconds",
+               "# TYPE doc_stage_duration_ms histogram"]
+        errors = ["# HELP doc_stage_errors_total Spans that raised",
+                  "# TYPE doc_stage_errors_total counter"]
+        for (stage, model), (counts, total, n, n_err) in sorted(hist.items()):
+            labels = f'stage="{stage}"' + (f',model="{model}"' if model else "")
+            acc = 0
+            for b, c in zip(BUCKETS_MS, counts):
+                acc += c
+                out.append(f'doc_stage_duration_ms_bucket{{{labels},le="{b}"}} {acc}')
+            out.append(f'doc_stage_duration_ms_bucket{{{labels},le="+Inf"}} {n}')
+            out.append(f"doc_stage_duration_ms_sum{{{labels}}} {total:.3f}")
+            out.append(f"doc_stage_duration_ms_count{{{labels}}} {n}")
+            errors.append(f"doc_stage_errors_total{{{labels}}} {n_err}")
+        return "\n".join(out + errors) + "\n"
+
+    def flush(self) -> None:
+        """Đẩy spans.jsonl xuống đĩa và ghi lại metrics.prom (ghi file tạm rồi đổi tên)."""
+        text = self.prometheus()
+        with self._lock:
+            self._last_prom = time.monotonic()
+            if self._fh is not None:
+                self._fh.flush()
+        try:
+            METRICS_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = METRICS_DIR / "metrics.prom.tmp"
+            tmp.write_text(text, encoding="utf-8")
+            tmp.replace(METRICS_DIR / "metrics.prom")
+        except OSError as e:            # pragma: no cover
+            logging.warning("Không ghi được metrics.prom: %s", e)
+
+
+RECORDER = Recorder()
+
+
+def recent_pages() -> list[tuple[str, dict[str, float]]]:
+    return RECORDER.recent_pages()
+
+
+def flush() -> None:
+    if _enabled or RECORDER._fh is not None:
+        RECORDER.flush()
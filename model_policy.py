@@ -0,0 +1,329 @@
+# model_policy.py – chọn model dịch theo độ trễ: hedged request + circuit breaker
+#
+# * Mỗi model giữ cửa sổ các lần gọi gần nhất (`ModelStats`): latency, lỗi → quantile.
+# * Primary chưa trả lời sau deadline (p95 latency × `hedge_factor`, kẹp trong
+#   [hedge_min_s, hedge_max_s]) → gửi thêm 1 request tới model dự phòng, lấy câu
+#   trả lời về trước. Primary lỗi trước deadline → chuyển ngay sang dự phòng.
+# * Primary lỗi liên tiếp `breaker_failures` lần → mở breaker: request đi thẳng tới
+#   model dự phòng trong `breaker_cooldown_s`, sau đó cho 1 request thử (half-open);
+#   thành công thì đóng lại, lỗi thì mở tiếp. Kết quả của request gửi TRƯỚC khi
+#   breaker mở (vd. primary bị hedge, trả lời muộn) không làm đổi trạng thái.
+# * Request thua cuộc không bị huỷ: chạy nốt và vẫn được tính vào thống kê
+#   (không thì p95 chỉ còn thấy những lần nhanh và deadline tụt dần).
+#
+# `call(model, fallback)` do nơi gọi cung cấp: gửi 1 request (sync hoặc coroutine)
+# và trả về text; `fallback` là lý do dùng model dự phòng (False / "error" /
+# "hedge" / "breaker") – gắn vào span để xem trong metrics.
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from config import CONFIG
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+class ModelStats:
+    """Latency (ms) + kết quả của `window` lần gọi gần nhất của 1 model."""
+
+    def __init__(self, window: int = CONFIG.model_stats_window):
+        self._ok_ms: deque[float] = deque(maxlen=window)
+        self._recent: deque[bool] = deque(maxlen=window)     # True = lỗi
+        self.calls = 0
+        self.errors = 0
+
+    def add(self, ms: float, ok: bool) -> None:
+        self.calls += 1
+        self.errors += not ok
+        self._recent.append(not ok)
+        if ok:
+            self._ok_ms.append(ms)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._ok_ms:
+            return None
+        v = sorted(self._ok_ms)
+        return v[min(len(v) - 1, int(q * len(v)))]
+
+    @property
+    def samples(self) -> int:
+        return len(self._ok_ms)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": sum(self._recent) / len(self._recent) if self._recent else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+        }
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = CONFIG.breaker_failures,
+                 cooldown_s: float = CONFIG.breaker_cooldown_s, clock=time.monotonic):
+        self.failures = max(1, failures)
+        self.cooldown_s = cooldown_s
+        self.clock = clock
+        self.state = CLOSED
+        self._streak = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Được gửi tới primary không (OPEN hết cooldown → cho đúng 1 request thử)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() - self._opened_at >= self.cooldown_s:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def abort(self) -> None:
+        """Request thử bị huỷ giữa chừng → cho request sau thử lại."""
+        self._probing = False
+
+    def _stale(self, started: float | None) -> bool:
+        """Request bắt đầu trước lần mở gần nhất → không phải request thử."""
+        return self.state != CLOSED and (started is None or started < self._opened_at)
+
+    def success(self, started: float | None = None) -> None:
+        """`started`: thời điểm (theo `clock`) request được gửi; chỉ request thử
+        (half-open) mới đóng được breaker đang mở."""
+        if self.state == OPEN or self._stale(started):
+            return
+        self.state, self._streak, self._probing = CLOSED, 0, False
+
+    def failure(self, started: float | None = None) -> bool:
+        """Ghi 1 lần lỗi; trả về True nếu breaker vừa chuyển sang OPEN."""
+        if self._stale(started):
+            return False
+        self._streak += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._streak >= self.failures):
+            self.state, self._opened_at, self._probing = OPEN, self.clock(), False
+            return True
+        return False
+
+
+class ModelPolicy:
+    """Thống kê + breaker theo model, dùng chung cho đường sync (translator) và async (services)."""
+
+    def __init__(self, fallback: str, *, hedge: bool = CONFIG.hedge, clock=time.monotonic):
+        self.fallback = fallback
+        self.hedge = hedge
+        self.clock = clock          # đồng hồ của breaker (test: đồng hồ giả)
+        self._lock = threading.Lock()
+        self._stats: dict[str, ModelStats] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.hedged = 0             # số lần đã gửi hedged request
+        self.hedge_wins = 0         # … và model dự phòng trả lời trước
+        self.routed = 0             # số request đi thẳng dự phòng vì breaker mở
+        self._pool: ThreadPoolExecutor | None = None
+        self._background: set[asyncio.Task] = set()
+
+    # ------------------------------------------------------------------
+    # Thống kê + quyết định
+    # ------------------------------------------------------------------
+    def _stat(self, model: str) -> ModelStats:
+        st = self._stats.get(model)
+        if st is None:
+            st = self._stats[model] = ModelStats()
+        return st
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        br = self._breakers.get(model)
+        if br is None:
+            br = self._breakers[model] = CircuitBreaker(clock=self.clock)
+        return br
+
+    def record(self, model: str, ms: float, ok: bool, started: float | None = None) -> None:
+        """`started` = `self.clock()` lúc gửi request (để bỏ qua kết quả đến muộn)."""
+        with self._lock:
+            self._stat(model).add(ms, ok)
+            if model == self.fallback:
+                return
+            br = self._breaker(model)
+            if ok:
+                was = br.state
+                br.success(started)
+                if was != CLOSED and br.state == CLOSED:
+                    logging.info("%s hoạt động lại – đóng circuit breaker", model)
+            elif br.failure(started):
+                logging.warning("%s lỗi liên tiếp – mở circuit breaker, dùng %s trong %.0f s",
+                                model, self.fallback, br.cooldown_s)
+
+    def hedge_after(self, model: str) -> float | None:
+        """Deadline (giây) trước khi gửi hedged request; None = không hedge."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            st = self._stat(model)
+            q = st.quantile(CONFIG.hedge_quantile) if st.samples >= CONFIG.hedge_min_samples else None
+        if q is None:
+            return CONFIG.hedge_default_s
+        return min(CONFIG.hedge_max_s, max(CONFIG.hedge_min_s, q / 1000 * CONFIG.hedge_factor))
+
+    def _use_primary(self, model: str) -> bool:
+        with self._lock:
+            if self._breaker(model).allow():
+                return True
+            self.routed += 1
+            return False
+
+    def route(self, model: str) -> str:
+        """Model cho request không hedge được (stream): primary, hoặc dự phòng khi breaker mở."""
+        return model if model == self.fallback or self._use_primary(model) else self.fallback
+
+    def cancelled(self, model: str) -> None:
+        """Request tới `model` bị huỷ trước khi có kết quả – không tính là lỗi."""
+        with self._lock:
+            if model in self._breakers:
+                self._breakers[model].abort()
+
+    def snapshot(self) -> dict:
+        """{model: {calls, errors, error_rate, p50_ms, p95_ms[, breaker]}} + bộ đếm hedge."""
+        with self._lock:
+            models = {m: st.snapshot() for m, st in self._stats.items()}
+            for m, br in self._breakers.items():
+                models.setdefault(m, ModelStats().snapshot())["breaker"] = br.state
+            return {"models": models, "hedged": self.hedged,
+                    "hedge_wins": self.hedge_wins, "routed": self.routed}
+
+    # ------------------------------------------------------------------
+    # Đường sync (translator.py – worker thread)
+    # ------------------------------------------------------------------
+    def _timed(self, call, model: str, fallback):
+        started, t0 = self.clock(), time.perf_counter()
+        try:
+            res = call(model, fallback)
+        except Exception:
+            self.record(model, (time.perf_counter() - t0) * 1000, False, started)
+            raise
+        self.record(model, (time.perf_counter() - t0) * 1000, True, started)
+        return res
+
+    def _submit(self, call, model: str, fallback):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+        # mã trang (metrics) nằm trong contextvar → mang theo sang thread của pool
+        ctx = contextvars.copy_context()
+        return self._pool.submit(ctx.run, self._timed, call, model, fallback)
+
+    def run(self, call, model: str) -> str:
+        if model == self.fallback:
+            return self._timed(call, model, False)
+        if not self._use_primary(model):
+            return self._timed(call, self.fallback, "breaker")
+
+        deadline = self.hedge_after(model)
+        if deadline is None:
+            try:
+                return self._timed(call, model, False)
+            except Exception as e:
+                logging.warning("%s failed (%s), fallback to %s", model, e, self.fallback)
+                return self._timed(call, self.fallback, "error")
+
+        primary = self._submit(call, model, False)
+        done, _ = wait([primary], timeout=deadline)
+        if done:
+            exc = primary.exception()
+            if exc is None:
+                return primary.result()
+            logging.warning("%s failed (%s), fallback to %s", model, exc, self.fallback)
+            return self._timed(call, self.fallback, "error")
+
+        logging.info("%s chưa trả lời sau %.1f s – gửi hedged request tới %s",
+                     model, deadline, self.fallback)
+        with self._lock:
+            self.hedged += 1
+        hedge = self._submit(call, self.fallback, "hedge")
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return f.result()
+        raise hedge.exception()
+
+    # ------------------------------------------------------------------
+    # Đường async (services.py – event loop của AsyncBridge / batch)
+    # ------------------------------------------------------------------
+    async def _timed_async(self, call, model: str, fallback):
+        started, t0 = self.clock(), time.perf_counter()
+        try:
+            res = await call(model, fallback)
+        except asyncio.CancelledError:
+            self.cancelled(model)
+            raise
+        except Exception:
+            self.record(model, (time.perf_counter() - t0) * 1000, False, started)
+            raise
+        self.record(model, (time.perf_counter() - t0) * 1000, True, started)
+        return res
+
+    def _detach(self, task: asyncio.Task) -> None:
+        """Để request thua chạy nốt (vẫn được ghi thống kê), giữ tham chiếu tới khi xong."""
+        self._background.add(task)
+        task.add_done_callback(lambda t: (self._background.discard(t),
+                                          t.cancelled() or t.exception()))
+
+    async def run_async(self, call, model: str) -> str:
+        if model == self.fallback:
+            return await self._timed_async(call, model, False)
+        if not self._use_primary(model):
+            return await self._timed_async(call, self.fallback, "breaker")
+
+        deadline = self.hedge_after(model)
+        if deadline is None:
+            try:
+                return await self._timed_async(call, model, False)
+            except Exception as e:
+                logging.warning("%s failed (%s), fallback to %s", model, e, self.fallback)
+                return await self._timed_async(call, self.fallback, "error")
+
+        primary = asyncio.ensure_future(self._timed_async(call, model, False))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=deadline)
+            if done:
+                exc = primary.exception()
+                if exc is None:
+                    return primary.result()
+                logging.warning("%s failed (%s), fallback to %s", model, exc, self.fallback)
+                return await self._timed_async(call, self.fallback, "error")
+
+            logging.info("%s chưa trả lời sau %.1f s – gửi hedged request tới %s",
+                         model, deadline, self.fallback)
+            with self._lock:
+                self.hedged += 1
+            hedge = asyncio.ensure_future(self._timed_async(call, self.fallback, "hedge"))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is hedge:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        for other in pending:
+                            self._detach(other)
+                        return t.result()
+            raise hedge.exception()
+        except asyncio.CancelledError:
+            # nơi gọi huỷ (vd. user bấm Cancel) → huỷ luôn các request đang bay
+            for t in (primary, hedge):
+                if t is not None:
+                    t.cancel()
+            raise
@@ -1,46 +1,256 @@
+import io
+import logging
+from functools import lru_cache
 from pathlib import Path
-from google.cloud import vision
-from google.oauth2 import service_account
-from config import CREDENTIALS
+from types import SimpleNamespace
+import metrics
+from config import BACKEND, CONFIG, CREDENTIALS
+from blocks import BlockStore
+from ocr_cache import OCR_CACHE
+from preprocess import encode_for_upload, upload_mode
 
-if not CREDENTIALS:
-    raise RuntimeError("Missing Google credentials")
+LANGUAGE_HINTS = ["vi"]
+GRANULARITIES = ("word", "line", "paragraph")   # word: text_detection, còn lại: document
+
+
+# google.cloud.vision + grpc mất ~0.3–1 s để import → chỉ nạp khi thật sự gọi OCR
+@lru_cache(maxsize=1)
+def vision_client():
+    """Client Vision (sync) theo BACKEND, tạo ở lần gọi đầu rồi dùng lại.
+
+    Thiếu credentials thì lỗi ở đây (trong worker) chứ không làm app chết lúc khởi động.
+    """
+    if BACKEND == "replay":
+        from replay import ReplayVisionClient
+        return ReplayVisionClient()
+    if not CREDENTIALS:
+        raise RuntimeError("Missing Google credentials")
+    from google.cloud import vision
+    from google.oauth2 import service_account
+    from replay import wrap
+    return wrap(vision.ImageAnnotatorClient(
+        credentials=service_account.Credentials.from_service_account_file(CREDENTIALS)
+    ), "vision", BACKEND)
+
+
+def _vision_image(content: bytes):
+    if BACKEND == "replay":
+        return SimpleNamespace(content=content)     # stand-in chỉ đọc `.content`
+    from google.cloud import vision
+    return vision.Image(content=content)
 
-VISION_CLIENT = vision.ImageAnnotatorClient(
-    credentials=service_account.Credentials.from_service_account_file(CREDENTIALS)
-)
 
 def ocr_vi(image_path: Path) -> str:
     with image_path.open("rb") as f:
-        img = vision.Image(content=f.read())
-    resp = VISION_CLIENT.text_detection(image=img, image_context={"language_hints": ["vi"]})
+        img = _vision_image(f.read())
+    resp = vision_client().text_detection(image=img, image_context={"language_hints": ["vi"]})
     if resp.error.message:
         raise RuntimeError(resp.error.message)
     return resp.text_annotations[0].description.strip()
 
 # ➕ HÀM MỚI: trả về layout chi tiết
-def ocr_vi_layout(image_path: Path) -> tuple[list[dict], tuple[int, int]]:
+def ocr_vi_layout(
+    image_path: Path, *, granularity: str = CONFIG.ocr_granularity, use_cache: bool = True
+) -> tuple[BlockStore, tuple[int, int]]:
     with image_path.open("rb") as f:
-        img = vision.Image(content=f.read())
-    resp = VISION_CLIENT.text_detection(image=img, image_context={"language_hints": ["vi"]})
-    if resp.error.message:
-        raise RuntimeError(resp.error.message)
+        content = f.read()
+    with metrics.page_scope(image_path.stem):
+        return _ocr_bytes(content, image_path.name, granularity=granularity, use_cache=use_cache)
+
+
+def ocr_vi_page(
+    page, *, granularity: str = CONFIG.ocr_granularity, use_cache: bool = True
+) -> tuple[BlockStore, tuple[int, int]]:
+    """OCR trực tiếp từ `page.Page` trong RAM – không đọc lại file JPEG."""
+    with metrics.page_scope(page.path.stem):
+        return _ocr_page(page, granularity, use_cache)
+
+
+def _ocr_page(page, granularity: str, use_cache: bool) -> tuple[BlockStore, tuple[int, int]]:
+    document = granularity != "word"
+    upload, scale = page.upload()
+    key = OCR_CACHE.make_key(upload, LANGUAGE_HINTS, "page|" + ocr_mode(True, document))
+    if use_cache:
+        hit = _cache_get(key, page.path.name, granularity)
+        if hit is not None:
+            return hit
+
+    blocks = _parse(_annotate(upload, document), document, scale)
+    if use_cache:
+        _cache_put(key, blocks, page.size)
+    return blocks.grouped(granularity), page.size
+
+
+def _ocr_bytes(
+    content: bytes, name: str, *, granularity: str = "word",
+    use_cache: bool = True, preprocess: bool = True,
+) -> tuple[BlockStore, tuple[int, int]]:
+    # Ảnh không đổi → lấy kết quả cũ, không gọi Vision
+    key, hit = _cache_lookup(content, name, granularity, preprocess, use_cache)
+    if hit is not None:
+        return hit
+
+    document = granularity != "word"
+    upload, scale = prepare_upload(content, preprocess)
+    resp = _annotate(upload, document)
+    return _finish_bytes(resp, content, key if use_cache else None, document, scale, granularity)
+
+
+# ----------------------------------------------------------------------
+# Cache + parse dùng chung với services.VisionService (đường async gọi qua to_thread)
+# ----------------------------------------------------------------------
+def _cache_get(key: str, name: str, granularity: str):
+    hit = OCR_CACHE.get(key)
+    if hit is None:
+        return None
+    logging.info("OCR cache hit %s (%s)", name, OCR_CACHE.stats())
+    return BlockStore.from_records(hit["blocks"]).grouped(granularity), tuple(hit["img_size"])
+
+
+def _cache_put(key: str, blocks: BlockStore, size) -> None:
+    OCR_CACHE.put(key, {"blocks": blocks.to_records(), "img_size": list(size)})
+
+
+def _cache_lookup(content: bytes, name: str, granularity: str, preprocess: bool,
+                  use_cache: bool):
+    """(khoá cache của ảnh, kết quả đã cache hoặc None)."""
+    key = OCR_CACHE.make_key(content, LANGUAGE_HINTS, ocr_mode(preprocess, granularity != "word"))
+    return key, _cache_get(key, name, granularity) if use_cache else None
+
+
+def _finish_bytes(resp, content: bytes, key: str | None, document: bool, scale: float,
+                  granularity: str) -> tuple[BlockStore, tuple[int, int]]:
+    """Response → (block theo `granularity`, kích thước ảnh gốc); cache (nếu có `key`) giữ cấp từ."""
+    blocks = _parse(resp, document, scale)
+    width, height = image_size(content)
+    if key is not None:
+        _cache_put(key, blocks, (width, height))
+    return blocks.grouped(granularity), (width, height)
+
 
-    blocks = []
-    for anno in resp.text_annotations[1:]:  # Bỏ phần text tổng hợp đầu tiên
-        text = anno.description.strip()
-        vertices = anno.bounding_poly.vertices
-        x_coords = [v.x for v in vertices]
-        y_coords = [v.y for v in vertices]
-        x, y = min(x_coords), min(y_coords)
-        w, h = max(x_coords) - x, max(y_coords) - y
-        blocks.append({
-            "text": text,
-            "box": [x, y, w, h]
-        })
-
-    # Trả về (danh sách block, kích thước ảnh gốc)
+def _annotate(upload: bytes, document: bool):
+    client = vision_client()
+    detect = client.document_text_detection if document else client.text_detection
+    with metrics.span("vision", bytes=len(upload), document=document):
+        resp = detect(image=_vision_image(upload),
+                      image_context={"language_hints": LANGUAGE_HINTS})
+        if resp.error.message:
+            raise RuntimeError(resp.error.message)
+    return resp
+
+
+def _parse(resp, document: bool, scale: float) -> BlockStore:
+    with metrics.span("parse") as sp:
+        blocks = parse_response(resp, document).scaled(1 / scale)
+        sp.set(blocks=len(blocks))
+    return blocks
+
+
+def ocr_mode(preprocess: bool = True, document: bool = False) -> str:
+    feature = "doc" if document else "text"
+    return f"{feature}|{upload_mode()}" if preprocess else feature
+
+
+def prepare_upload(content: bytes, preprocess: bool = True) -> tuple[bytes, float]:
+    """Ảnh gốc → bytes upload (thu nhỏ về `CONFIG.max_ocr_side`, encode lại)."""
+    if not preprocess:
+        return content, 1.0
+    upload, scale = encode_for_upload(content)
+    logging.info("OCR upload %.0f KB → %.0f KB (scale %.2f)",
+                 len(content) / 1024, len(upload) / 1024, scale)
+    return upload, scale
+
+
+def parse_text_annotations(resp) -> BlockStore:
+    """Response `text_detection` → 1 block / từ, box = [x, y, w, h]."""
+    annos = resp.text_annotations[1:]       # Bỏ phần text tổng hợp đầu tiên
+    texts = [a.description.strip() for a in annos]
+    polys = [[(v.x, v.y) for v in a.bounding_poly.vertices] for a in annos]
+    return BlockStore.from_polygons(texts, polys)
+
+
+# DetectedBreak.BreakType: EOL_SURE_SPACE = 3, HYPHEN = 4, LINE_BREAK = 5
+_EOL_BREAKS = {3, 4, 5}
+
+
+def parse_full_text(resp) -> BlockStore:
+    """Response `document_text_detection` → 1 block / từ, kèm `line_id`/`par_id`.
+
+    Dòng kết thúc ở từ có ký tự cuối mang break xuống dòng; mỗi đoạn mới
+    cũng mở dòng mới. Gom thành dòng/đoạn bằng `BlockStore.grouped`.
+    """
+    texts, polys, conf, line_ids, par_ids = [], [], [], [], []
+    line = par = 0
+    for pg in resp.full_text_annotation.pages:
+        for blk in pg.blocks:
+            for para in blk.paragraphs:
+                for word in para.words:
+                    syms = word.symbols
+                    texts.append("".join(s.text for s in syms))
+                    polys.append([(v.x, v.y) for v in word.bounding_box.vertices])
+                    conf.append(word.confidence)
+                    line_ids.append(line)
+                    par_ids.append(par)
+                    if syms and int(syms[-1].property.detected_break.type_) in _EOL_BREAKS:
+                        line += 1
+                if line_ids and line_ids[-1] == line:
+                    line += 1
+                par += 1
+    return BlockStore.from_polygons(texts, polys, conf, line_ids, par_ids)
+
+
+def parse_response(resp, document: bool) -> BlockStore:
+    return parse_full_text(resp) if document else parse_text_annotations(resp)
+
+
+def image_size(content: bytes) -> tuple[int, int]:
+    from PIL import Image
+    with Image.open(io.BytesIO(content)) as im:
+        return im.size
+
+
+# ----------------------------------------------------------------------
+# OCR lại 1 vùng (crop) của trang rồi ghép vào kết quả cũ
+# ----------------------------------------------------------------------
+def ocr_vi_region(
+    image_path: Path,
+    rect: tuple[int, int, int, int],
+    *,
+    upscale: float = 1.0,
+    granularity: str = CONFIG.ocr_granularity,
+    use_cache: bool = True,
+) -> BlockStore:
+    """OCR vùng `rect` = (x, y, w, h) theo pixel ảnh gốc.
+
+    Chỉ upload phần crop (có thể phóng to `upscale` lần cho chữ nhỏ/mờ);
+    box trả về đã được quy đổi về toạ độ trang.
+    """
     from PIL import Image
+    rx, ry, rw, rh = (int(round(v)) for v in rect)
     with Image.open(image_path) as im:
-        width, height = im.size
-    return blocks, (width, height)
+        rx, ry = max(0, rx), max(0, ry)
+        crop = im.crop((rx, ry, min(im.width, rx + rw), min(im.height, ry + rh)))
+        if upscale != 1.0:
+            crop = crop.resize((round(crop.width * upscale), round(crop.height * upscale)),
+                               Image.LANCZOS)
+        buf = io.BytesIO()
+        crop.convert("RGB").save(buf, format="JPEG", quality=95)
+
+    # crop đã tự encode (và có thể đã phóng to) → không thu nhỏ lại
+    with metrics.page_scope(image_path.stem):
+        blocks, _ = _ocr_bytes(buf.getvalue(), f"{image_path.name}@{rect}",
+                               granularity=granularity, use_cache=use_cache, preprocess=False)
+    return blocks.scaled(1 / upscale).translated(rx, ry)
+
+
+def merge_region_blocks(
+    blocks: BlockStore,
+    new_blocks: BlockStore,
+    rect: tuple[int, int, int, int],
+    min_overlap: float = 0.5,
+) -> BlockStore:
+    """Thay các block nằm (phần lớn) trong `rect` bằng `new_blocks`."""
+    kept = blocks[blocks.overlap_ratio(rect) < min_overlap]
+    logging.info("Region re-OCR: thay %d block bằng %d block mới",
+                 len(blocks) - len(kept), len(new_blocks))
+    return BlockStore.concat([kept, new_blocks])
@@ -0,0 +1,125 @@
+# ocr_cache.py – cache kết quả OCR trên đĩa, khoá theo nội dung ảnh
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from config import BACKEND, CACHE_DIR, CONFIG
+
+
+class OCRCache:
+    """Cache OCR dạng content-addressed (sha256 ảnh + language hints + mode).
+
+    * Mỗi entry là 1 file JSON ``<root>/<ab>/<key>.json``.
+    * LRU theo mtime: cache hit sẽ ``touch`` file, khi vượt `max_bytes`
+      thì xoá các entry cũ nhất.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total: int | None = None      # tính lười ở lần ghi đầu tiên
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(content: bytes, language_hints: list[str], mode: str) -> str:
+        h = hashlib.sha256(content)
+        h.update(b"\0" + ",".join(language_hints).encode() + b"\0" + mode.encode())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> dict | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)                  # đánh dấu vừa dùng (LRU)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, value: dict) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+
+        with self._lock:
+            try:
+                old = path.stat().st_size   # ghi đè entry cũ (cùng trang OCR 2 lần)
+            except OSError:
+                old = 0
+            os.replace(tmp, path)           # ghi nguyên tử
+            if self._total is None:
+                self._total = self._scan_size()
+            else:
+                self._total += len(payload) - old
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for f in self.root.glob("*/*.json"):
+                f.unlink(missing_ok=True)
+            self._total = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes": self._total,
+            }
+
+    # ------------------------------------------------------------------
+    def _scan_size(self) -> int:
+        return sum(f.stat().st_size for f in self.root.glob("*/*.json"))
+
+    def _evict(self) -> None:
+        """Xoá entry ít dùng nhất đến khi còn ≤ 90% giới hạn (gọi khi đã giữ lock)."""
+        entries = []
+        for f in self.root.glob("*/*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        entries.sort()
+
+        total = sum(e[1] for e in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, f in entries:
+            if total <= target:
+                break
+            f.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._total = total
+        logging.info("OCR cache: evicted %d entries (%.1f MB)", removed, total / 1e6)
+
+
+# replay: kết quả giả lập không được lẫn vào cache OCR thật (key không chứa BACKEND)
+OCR_CACHE = OCRCache(CACHE_DIR / ("ocr-replay" if BACKEND == "replay" else "ocr"),
+                     CONFIG.ocr_cache_max_mb * 1024 * 1024)
@@ -0,0 +1,98 @@
+# page.py – 1 trang đã rectify, giữ trong RAM suốt pipeline capture → OCR
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+import metrics
+from config import CONFIG
+from preprocess import encode_for_upload
+
+# ghi file / encode upload chạy nền, không chặn GUI
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-io")
+
+
+@dataclass(eq=False)
+class Page:
+    """Ảnh trang (BGR, hoặc xám khi `rectify_gray`) + homography + đường dẫn sẽ lưu.
+
+    * `upload()` encode ảnh upload 1 lần rồi giữ lại (có thể chuẩn bị trước
+      bằng `prepare_async`).
+    * `save_async()` ghi JPEG/H.npy ở background – chỉ là side effect, OCR
+      không cần đọc lại file.
+    * `release()` bỏ ảnh khỏi RAM (phiên nhiều trang, sau khi đã lưu và OCR
+      xong); từ đó `image` là None, ai cần ảnh thì đọc `path`. Bản upload
+      (đã nén, nhỏ) được giữ lại: key cache OCR của trang tính trên chính các
+      byte này, encode lại từ JPEG đã lưu sẽ ra byte khác → trượt cache.
+    """
+
+    image: np.ndarray | None
+    path: Path
+    H: np.ndarray | None = None
+    _upload: tuple[bytes, float] | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _saved: Future | None = field(default=None, repr=False)
+    _size: tuple[int, int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        h, w = self.image.shape[:2]
+        self._size = (w, h)
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self._size
+
+    # ------------------------------------------------------------------
+    def upload(self) -> tuple[bytes, float]:
+        """(bytes upload, scale) – xem `preprocess.encode_for_upload`.
+
+        Encode 1 lần rồi giữ suốt đời trang; chưa encode mà đã `release()` thì
+        encode từ file đã lưu (và cũng giữ lại).
+        """
+        with self._lock:
+            if self._upload is not None:
+                return self._upload
+            image = self.image
+            if image is None:
+                image = cv2.imread(str(self.path), cv2.IMREAD_UNCHANGED)
+                if image is None:
+                    raise RuntimeError(f"Không đọc được {self.path}")
+            with metrics.span("encode", page=self.path.stem) as sp:
+                upload = encode_for_upload(image)
+                sp.set(bytes=len(upload[0]))
+            self._upload = upload
+            return upload
+
+    def prepare_async(self) -> Future:
+        return _IO_POOL.submit(self.upload)
+
+    # ------------------------------------------------------------------
+    def save_async(self) -> Future:
+        if self._saved is None:
+            self._saved = _IO_POOL.submit(self._save)
+        return self._saved
+
+    def wait_saved(self) -> Path:
+        """Chờ file ảnh ghi xong (dùng khi cần đọc từ đĩa, vd. region re-OCR)."""
+        self.save_async().result()
+        return self.path
+
+    def release(self) -> None:
+        """Chờ ghi file xong rồi bỏ ảnh gốc khỏi RAM (giữ bản upload)."""
+        self.wait_saved()
+        with self._lock:
+            self.image = None
+
+    def _save(self) -> Path:
+        with metrics.span("jpeg_write", page=self.path.stem) as sp:
+            cv2.imwrite(str(self.path), self.image,
+                        [int(cv2.IMWRITE_JPEG_QUALITY), CONFIG.jpeg_quality])
+            sp.set(bytes=self.path.stat().st_size)
+        if self.H is not None:
+            np.save(self.path.with_name(self.path.stem + "_H.npy"), self.H)
+        logging.info("Saved %s", self.path.name)
+        return self.path
@@ -0,0 +1,309 @@
+# pdf_export.py – xuất bản dịch nhiều trang ra 1 file PDF (reportlab)
+#
+# Mỗi block dịch được vẽ đúng vị trí box gốc trên trang A4, tuỳ chọn đè lên
+# ảnh trang đã rectify. Trang được đưa vào lần lượt (iterable / generator):
+# ảnh nền chỉ được đọc + thu nhỏ + encode JPEG cho trang đang vẽ rồi bỏ, nên
+# mỗi trang chỉ còn lại phần đã nén (ảnh ~100–200 KB + content stream text).
+# reportlab giữ mọi trang tới lúc `save()`, nên cứ `pdf_chunk_pages` trang lại
+# ghi ra 1 PDF con trong thư mục tạm; `close()` nối các PDF con bằng pypdf.
+#
+# Font TTF đăng ký 1 lần mỗi process; reportlab nhúng subset các glyph đã
+# dùng, 1 lần cho mỗi PDF con.
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable
+import itertools
+import logging
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from blocks import BlockStore
+from config import CONFIG
+
+rl_config.useA85 = 0        # stream nhị phân: ASCII85 làm ảnh nền to thêm 25%
+
+FONT_CANDIDATES = [
+    # Windows
+    "C:/Windows/Fonts/times.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+    # macOS
+    "/System/Library/Fonts/Supplemental/Times New Roman.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    # Linux
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSans-Regular.ttf",
+]
+VI_PROBE = "ăâđêôơưạệỳ"     # glyph phải có để in được tiếng Việt
+MIN_PT = 4.0
+LEADING = 1.15
+BOX_PAD = 1.0               # pt – nền trắng phủ rộng hơn box chút
+
+_bg_seq = itertools.count()
+
+
+@dataclass
+class ExportPage:
+    blocks: BlockStore               # text = bản dịch; box [x, y, w, h] theo pixel ảnh
+    img_size: tuple[int, int]        # (w, h) ảnh trang
+    image: Path | np.ndarray | None = None   # ảnh trang đã rectify (nền)
+
+
+# ----------------------------------------------------------------------
+# Font
+# ----------------------------------------------------------------------
+def find_font() -> Path:
+    if CONFIG.pdf_font:
+        return Path(CONFIG.pdf_font)
+    for p in map(Path, FONT_CANDIDATES):
+        if p.exists():
+            return p
+    raise RuntimeError("Không tìm thấy font TTF có dấu tiếng Việt – đặt CONFIG.pdf_font")
+
+
+def register_font(path: Path | None = None) -> str:
+    """Đăng ký TTF với reportlab (1 lần / process / file); trả về tên font."""
+    return _register(Path(path) if path else find_font())
+
+
+@lru_cache(maxsize=None)
+def _register(path: Path) -> str:
+    font = TTFont(path.stem, str(path))
+    missing = [c for c in VI_PROBE if ord(c) not in font.face.charToGlyph]
+    if missing:
+        logging.warning("Font %s thiếu glyph %s", path.name, "".join(missing))
+    pdfmetrics.registerFont(font)
+    return path.stem
+
+
+# ----------------------------------------------------------------------
+# Vẽ 1 trang
+# ----------------------------------------------------------------------
+def _background_file(image: Path | np.ndarray, page_w_pt: float, tmp: Path) -> Path | None:
+    """File JPEG ảnh nền ≤ `pdf_image_dpi`; ảnh đủ nhỏ thì dùng thẳng file gốc.
+
+    reportlab nhúng file JPEG nguyên dạng (DCTDecode), còn với ảnh trong RAM
+    nó decode lại toàn bộ để tính md5 – nên luôn đưa đường dẫn file.
+    """
+    max_w = round(page_w_pt / 72 * CONFIG.pdf_image_dpi)
+    if isinstance(image, Path):
+        size = None
+        if image.suffix.lower() in (".jpg", ".jpeg"):
+            with image.open("rb") as f:
+                size = _jpeg_size(f.read(64 * 1024))
+            if size is not None and size[0] <= max_w:
+                return image
+        # JPEG decode thẳng ở 1/2, 1/4, 1/8 kích thước – nhanh hơn decode đủ rồi resize
+        flag = cv2.IMREAD_COLOR
+        if size is not None:
+            for r, f in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if size[0] // r >= max_w:
+                    flag = f
+                    break
+        img = cv2.imread(str(image), flag)
+        if img is None:
+            logging.warning("Không đọc được ảnh nền %s", image)
+            return None
+    else:
+        img = image
+    h, w = img.shape[:2]
+    if w > max_w:
+        img = cv2.resize(img, (max_w, round(h * max_w / w)), interpolation=cv2.INTER_AREA)
+    out = tmp / f"bg{next(_bg_seq)}.jpg"        # tên riêng: reportlab cache ảnh theo tên file
+    ok = cv2.imwrite(str(out), img, [int(cv2.IMWRITE_JPEG_QUALITY), CONFIG.pdf_image_quality])
+    return out if ok else None
+
+
+def _jpeg_size(head: bytes) -> tuple[int, int] | None:
+    """(w, h) từ marker SOF của JPEG, không decode ảnh."""
+    i = 2
+    while i + 9 < len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        seg = int.from_bytes(head[i + 2:i + 4], "big")
+        if marker in (0xC0, 0xC1, 0xC2):
+            h = int.from_bytes(head[i + 5:i + 7], "big")
+            w = int.from_bytes(head[i + 7:i + 9], "big")
+            return w, h
+        i += 2 + seg
+    return None
+
+
+def _fit_text(text: str, font: str, w: float, h: float, size: float) -> tuple[float, list[str]]:
+    """Cỡ chữ lớn nhất ≤ `size` để text (xuống dòng theo `w`) nằm gọn trong box."""
+    while True:
+        lines = simpleSplit(text, font, size, w)
+        if len(lines) * size * LEADING <= max(h, size * LEADING) or size <= MIN_PT:
+            return size, lines
+        size = max(MIN_PT, size * 0.9)
+
+
+def draw_page(c: canvas.Canvas, page: ExportPage, font: str, *,
+              background: bool, tmp: Path):
+    pw, ph = A4
+    img_w, img_h = page.img_size
+    sx, sy = pw / img_w, ph / img_h
+
+    if background and page.image is not None:
+        bg = _background_file(page.image, pw, tmp)
+        if bg is not None:
+            c.drawImage(str(bg), 0, 0, pw, ph)      # đọc file ngay tại đây
+            if bg.parent == tmp:
+                bg.unlink()
+
+    blocks = page.blocks
+    box_pt = blocks.box * np.array([sx, sy, sx, sy])
+    # cùng công thức cỡ chữ với LayoutView
+    base_pt = max(6.0, min(28.0, blocks.glyph_height(12 / sy) * sy * 0.7))
+
+    keep = [i for i, t in enumerate(blocks.text) if t.strip()]
+    if background:
+        # phủ trắng bán trong suốt lên chữ Việt bên dưới rồi mới in bản dịch
+        c.saveState()
+        c.setFillColorRGB(1, 1, 1)
+        c.setFillAlpha(CONFIG.pdf_box_opacity)
+        for i in keep:
+            x, y, w, h = box_pt[i].tolist()
+            c.rect(x - BOX_PAD, ph - y - h - BOX_PAD, w + 2 * BOX_PAD, h + 2 * BOX_PAD,
+                   stroke=0, fill=1)
+        c.restoreState()
+
+    # 1 text object cho cả trang (1 cặp BT/ET), chỉ đổi font khi cỡ chữ đổi
+    c.setFillColorRGB(0, 0, 0)
+    t = c.beginText()
+    cur = None
+    for i in keep:
+        x, y, w, h = box_pt[i].tolist()
+        size, lines = _fit_text(blocks.text[i].strip(), font, max(w, 1.0), h, base_pt)
+        if size != cur:
+            t.setFont(font, size, size * LEADING)
+            cur = size
+        t.setTextOrigin(x, ph - y - size)
+        t.textLines(lines)
+    c.drawText(t)
+
+
+# ----------------------------------------------------------------------
+# Exporter
+# ----------------------------------------------------------------------
+class PdfExporter:
+    """Ghi từng trang vào 1 PDF; dùng `with` hoặc gọi `close()` để ghi file."""
+
+    def __init__(self, out: Path | str, *, background: bool = CONFIG.pdf_background,
+                 font: Path | None = None, title: str = "",
+                 chunk_pages: int = CONFIG.pdf_chunk_pages):
+        self.out = Path(out)
+        self.background = background
+        self.font = register_font(font)
+        self.title = title
+        self.chunk_pages = max(1, chunk_pages)
+        self._tmp = tempfile.TemporaryDirectory(prefix="pdf_export_")
+        self._parts: list[Path] = []     # PDF con đã ghi xong
+        self._in_part = 0                # số trang trong canvas hiện tại
+        self._c = self._new_canvas()
+        self.page_s: list[float] = []
+
+    def _part_path(self) -> Path:
+        return Path(self._tmp.name) / f"part{len(self._parts):04d}.pdf"
+
+    def _new_canvas(self) -> canvas.Canvas:
+        c = canvas.Canvas(str(self._part_path()), pagesize=A4, pageCompression=1)
+        if self.title:
+            c.setTitle(self.title)
+        return c
+
+    def _flush_part(self) -> None:
+        """Ghi canvas hiện tại ra PDF con, giải phóng các trang reportlab đang giữ."""
+        self._c.save()
+        self._parts.append(self._part_path())
+        self._in_part = 0
+
+    def add_page(self, page: ExportPage) -> float:
+        """Vẽ 1 trang; trả về thời gian (giây)."""
+        t0 = time.perf_counter()
+        draw_page(self._c, page, self.font, background=self.background,
+                  tmp=Path(self._tmp.name))
+        self._c.showPage()
+        self._in_part += 1
+        if self._in_part >= self.chunk_pages:
+            self._flush_part()
+            self._c = self._new_canvas()
+        dt = time.perf_counter() - t0
+        self.page_s.append(dt)
+        return dt
+
+    def close(self) -> dict:
+        t0 = time.perf_counter()
+        try:
+            if self._in_part or not self._parts:
+                self._flush_part()
+            _concat(self._parts, self.out, self.title)
+        finally:
+            self._tmp.cleanup()
+        save_s = time.perf_counter() - t0
+        stats = {
+            "pages": len(self.page_s),
+            "parts": len(self._parts),
+            "page_ms_avg": 1000 * sum(self.page_s) / len(self.page_s) if self.page_s else 0.0,
+            "page_ms_max": 1000 * max(self.page_s, default=0.0),
+            "save_ms": 1000 * save_s,
+            "total_s": sum(self.page_s) + save_s,
+            "bytes": self.out.stat().st_size,
+        }
+        logging.info("PDF %s: %d trang, %.0f ms/trang (max %.0f), ghi file %.0f ms, %.1f MB",
+                     self.out.name, stats["pages"], stats["page_ms_avg"], stats["page_ms_max"],
+                     stats["save_ms"], stats["bytes"] / 1e6)
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        try:
+            if exc_type is None:
+                self.stats = self.close()
+        finally:
+            self._tmp.cleanup()          # lỗi giữa chừng: vẫn xoá ảnh nền + PDF con
+
+
+def _concat(parts: list[Path], out: Path, title: str = "") -> None:
+    """Nối các PDF con thành `out` (1 phần thì chỉ chuyển file, không cần pypdf)."""
+    if len(parts) == 1:
+        shutil.move(parts[0], out)
+        return
+    from pypdf import PdfWriter      # import muộn: chỉ cần khi tài liệu > 1 phần
+
+    writer = PdfWriter()
+    for p in parts:
+        writer.append(str(p))
+    if title:
+        writer.add_metadata({"/Title": title})
+    with out.open("wb") as f:
+        writer.write(f)
+
+
+def export_pdf(pages: Iterable[ExportPage], out: Path | str, *,
+               background: bool = CONFIG.pdf_background, font: Path | None = None,
+               progress: Callable[[int, float], None] | None = None) -> dict:
+    """Xuất mọi trang (lấy lần lượt từ iterable) ra `out`; trả về thống kê thời gian."""
+    with PdfExporter(out, background=background, font=font) as ex:
+        for n, page in enumerate(pages, 1):
+            dt = ex.add_page(page)
+            if progress is not None:
+                progress(n, dt)
+    return ex.stats
@@ -0,0 +1,58 @@
+# preprocess.py – chuẩn bị ảnh trước khi upload lên Vision
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+
+def encode_for_upload(
+    img: np.ndarray | bytes,
+    *,
+    max_side: int = CONFIG.max_ocr_side,
+    grayscale: bool = CONFIG.ocr_grayscale,
+    normalize: bool = CONFIG.ocr_normalize,
+    quality: int = CONFIG.ocr_upload_quality,
+) -> tuple[bytes, float]:
+    """Thu nhỏ về `max_side`, (tuỳ chọn) xám/cân bằng tương phản, encode JPEG.
+
+    Trả về (bytes upload, scale) với scale = kích thước upload / kích thước gốc;
+    box Vision trả về cần chia cho `scale` để về toạ độ trang (`BlockStore.scaled`).
+    """
+    if isinstance(img, (bytes, bytearray)):
+        flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        img = cv2.imdecode(np.frombuffer(img, np.uint8), flag)
+        if img is None:
+            raise RuntimeError("Không decode được ảnh để upload")
+    elif grayscale and img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    h, w = img.shape[:2]
+    scale = min(1.0, max_side / max(h, w)) if max_side > 0 else 1.0
+    if scale < 1.0:
+        img = cv2.resize(img, (round(w * scale), round(h * scale)),
+                         interpolation=cv2.INTER_AREA)
+
+    if normalize:
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        if img.ndim == 2:
+            img = clahe.apply(img)
+        else:
+            lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+            lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+            img = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    if not ok:
+        raise RuntimeError("Encode JPEG thất bại")
+    return buf.tobytes(), scale
+
+
+def upload_mode(
+    *,
+    max_side: int = CONFIG.max_ocr_side,
+    grayscale: bool = CONFIG.ocr_grayscale,
+    normalize: bool = CONFIG.ocr_normalize,
+    quality: int = CONFIG.ocr_upload_quality,
+) -> str:
+    """Chuỗi mô tả cấu hình tiền xử lý – đưa vào khoá cache OCR."""
+    return f"max{max_side}-g{int(grayscale)}-n{int(normalize)}-q{quality}"
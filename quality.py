@@ -0,0 +1,96 @@
+# quality.py – chấm điểm ảnh chụp (nét / sáng / loá) và chặn trang xấu trước OCR
+#
+# Mọi chỉ số tính trên ảnh xám thu nhỏ về `CONFIG.quality_side` nên ngưỡng
+# không phụ thuộc độ phân giải webcam. `assess_many` chấm cả burst 1 lượt
+# (mảng (N, h, w)), không lặp từng frame.
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+
+CLIP_HI = 250        # ≥ mức này coi là cháy sáng (loá)
+CLIP_LO = 8          # ≤ mức này coi là mất chi tiết vùng tối
+
+
+@dataclass(frozen=True)
+class FrameQuality:
+    sharpness: float     # phương sai Laplacian
+    brightness: float    # độ sáng trung bình (0–255)
+    glare: float         # tỉ lệ pixel cháy sáng
+    dark: float          # tỉ lệ pixel quá tối
+
+    @property
+    def score(self) -> float:
+        """Điểm để chọn frame tốt nhất trong burst: nét là chính, trừ loá / lệch sáng."""
+        exposure = 1.0 - min(1.0, abs(self.brightness - 160) / 160)
+        return self.sharpness * (1.0 - min(1.0, 10 * self.glare)) * (0.5 + 0.5 * exposure)
+
+    def problem(self) -> str | None:
+        """Lý do trang không đạt (None = đạt); lệch sáng xét trước vì nó cũng làm giảm độ nét."""
+        if self.glare > CONFIG.quality_max_glare:
+            return f"bị loá ({self.glare:.1%} pixel cháy sáng > {CONFIG.quality_max_glare:.1%})"
+        if self.brightness < CONFIG.quality_min_brightness:
+            return f"quá tối (độ sáng {self.brightness:.0f} < {CONFIG.quality_min_brightness:.0f})"
+        if self.brightness > CONFIG.quality_max_brightness:
+            return f"quá sáng (độ sáng {self.brightness:.0f} > {CONFIG.quality_max_brightness:.0f})"
+        if self.sharpness < CONFIG.quality_min_sharpness:
+            return f"ảnh bị mờ/rung (độ nét {self.sharpness:.0f} < {CONFIG.quality_min_sharpness:.0f})"
+        return None
+
+
+def _gray_small(img: np.ndarray, side: int, rect=None) -> np.ndarray:
+    if rect is not None:
+        x, y, w, h = rect
+        img = img[max(0, y):y + h, max(0, x):x + w]
+    g = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    while max(g.shape) >= 2 * side:         # pyrDown rẻ hơn INTER_AREA tỉ lệ lẻ
+        g = cv2.pyrDown(g)
+    h, w = g.shape
+    k = side / max(h, w)
+    if k < 1.0:
+        g = cv2.resize(g, (round(w * k), round(h * k)), interpolation=cv2.INTER_AREA)
+    return g
+
+
+def assess_many(frames: list[np.ndarray], rect=None,
+                side: int = CONFIG.quality_side) -> list[FrameQuality]:
+    """Chấm N frame; `rect` = (x, y, w, h) chỉ chấm vùng trang.
+
+    Frame cùng kích thước được chấm 1 lượt; lẫn kích thước (vd. đổi góc xoay
+    giữa burst) thì chấm từng frame.
+    """
+    if not frames:
+        return []
+    smalls = [_gray_small(f, side, rect) for f in frames]
+    if any(g.shape != smalls[0].shape for g in smalls):
+        return [_assess_stack(g[None])[0] for g in smalls]
+    return _assess_stack(np.stack(smalls))
+
+
+def _assess_stack(g: np.ndarray) -> list[FrameQuality]:
+    g = g.astype(np.float32)                                    # (N, h, w)
+    n = len(g)
+
+    # Laplacian 4-lân cận trên cả khối (N, h-2, w-2)
+    c = g[:, 1:-1, 1:-1]
+    lap = g[:, :-2, 1:-1] + g[:, 2:, 1:-1] + g[:, 1:-1, :-2] + g[:, 1:-1, 2:] - 4 * c
+    sharp = lap.reshape(n, -1).var(axis=1)
+
+    flat = g.reshape(n, -1)
+    bright = flat.mean(axis=1)
+    glare = (flat >= CLIP_HI).mean(axis=1)
+    dark = (flat <= CLIP_LO).mean(axis=1)
+    return [FrameQuality(float(s), float(b), float(gl), float(d))
+            for s, b, gl, d in zip(sharp, bright, glare, dark)]
+
+
+def assess(img: np.ndarray, rect=None) -> FrameQuality:
+    return assess_many([img], rect)[0]
+
+
+def best_frame(frames: list[np.ndarray], rect=None) -> tuple[int, list[FrameQuality]]:
+    """Chỉ số frame điểm cao nhất + điểm của cả burst."""
+    q = assess_many(frames, rect)
+    return int(np.argmax([x.score for x in q])), q
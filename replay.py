@@ -0,0 +1,425 @@
+# replay.py – stand-in cho Vision và Groq: ghi lại response thật / phát lại offline
+#
+# Chọn backend bằng biến môi trường APP_BACKEND (xem config.BACKEND):
+#   live    – gọi API thật (mặc định)
+#   record  – gọi API thật và lưu từng response vào RECORDINGS_DIR
+#   replay  – không mạng, không credentials: trả response đã ghi; request chưa
+#             ghi thì sinh response giả lập (hoặc báo lỗi, tuỳ `on_miss`)
+#
+# Ở chế độ replay có thể giả lập độ trễ (latency ± jitter) và lỗi ngẫu nhiên
+# qua `SETTINGS` để đo pipeline trong điều kiện mạng khác nhau.
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace as NS
+import asyncio
+import hashlib
+import inspect
+import io
+import json
+import logging
+import random
+import threading
+import time
+import unicodedata
+
+from config import CONFIG, RECORDINGS_DIR
+
+_DOC_FEATURE = 11        # vision.Feature.Type.DOCUMENT_TEXT_DETECTION
+_SPACE, _EOL = 1, 5      # DetectedBreak.BreakType: SPACE, LINE_BREAK
+
+
+class StandInError(RuntimeError):
+    """Lỗi do stand-in cố ý tạo ra (`error_rate`) hoặc thiếu bản ghi."""
+
+
+@dataclass
+class StandInSettings:
+    latency_ms: float = CONFIG.replay_latency_ms
+    jitter_ms: float = CONFIG.replay_jitter_ms
+    error_rate: float = CONFIG.replay_error_rate
+    on_miss: str = CONFIG.replay_on_miss    # "synthetic" | "error"
+    seed: int = 0
+
+
+SETTINGS = StandInSettings()
+_rng = random.Random(SETTINGS.seed)
+_rng_lock = threading.Lock()
+
+
+def configure(**kw) -> StandInSettings:
+    """Đổi tham số stand-in lúc chạy (harness benchmark)."""
+    for k, v in kw.items():
+        if not hasattr(SETTINGS, k):
+            raise TypeError(f"Unknown stand-in setting {k!r}")
+        setattr(SETTINGS, k, v)
+    if "seed" in kw:
+        with _rng_lock:
+            _rng.seed(SETTINGS.seed)
+    return SETTINGS
+
+
+def _draw() -> tuple[float, bool]:
+    """(độ trễ giây, có tạo lỗi không) cho 1 request."""
+    with _rng_lock:
+        delay = max(0.0, _rng.gauss(SETTINGS.latency_ms, SETTINGS.jitter_ms)) / 1000
+        fail = _rng.random() < SETTINGS.error_rate
+    return delay, fail
+
+
+# ----------------------------------------------------------------------
+# Kho bản ghi: 1 file JSON / request, tên = sha1 của request
+# ----------------------------------------------------------------------
+class RecordingStore:
+    def __init__(self, root: Path = RECORDINGS_DIR):
+        self.root = root
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def vision_key(content: bytes, document: bool) -> str:
+        return hashlib.sha1((b"doc|" if document else b"text|") + content).hexdigest()
+
+    @staticmethod
+    def groq_key(model: str, prompt: str) -> str:
+        return hashlib.sha1(f"{model}\0{prompt}".encode()).hexdigest()
+
+    def _path(self, kind: str, key: str) -> Path:
+        return self.root / kind / f"{key}.json"
+
+    def get(self, kind: str, key: str) -> dict | None:
+        p = self._path(kind, key)
+        if not p.exists():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(p.read_text(encoding="utf-8"))
+
+    def put(self, kind: str, key: str, rec: dict) -> None:
+        p = self._path(kind, key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(rec, ensure_ascii=False), encoding="utf-8")
+
+
+STORE = RecordingStore()
+
+
+# ----------------------------------------------------------------------
+# Vision response ⇄ dict (chỉ các trường parser trong ocr.py dùng)
+# ----------------------------------------------------------------------
+def _verts(poly) -> list[list[int]]:
+    return [[v.x, v.y] for v in poly.vertices]
+
+
+def vision_to_dict(resp) -> dict:
+    pages = []
+    for pg in resp.full_text_annotation.pages:
+        pages.append([
+            [[{"conf": w.confidence, "box": _verts(w.bounding_box),
+               "symbols": [[s.text, int(s.property.detected_break.type_)] for s in w.symbols]}
+              for w in para.words]
+             for para in blk.paragraphs]
+            for blk in pg.blocks
+        ])
+    return {
+        "error": resp.error.message,
+        "text": [{"description": a.description, "box": _verts(a.bounding_poly)}
+                 for a in resp.text_annotations],
+        "pages": pages,
+    }
+
+
+def _poly(box) -> NS:
+    return NS(vertices=[NS(x=x, y=y) for x, y in box])
+
+
+def vision_from_dict(d: dict) -> NS:
+    """Object có cùng thuộc tính với `AnnotateImageResponse` (phần parser dùng)."""
+    pages = []
+    for pg in d["pages"]:
+        blocks = []
+        for blk in pg:
+            paras = []
+            for para in blk:
+                words = [NS(confidence=w["conf"], bounding_box=_poly(w["box"]),
+                            symbols=[NS(text=t, property=NS(detected_break=NS(type_=b)))
+                                     for t, b in w["symbols"]])
+                         for w in para]
+                paras.append(NS(words=words))
+            blocks.append(NS(paragraphs=paras))
+        pages.append(NS(blocks=blocks))
+    return NS(
+        error=NS(message=d.get("error", "")),
+        text_annotations=[NS(description=a["description"], bounding_poly=_poly(a["box"]))
+                          for a in d["text"]],
+        full_text_annotation=NS(pages=pages),
+    )
+
+
+# ----------------------------------------------------------------------
+# Response giả lập khi chưa có bản ghi
+# ----------------------------------------------------------------------
+_VI_WORDS = ("Cộng hoà xã hội chủ nghĩa Việt Nam Độc lập Tự do Hạnh phúc giấy "
+             "chứng nhận họ và tên ngày sinh nơi thường trú số định danh cá nhân "
+             "cơ quan cấp hợp đồng lao động điều khoản bên thời hạn").split()
+
+
+def synthetic_vision(content: bytes, document: bool) -> dict:
+    """Trang A4 giả: các dòng chữ đều nhau phủ vùng ảnh, định sẵn theo hash ảnh."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(content)) as im:
+        w, h = im.size
+    rng = random.Random(content[:4096])
+    line_h = max(8, h // 70)
+    char_w = max(4, line_h * 5 // 10)
+    words_all, texts = [], []
+    pages = [[]]
+    para: list = []
+    y = h // 12
+    while y + line_h < h * 11 // 12:
+        x = w // 10
+        line = []
+        while True:
+            word = rng.choice(_VI_WORDS)
+            ww = char_w * len(word)
+            if x + ww > w * 9 // 10:
+                break
+            box = [[x, y], [x + ww, y], [x + ww, y + line_h], [x, y + line_h]]
+            line.append({"conf": 0.98, "box": box,
+                         "symbols": [[c, 0] for c in word[:-1]] + [[word[-1], _SPACE]]})
+            words_all.append({"description": word, "box": box})
+            texts.append(word)
+            x += ww + char_w
+        if line:
+            line[-1]["symbols"][-1][1] = _EOL
+            para.extend(line)
+        if rng.random() < 0.15 and para:          # ~7 dòng / đoạn
+            pages[0].append([para])
+            para = []
+        y += line_h * 2
+    if para:
+        pages[0].append([para])
+    full = {"description": " ".join(texts),
+            "box": [[0, 0], [w, 0], [w, h], [0, h]]}
+    return {"error": "", "text": [full] + words_all, "pages": pages if document else []}
+
+
+def _strip_marks(text: str) -> str:
+    s = unicodedata.normalize("NFKD", text.replace("đ", "d").replace("Đ", "D"))
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+def synthetic_completion(prompt: str) -> str:
+    """'Bản dịch' giả: bỏ dấu tiếng Việt, giữ đúng định dạng output mà parser chờ."""
+    from block_protocol import PROMPT_HEADER
+
+    if prompt.startswith(PROMPT_HEADER):
+        out = []
+        for line in prompt[len(PROMPT_HEADER):].splitlines():
+            obj = json.loads(line)
+            out.append(json.dumps({"id": obj["id"], "en": _strip_marks(obj["vi"])},
+                                  ensure_ascii=False))
+        return "\n".join(out)
+    body = prompt.split("\n\n", 1)[-1].rsplit("\n\nEnglish:", 1)[0]
+    return _strip_marks(body)
+
+
+# ----------------------------------------------------------------------
+# Client stand-in (cùng chữ ký với client thật mà code đang gọi)
+# ----------------------------------------------------------------------
+def _replay_vision(content: bytes, document: bool) -> tuple[NS, float]:
+    delay, fail = _draw()
+    if fail:
+        return NS(error=NS(message="stand-in: injected Vision error"),
+                  text_annotations=[], full_text_annotation=NS(pages=[])), delay
+    key = STORE.vision_key(content, document)
+    rec = STORE.get("vision", key)
+    if rec is None:
+        if SETTINGS.on_miss != "synthetic":
+            raise StandInError(f"No Vision recording for {key}")
+        rec = synthetic_vision(content, document)
+    return vision_from_dict(rec), delay
+
+
+def _replay_groq(model: str, messages: list[dict]) -> tuple[NS, float]:
+    delay, fail = _draw()
+    if fail:
+        raise StandInError(f"stand-in: injected {model} error")
+    prompt = messages[-1]["content"]
+    rec = STORE.get("groq", STORE.groq_key(model, prompt))
+    if rec is None:
+        if SETTINGS.on_miss != "synthetic":
+            raise StandInError(f"No Groq recording for {model}")
+        rec = {"content": synthetic_completion(prompt)}
+    return NS(choices=[NS(message=NS(content=rec["content"]))]), delay
+
+
+class ReplayVisionClient:
+    """Thay cho `vision.ImageAnnotatorClient` (ocr.py)."""
+
+    def text_detection(self, *, image, image_context=None):
+        resp, delay = _replay_vision(image.content, False)
+        time.sleep(delay)
+        return resp
+
+    def document_text_detection(self, *, image, image_context=None):
+        resp, delay = _replay_vision(image.content, True)
+        time.sleep(delay)
+        return resp
+
+
+class ReplayVisionAsyncClient:
+    """Thay cho `vision.ImageAnnotatorAsyncClient` (services.py)."""
+
+    async def batch_annotate_images(self, *, requests):
+        out = []
+        for req in requests:
+            resp, delay = _replay_vision(req.image.content,
+                                         int(req.features[0].type_) == _DOC_FEATURE)
+            await asyncio.sleep(delay)
+            out.append(resp)
+        return NS(responses=out)
+
+
+def _chunk(piece: str) -> NS:
+    return NS(choices=[NS(delta=NS(content=piece))])
+
+
+class _ReplayStream:
+    """`stream=True`: trả từng dòng (cắt đôi để thử việc ghép chunk), độ trễ chia đều
+    cho các dòng – dòng đầu tới sau ~latency / số dòng, như model sinh dần."""
+
+    def __init__(self, content: str, delay: float):
+        lines = content.splitlines(keepends=True) or [""]
+        step = delay / len(lines)
+        # (chờ trước, mẩu text)
+        self._pieces = [(step if k == 0 else 0.0, p) for ln in lines
+                        for k, p in enumerate((ln[:len(ln) // 2], ln[len(ln) // 2:])) if p or k == 0]
+        self.closed = False
+
+    def __iter__(self):
+        for wait, p in self._pieces:
+            time.sleep(wait)
+            if self.closed:
+                return
+            yield _chunk(p)
+
+    async def __aiter__(self):
+        for wait, p in self._pieces:
+            await asyncio.sleep(wait)
+            if self.closed:
+                return
+            yield _chunk(p)
+
+    def close(self):
+        self.closed = True
+
+
+class _Completions:
+    def __init__(self, is_async: bool):
+        self._async = is_async
+
+    def create(self, *, model: str, messages: list[dict], stream: bool = False, **_):
+        resp, delay = _replay_groq(model, messages)
+        if stream:
+            resp, delay = _ReplayStream(resp.choices[0].message.content, delay), 0.0
+        if self._async:
+            async def later():
+                await asyncio.sleep(delay)
+                return resp
+            return later()
+        time.sleep(delay)
+        return resp
+
+
+class ReplayGroqClient:
+    """Thay cho `Groq` / `AsyncGroq`: chỉ có `chat.completions.create`."""
+
+    def __init__(self, is_async: bool = False):
+        self.chat = NS(completions=_Completions(is_async))
+
+
+# ----------------------------------------------------------------------
+# Chế độ record: bọc client thật, lưu response thành công
+# ----------------------------------------------------------------------
+class RecordingVisionClient:
+    def __init__(self, client, store: RecordingStore = STORE):
+        self._client, self._store = client, store
+
+    def _save(self, content: bytes, document: bool, resp):
+        if not resp.error.message:
+            self._store.put("vision", self._store.vision_key(content, document), vision_to_dict(resp))
+
+    def text_detection(self, *, image, image_context=None):
+        resp = self._client.text_detection(image=image, image_context=image_context)
+        self._save(image.content, False, resp)
+        return resp
+
+    def document_text_detection(self, *, image, image_context=None):
+        resp = self._client.document_text_detection(image=image, image_context=image_context)
+        self._save(image.content, True, resp)
+        return resp
+
+    async def batch_annotate_images(self, *, requests):
+        batch = await self._client.batch_annotate_images(requests=requests)
+        for req, resp in zip(requests, batch.responses):
+            self._save(req.image.content, int(req.features[0].type_) == _DOC_FEATURE, resp)
+        return batch
+
+
+class RecordingGroqClient:
+    def __init__(self, client, store: RecordingStore = STORE):
+        self._client, self._store = client, store
+        self.chat = NS(completions=NS(create=self._create))
+
+    def _save(self, kw: dict, content: str):
+        prompt = kw["messages"][-1]["content"]
+        self._store.put("groq", self._store.groq_key(kw["model"], prompt),
+                        {"model": kw["model"], "prompt": prompt, "content": content})
+
+    def _wrap(self, kw: dict, resp):
+        if kw.get("stream"):
+            return _RecordingStream(resp, lambda text: self._save(kw, text))
+        self._save(kw, resp.choices[0].message.content)
+        return resp
+
+    def _create(self, **kw):
+        res = self._client.chat.completions.create(**kw)
+        if inspect.isawaitable(res):
+            async def wait():
+                return self._wrap(kw, await res)
+            return wait()
+        return self._wrap(kw, res)
+
+
+class _RecordingStream:
+    """Bọc stream thật: gom các chunk, đọc hết (không bị đóng giữa chừng) thì mới lưu."""
+
+    def __init__(self, stream, on_complete):
+        self._stream, self._on_complete = stream, on_complete
+        self._parts: list[str] = []
+
+    def _add(self, chunk):
+        if chunk.choices and chunk.choices[0].delta.content:
+            self._parts.append(chunk.choices[0].delta.content)
+        return chunk
+
+    def __iter__(self):
+        for chunk in self._stream:
+            yield self._add(chunk)
+        self._on_complete("".join(self._parts))
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield self._add(chunk)
+        self._on_complete("".join(self._parts))
+
+    def close(self):
+        return self._stream.close()         # AsyncStream.close() là coroutine – nơi gọi await
+
+
+def wrap(client, kind: str, backend: str):
+    """Client thật → client theo backend (`record` bọc lại, `live` giữ nguyên)."""
+    if backend == "record":
+        logging.info("Recording %s responses to %s", kind, STORE.root)
+        return (RecordingVisionClient if kind == "vision" else RecordingGroqClient)(client)
+    return client
@@ -0,0 +1,299 @@
+# services.py – lớp service asyncio cho Vision và Groq
+#
+# * Client được tạo lười, 1 lần cho mỗi event loop và dùng lại (giữ kết nối).
+# * Mỗi service có giới hạn số request đồng thời + timeout riêng.
+# * GUI dùng qua `threading_utils.AsyncBridge`; batch gọi trực tiếp bằng asyncio.
+import asyncio
+import inspect
+import logging
+import time
+import weakref
+from types import SimpleNamespace
+
+import metrics
+from block_protocol import encode_request, parse_line, parse_response
+from blocks import BlockStore
+from chunking import pack_chunks
+from config import BACKEND, CONFIG, CREDENTIALS, GROQ_API_KEY, MODEL_NAME
+
+
+class VisionService:
+    def __init__(self, concurrency: int = CONFIG.vision_concurrency,
+                 timeout: float = CONFIG.vision_timeout_s):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            if BACKEND == "replay":
+                from replay import ReplayVisionAsyncClient
+                self._client = ReplayVisionAsyncClient()
+                return self._client
+            from google.cloud import vision
+            from google.oauth2 import service_account
+            from replay import wrap
+            if not CREDENTIALS:
+                raise RuntimeError("Missing Google credentials")
+            self._client = wrap(vision.ImageAnnotatorAsyncClient(
+                credentials=service_account.Credentials.from_service_account_file(CREDENTIALS)
+            ), "vision", BACKEND)
+        return self._client
+
+    async def text_detection(self, content: bytes, *, document: bool = False):
+        req = self._request(content, document)
+        async with self._sem:
+            with metrics.span("vision", bytes=len(content), document=document):
+                batch = await asyncio.wait_for(
+                    self._get_client().batch_annotate_images(requests=[req]),
+                    self._timeout,
+                )
+                resp = batch.responses[0]
+                if resp.error.message:
+                    raise RuntimeError(resp.error.message)
+        return resp
+
+    @staticmethod
+    def _request(content: bytes, document: bool):
+        if BACKEND == "replay":
+            # stand-in chỉ đọc image.content + features[0].type_ → không cần SDK
+            # (Feature.Type: TEXT_DETECTION = 1, DOCUMENT_TEXT_DETECTION = 11)
+            return SimpleNamespace(image=SimpleNamespace(content=content),
+                                   features=[SimpleNamespace(type_=11 if document else 1)])
+        from google.cloud import vision
+        from ocr import LANGUAGE_HINTS
+
+        feature = (vision.Feature.Type.DOCUMENT_TEXT_DETECTION if document
+                   else vision.Feature.Type.TEXT_DETECTION)
+        return vision.AnnotateImageRequest(
+            image=vision.Image(content=content),
+            features=[vision.Feature(type_=feature)],
+            image_context=vision.ImageContext(language_hints=LANGUAGE_HINTS),
+        )
+
+    async def ocr_layout(self, content: bytes, *, granularity: str = CONFIG.ocr_granularity,
+                         use_cache: bool = True) -> tuple[BlockStore, tuple[int, int]]:
+        """Bản async của `ocr.ocr_vi_layout` (dùng chung cache và parser).
+
+        Hash + đọc/ghi cache, resize và parse chạy qua `asyncio.to_thread`.
+        """
+        from ocr import _cache_lookup, _finish_bytes, prepare_upload
+
+        document = granularity != "word"
+        key, hit = await asyncio.to_thread(_cache_lookup, content, "upload", granularity,
+                                           True, use_cache)
+        if hit is not None:
+            return hit
+        upload, scale = await asyncio.to_thread(prepare_upload, content)
+        resp = await self.text_detection(upload, document=document)
+        return await asyncio.to_thread(_finish_bytes, resp, content, key if use_cache else None,
+                                       document, scale, granularity)
+
+
+class GroqService:
+    def __init__(self, concurrency: int = CONFIG.translate_concurrency,
+                 timeout: float = CONFIG.groq_timeout_s):
+        self._sem = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from replay import ReplayGroqClient, wrap
+            if BACKEND == "replay":
+                self._client = ReplayGroqClient(is_async=True)
+            else:
+                from groq import AsyncGroq
+                self._client = wrap(AsyncGroq(api_key=GROQ_API_KEY, timeout=self._timeout),
+                                    "groq", BACKEND)
+        return self._client
+
+    async def _create(self, prompt: str, model: str, fallback=False) -> str:
+        async with self._sem:
+            with metrics.span("groq", model=model, bytes=len(prompt), fallback=fallback):
+                resp = await asyncio.wait_for(
+                    self._get_client().chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.3,
+                    ),
+                    self._timeout,
+                )
+        return resp.choices[0].message.content.strip()
+
+    async def complete(self, prompt: str, model: str = MODEL_NAME) -> str:
+        """Hedge / circuit breaker theo `translator.POLICY` (model_policy.py)."""
+        from translator import POLICY
+        return await POLICY.run_async(lambda m, fallback: self._create(prompt, m, fallback), model)
+
+    async def _stream(self, prompt: str, model: str, on_line, fallback=False) -> None:
+        """Stream 1 completion; `on_line(dòng)` được gọi ngay khi nhận đủ 1 dòng."""
+        async with self._sem:
+            with metrics.span("groq", model=model, bytes=len(prompt), fallback=fallback,
+                              stream=True) as sp:
+                t0 = time.perf_counter()
+                stream = await asyncio.wait_for(
+                    self._get_client().chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        temperature=0.3,
+                        stream=True,
+                    ),
+                    self._timeout,
+                )
+
+                first_ms = None
+
+                async def consume():
+                    nonlocal first_ms
+                    buf = ""
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        buf += chunk.choices[0].delta.content or ""
+                        *lines, buf = buf.split("\n")
+                        for line in lines:
+                            if first_ms is None:
+                                first_ms = (time.perf_counter() - t0) * 1000
+                            on_line(line)
+                    if buf:
+                        on_line(buf)
+
+                try:
+                    await asyncio.wait_for(consume(), self._timeout)
+                finally:
+                    closed = stream.close()         # AsyncStream: coroutine; stand-in: None
+                    if inspect.isawaitable(closed):
+                        await closed
+                if first_ms is not None:
+                    sp.set(first_line_ms=round(first_ms, 1))
+
+    async def _stream_blocks(self, prompt: str, model: str, expected: set[int],
+                             emit) -> dict[int, str]:
+        """1 request JSONL dạng stream: dòng nào parse được là `emit(id, en)` ngay.
+
+        Breaker đang mở → stream từ model dự phòng (stream không hedge được).
+        Lỗi trước khi có block nào → gửi lại không stream qua `complete`; lỗi giữa
+        chừng → trả về phần đã có, ID còn thiếu để vòng retry gửi lại.
+        """
+        from translator import POLICY
+
+        got: dict[int, str] = {}
+
+        def feed(line: str):
+            res = parse_line(line, expected)
+            if res and res[0] not in got:
+                got[res[0]] = res[1]
+                emit(*res)
+
+        m = POLICY.route(model)
+        started, t0 = POLICY.clock(), time.perf_counter()
+        try:
+            await self._stream(prompt, m, feed, fallback=m != model and "breaker")
+        except asyncio.CancelledError:
+            POLICY.cancelled(m)
+            raise
+        except Exception as e:
+            POLICY.record(m, (time.perf_counter() - t0) * 1000, False, started)
+            if got:
+                logging.warning("%s stream failed after %d block (%s)", m, len(got), e)
+                return got
+            logging.warning("%s stream failed (%s), retry without streaming", m, e)
+            for line in (await self.complete(prompt, model)).splitlines():
+                feed(line)
+            return got
+        POLICY.record(m, (time.perf_counter() - t0) * 1000, True, started)
+        return got
+
+    # ------------------------------------------------------------------
+    async def translate_blocks(self, texts: list[str], model: str = MODEL_NAME, *,
+                               on_block=None) -> list[str]:
+        """Bản async của `translator.translate_blocks`: các chunk chạy chung 1 loop.
+
+        `on_block(i, en)`: stream – gọi (từ thread của loop) ngay khi block `i` có
+        bản dịch: block lấy từ TM trước, rồi từng dòng model trả về.
+        Tra/ghi TM (SQLite) chạy qua `asyncio.to_thread`, không chặn loop.
+        """
+        from translator import TM, _tm_merge, _tm_split, merge_chunks
+
+        out, todo = await asyncio.to_thread(_tm_split, texts, TM)
+        if on_block is not None:
+            for i, en in enumerate(out):
+                if en:
+                    on_block(i, en)
+        if not todo:
+            return out
+        groups = list(todo.values())
+        srcs = [texts[idx[0]].strip() for idx in groups]
+
+        def emitter(idx: list[int]):
+            # id trong chunk → vị trí trong srcs → mọi block trùng text
+            def emit(j: int, en: str):
+                for i in groups[idx[j]]:
+                    on_block(i, en)
+            return emit
+
+        chunks = pack_chunks(srcs, CONFIG.translate_chunk_tokens)
+        with metrics.span("translate", blocks=len(srcs), stream=on_block is not None):
+            results = await asyncio.gather(
+                *(self._translate_chunk([srcs[i] for i in idx], model,
+                                        None if on_block is None else emitter(idx))
+                  for idx in chunks)
+            )
+        return _tm_merge(texts, out, todo, merge_chunks(len(srcs), chunks, results))
+
+    async def _translate_chunk(self, srcs: list[str], model: str, emit=None) -> list[str]:
+        from translator import TM, IdRetry, delim_prompt, split_delimited, tm_add
+
+        if CONFIG.translate_protocol != "jsonl":
+            # " ### " chỉ tách được khi đã có cả bản dịch → không stream
+            res, pairs = split_delimited(await self.complete(delim_prompt(srcs), model), srcs)
+            await asyncio.to_thread(tm_add, TM, pairs)
+            if emit is not None:
+                for j, en in enumerate(res):
+                    emit(j, en)
+            return res
+
+        job = IdRetry(srcs)
+        for pending in job.rounds():
+            if emit is None:
+                res = parse_response(await self.complete(encode_request(pending), model),
+                                     set(pending))
+            else:
+                res = await self._stream_blocks(encode_request(pending), model, set(pending), emit)
+            await asyncio.to_thread(tm_add, TM, job.accept(res))
+        return job.result()
+
+
+# ----------------------------------------------------------------------
+# 1 bộ service cho mỗi event loop (semaphore/client không dùng chéo loop)
+# ----------------------------------------------------------------------
+_PER_LOOP: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+
+def _services() -> tuple[VisionService, GroqService]:
+    loop = asyncio.get_running_loop()
+    svc = _PER_LOOP.get(loop)
+    if svc is None:
+        svc = _PER_LOOP[loop] = (VisionService(), GroqService())
+    return svc
+
+
+def vision_service() -> VisionService:
+    return _services()[0]
+
+
+def groq_service() -> GroqService:
+    return _services()[1]
+
+
+async def ocr_layout_async(content: bytes) -> tuple[BlockStore, tuple[int, int]]:
+    return await vision_service().ocr_layout(content)
+
+
+async def translate_blocks_async(texts: list[str], page: str | None = None,
+                                 on_block=None) -> list[str]:
+    """`page`: mã trang gắn vào các span đo thời gian (metrics.py); `on_block`: xem
+    `GroqService.translate_blocks` (stream)."""
+    with metrics.page_scope(page):
+        return await groq_service().translate_blocks(texts, on_block=on_block)
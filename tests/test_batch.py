@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pytest
+
+from batch import output_stems
+
+
+def test_unique_stems_unchanged():
+    srcs = [Path("a.png"), Path("b.jpg")]
+    assert output_stems(srcs) == {Path("a.png"): "a", Path("b.jpg"): "b"}
+
+
+def test_same_stem_different_suffix_get_distinct_names():
+    srcs = [Path("a.jpg"), Path("a.png"), Path("A.TIF"), Path("b.jpg")]
+    assert output_stems(srcs) == {Path("a.jpg"): "a_jpg", Path("a.png"): "a_png",
+                                  Path("A.TIF"): "A_TIF", Path("b.jpg"): "b"}
+
+
+def test_unresolvable_clash_fails():
+    with pytest.raises(ValueError):
+        output_stems([Path("a.png"), Path("a.jpg"), Path("a_png.bmp")])
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+import translator
+from block_protocol import encode_request, parse_line, parse_response
+from config import CONFIG
+from services import GroqService
+
+
+def _resp(*pairs) -> str:
+    return "\n".join(json.dumps({"id": i, "en": en}, ensure_ascii=False) for i, en in pairs)
+
+
+def test_encode_request_one_line_per_block():
+    body = encode_request({3: "Họ và tên", 7: "Ngày sinh"}).splitlines()[-2:]
+    assert [json.loads(line) for line in body] == [{"id": 3, "vi": "Họ và tên"},
+                                                   {"id": 7, "vi": "Ngày sinh"}]
+
+
+@pytest.mark.parametrize("line, expected", [
+    ('{"id": 1, "en": " Full name "}', (1, "Full name")),
+    ('{"id": "1", "en": "Full name"},', (1, "Full name")),
+    ('{"id": 9, "en": "x"}', None),                   # ID lạ
+    ('{"id": 1, "en": "Full na', None),               # JSON hỏng
+    ('{"id": 1, "text": "x"}', None),                 # thiếu "en"
+    ('{"id": 1, "en": 5}', None),
+    ('["id", 1]', None),
+    ("```json", None),
+    ("Here is the translation:", None),
+    ("", None),
+])
+def test_parse_line(line, expected):
+    assert parse_line(line, {1, 2}) == expected
+
+
+def test_parse_response_tolerates_noise():
+    text = "\n".join([
+        "Sure! Here are the translations:",
+        "```json",
+        _resp((0, "Full name")),
+        '{"id": 1, "en": "Date of bi',                # hỏng → thiếu ID 1
+        _resp((0, "Name (again)")),                   # trùng → giữ bản đầu
+        _resp((5, "Unknown")),                        # ID không gửi đi
+        _resp((2, "Address")),
+        "```",
+    ])
+    assert parse_response(text, {0, 1, 2}) == {0: "Full name", 2: "Address"}
+
+
+def test_parse_response_missing_ids():
+    assert parse_response(_resp((1, "b")), {0, 1, 2}) == {1: "b"}
+
+
+def test_translate_chunk_resends_only_missing_ids(monkeypatch):
+    sent: list[set[int]] = []
+    answers = iter([_resp((0, "a"), (2, "c")), _resp((1, "b"))])
+
+    def fake_complete(prompt, model=None):
+        ids = {json.loads(line)["id"] for line in prompt.splitlines() if line.startswith("{")}
+        sent.append(ids)
+        return next(answers)
+
+    monkeypatch.setattr(translator, "_complete", fake_complete)
+    res = translator._translate_chunk_ids(["một", "hai", "ba"], "m", None)
+    assert res == ["a", "b", "c"]
+    assert sent == [{0, 1, 2}, {1}]
+
+
+def test_translate_chunk_gives_up_after_last_retry(monkeypatch, caplog):
+    calls = []
+
+    def fake_complete(prompt, model=None):
+        calls.append(prompt)
+        return _resp((0, "a"))
+
+    monkeypatch.setattr(translator, "_complete", fake_complete)
+    with caplog.at_level(logging.WARNING):
+        res = translator._translate_chunk_ids(["một", "hai"], "m", None)
+    assert res == ["a", ""]
+    assert len(calls) == 1 + CONFIG.translate_max_retries
+    msgs = [r.getMessage() for r in caplog.records]
+    assert sum("gửi lại" in m for m in msgs) == CONFIG.translate_max_retries
+    assert "bỏ qua" in msgs[-1]
+
+
+def test_async_translate_chunk_resends_only_missing_ids(monkeypatch):
+    sent: list[set[int]] = []
+    answers = iter([_resp((1, "b")), _resp((0, "a"), (2, "c"))])
+
+    async def fake_complete(self, prompt, model=None):
+        sent.append({json.loads(line)["id"] for line in prompt.splitlines() if line.startswith("{")})
+        return next(answers)
+
+    monkeypatch.setattr(GroqService, "complete", fake_complete)
+    monkeypatch.setattr(translator, "TM", None)
+    res = asyncio.run(GroqService()._translate_chunk(["một", "hai", "ba"], "m"))
+    assert res == ["a", "b", "c"]
+    assert sent == [{0, 1, 2}, {0, 2}]
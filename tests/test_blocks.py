@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from blocks import BlockStore, atomic_write, boxes_path, read_boxes, write_boxes
+
+
+def _words() -> BlockStore:
+    # 2 đoạn: đoạn 0 có dòng 0 (2 từ) + dòng 1 (1 từ), đoạn 1 có dòng 2 (1 từ)
+    return BlockStore(
+        [[10, 10, 40, 20], [60, 12, 30, 20], [10, 40, 50, 20], [10, 100, 80, 30]],
+        ["Họ", "tên", "Nguyễn", "Địa chỉ"],
+        conf=[0.9, 0.7, 0.8, 1.0],
+        line_id=[0, 0, 1, 2],
+        par_id=[0, 0, 0, 1],
+    )
+
+
+def test_grouped_lines():
+    lines = _words().grouped("line")
+    assert lines.texts() == ["Họ tên", "Nguyễn", "Địa chỉ"]
+    assert lines.box.tolist()[0] == [10, 10, 80, 22]
+    assert np.allclose(lines.conf, [0.8, 0.8, 1.0])
+    assert lines.children(0).texts() == ["Họ", "tên"]
+    assert lines.children(2).texts() == ["Địa chỉ"]
+
+
+def test_grouped_paragraphs():
+    pars = _words().grouped("paragraph")
+    assert pars.texts() == ["Họ tên Nguyễn", "Địa chỉ"]
+    assert pars.box.tolist()[0] == [10, 10, 80, 50]
+    assert (pars.line_id == -1).all()
+    assert pars.children(0).texts() == ["Họ", "tên", "Nguyễn"]
+
+
+def test_grouped_without_ids_is_identity():
+    b = BlockStore([[0, 0, 1, 1]], ["x"])
+    assert b.grouped("line") is b
+    assert _words().grouped("word").words is None
+
+
+def test_npz_roundtrip_keeps_words(tmp_path):
+    lines = _words().grouped("line")
+    img = tmp_path / "page.jpg"
+    write_boxes(img, lines)
+    assert boxes_path(img, ".npz").exists()
+    back = read_boxes(img)
+    assert back.texts() == lines.texts()
+    assert back.box.tolist() == lines.box.tolist()
+    assert back.words.texts() == lines.words.texts()
+    assert back.to_records() == lines.to_records()
+
+
+def test_read_boxes_falls_back_to_json(tmp_path):
+    img = tmp_path / "page.jpg"
+    write_boxes(img, _words())
+    boxes_path(img, ".npz").unlink()
+    assert read_boxes(img).to_records() == _words().to_records()
+
+
+def test_concat_renumbers_ids():
+    a = _words().grouped("line")
+    b = _words().grouped("line")
+    c = BlockStore.concat([a, BlockStore.empty(), b])
+    assert len(c) == 6 and len(c.words) == 8
+    assert c.line_id.tolist() == [0, 1, 2, 3, 4, 5]
+    assert c.par_id.tolist() == [0, 0, 1, 3, 3, 4]
+    assert c.children(3).texts() == ["Họ", "tên"]        # từ con đi theo id mới
+
+
+def test_concat_trivial_cases():
+    a = _words()
+    assert BlockStore.concat([]).texts() == []
+    assert BlockStore.concat([BlockStore.empty(), a]) is a
+
+
+def test_atomic_write_leaves_nothing_on_failure(tmp_path):
+    dst = tmp_path / "page_vi.txt"
+    dst.write_text("cũ", encoding="utf-8")
+
+    def broken(tmp):
+        tmp.write_text("ghi dở", encoding="utf-8")
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        atomic_write(dst, broken)
+    assert dst.read_text(encoding="utf-8") == "cũ"
+    assert [p.name for p in tmp_path.iterdir()] == ["page_vi.txt"]
@@ -0,0 +1,26 @@
+import threading
+import time
+
+import numpy as np
+
+from camera import FrameGrabber, rotate
+
+
+def test_burst_restarts_when_rotation_changes():
+    g = FrameGrabber(cap=None)           # không start thread webcam: tự đẩy frame
+    raw = np.zeros((480, 640, 3), np.uint8)
+    g._publish(raw, 0.0, 0)
+
+    def producer():
+        for i, deg in enumerate([0, 90, 90] + [180] * 6, 1):
+            time.sleep(0.02)
+            g._publish(rotate(raw, deg), float(i), deg)
+
+    t = threading.Thread(target=producer)
+    t.start()
+    frames = g.grab_burst(3, timeout=2.0)
+    t.join()
+    # frame 0° và 90° bị bỏ; cả burst là frame 180° (cùng kích thước)
+    assert len(frames) == 3
+    assert {f.shape for f in frames} == {(480, 640, 3)}
+    assert g._full_rot == 180
@@ -0,0 +1,36 @@
+from chunking import estimate_tokens, pack_chunks
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("abcd") == 2
+
+
+def test_empty_input():
+    assert pack_chunks([], 100) == []
+
+
+def test_keeps_order_and_covers_every_block():
+    texts = [f"câu số {i} " * (i % 5 + 1) for i in range(40)]
+    chunks = pack_chunks(texts, 60)
+    assert [i for c in chunks for i in c] == list(range(40))
+
+
+def test_respects_budget():
+    texts = ["x" * 30] * 10                   # 10 + 2 token mỗi block
+    chunks = pack_chunks(texts, 36)
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9]]
+    for c in chunks:
+        assert sum(estimate_tokens(texts[i]) + 2 for i in c) <= 36
+
+
+def test_oversized_block_stands_alone():
+    texts = ["a", "x" * 300, "b"]
+    assert pack_chunks(texts, 20) == [[0], [1], [2]]
+
+
+def test_sep_tokens_count_towards_budget():
+    texts = ["abc"] * 4                       # 1 token mỗi block
+    assert pack_chunks(texts, 4, sep_tokens=0) == [[0, 1, 2, 3]]
+    assert pack_chunks(texts, 4, sep_tokens=1) == [[0, 1], [2, 3]]
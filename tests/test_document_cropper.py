@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+from ui.document_cropper import rectify_to_a4
+from ui.quad_tracker import PageWatcher
+
+CORNERS = np.array([[500, 150], [1400, 170], [1380, 1000], [520, 980]], np.float32)
+
+
+def _frame() -> np.ndarray:
+    img = np.full((1080, 1920), 60, np.uint8)
+    cv2.fillPoly(img, [CORNERS.astype(np.int32)], 230)
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+
+def _corner_error(H: np.ndarray, w: int, h: int) -> float:
+    dest = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], np.float32)
+    got = cv2.perspectiveTransform(CORNERS.reshape(-1, 1, 2), H).reshape(4, 2)
+    return float(np.abs(got - dest).max() * 1000 / w)    # ‰ chiều rộng trang
+
+
+def test_tracked_quad_refines_with_window_for_detect_scale():
+    frame = _frame()
+    scale = PageWatcher(max_side=480).detect_scale(frame.shape)
+    assert scale == 4.0
+    # quad dò trên preview 480 px rồi nhân ×4: sai vài pixel ở ảnh gốc
+    quad = CORNERS + np.array([[6, -5], [-5, 6], [5, 5], [-6, -6]], np.float32)
+    warped, H = rectify_to_a4(frame, quad=quad, quad_scale=scale)
+    h, w = warped.shape[:2]
+    assert _corner_error(H, w, h) < 2
+    _, H_small = rectify_to_a4(frame, quad=quad)                # cửa sổ 5 px: không tới góc
+    assert _corner_error(H_small, w, h) > _corner_error(H, w, h) * 3
@@ -0,0 +1,77 @@
+import numpy as np
+
+from layout import PageLayout, group_lines, page_text
+
+H = 20
+
+
+def _two_columns():
+    # cột trái: 2 dòng (dòng đầu 2 từ), cột phải: 2 dòng; chiều cao chữ 20
+    return {
+        0: (10, 10, 60, H), 1: (80, 10, 60, H),     # trái, dòng 1
+        2: (10, 40, 100, H),                        # trái, dòng 2
+        3: (400, 10, 120, H),                       # phải, dòng 1
+        4: (400, 40, 120, H),                       # phải, dòng 2
+    }
+
+
+def _layout(boxes: dict) -> PageLayout:
+    return PageLayout(list(boxes.values()), ids=list(boxes), h_ref=H)
+
+
+def test_group_lines():
+    box = np.array([[0, 0, 50, H], [60, 2, 50, H], [0, 40, 50, H], [500, 0, 50, H]])
+    lab = group_lines(box, H)
+    assert lab[0] == lab[1]
+    assert len({lab[0], lab[2], lab[3]}) == 3     # dòng dưới; từ quá xa cùng hàng
+
+
+def test_group_lines_trivial():
+    assert group_lines(np.empty((0, 4)), H).tolist() == []
+    assert group_lines(np.array([[0, 0, 5, 5]]), H).tolist() == [0]
+
+
+def test_columns_before_rows():
+    lay = _layout(_two_columns())
+    assert lay.lines() == [[0, 1], [2], [3], [4]]
+    assert lay.reading_order() == [0, 1, 2, 3, 4]
+    cols = lay.line_columns()
+    assert cols[0] == cols[1] != cols[2] == cols[3]
+
+
+def test_text_uses_reading_order():
+    boxes = _two_columns()
+    texts = {0: "Họ", 1: "tên", 2: "Nguyễn Văn A", 3: "Ngày sinh", 4: ""}
+    assert _layout(boxes).text(texts) == "Họ tên\nNguyễn Văn A\nNgày sinh"
+    assert page_text(np.array(list(boxes.values())), [texts[i] for i in boxes], H) \
+        == "Họ tên\nNguyễn Văn A\nNgày sinh"
+
+
+def test_move_splits_and_joins_lines():
+    lay = _layout(_two_columns())
+    lay.move(1, 10, 70)                          # rời dòng 1 (trái) xuống dưới dòng 2
+    assert [0] in lay.lines() and [1] in lay.lines()
+    lay.move(1, 120, 40)                         # nối vào cuối dòng 2
+    assert [2, 1] in lay.lines()
+    assert lay.box(1).tolist() == [120, 40, 60, H]
+
+
+def test_upsert_and_remove():
+    lay = _layout(_two_columns())
+    lay.upsert(9, (530, 10, 40, H))              # block mới cạnh dòng phải
+    assert 9 in lay and [3, 9] in lay.lines()
+    lay.remove(3)
+    assert 3 not in lay and [9] in lay.lines()
+    lay.remove(3)                                # xoá lần 2: không lỗi
+    for bid in (0, 1, 2, 4, 9):
+        lay.remove(bid)
+    assert lay.lines() == [] and lay.text({}) == ""
+
+
+def test_matches_full_rebuild_after_moves():
+    boxes = _two_columns()
+    lay = _layout(boxes)
+    for bid, (x, y) in {2: (420, 70), 0: (10, 40), 4: (10, 10)}.items():
+        lay.move(bid, x, y)
+        boxes[bid] = (x, y, *boxes[bid][2:])
+    assert lay.lines() == _layout(boxes).lines()
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import pytest
+
+from model_policy import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ModelPolicy
+
+PRIMARY, FALLBACK = "primary", "fallback"
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+# ----------------------------------------------------------------------
+# CircuitBreaker
+# ----------------------------------------------------------------------
+def _opened(clock, failures=3, cooldown=10.0) -> CircuitBreaker:
+    br = CircuitBreaker(failures, cooldown, clock)
+    for _ in range(failures):
+        br.failure(clock())
+    assert br.state == OPEN
+    return br
+
+
+def test_opens_after_consecutive_failures(clock):
+    br = CircuitBreaker(3, 10.0, clock)
+    assert not br.failure(clock()) and not br.failure(clock())
+    br.success(clock())                       # chuỗi lỗi bị ngắt
+    assert not br.failure(clock()) and not br.failure(clock())
+    assert br.state == CLOSED
+    assert br.failure(clock())
+    assert br.state == OPEN and not br.allow()
+
+
+def test_half_open_allows_one_probe_after_cooldown(clock):
+    br = _opened(clock)
+    clock.t += 9.9
+    assert not br.allow()
+    clock.t += 0.1
+    assert br.allow() and br.state == HALF_OPEN
+    assert not br.allow()                     # chỉ 1 request thử
+    br.abort()                                # request thử bị huỷ → cho request sau thử
+    assert br.allow()
+
+
+def test_probe_success_closes(clock):
+    br = _opened(clock)
+    clock.t += 10
+    assert br.allow()
+    br.success(clock())
+    assert br.state == CLOSED and br.allow()
+
+
+def test_probe_failure_reopens(clock):
+    br = _opened(clock)
+    clock.t += 10
+    assert br.allow()
+    assert br.failure(clock())
+    assert br.state == OPEN and not br.allow()
+    clock.t += 10
+    assert br.allow()
+
+
+def test_late_results_do_not_change_state(clock):
+    started = clock()                         # request gửi khi breaker còn đóng
+    clock.t += 1
+    br = _opened(clock)
+    br.success(started)                       # primary bị hedge trả lời muộn
+    assert br.state == OPEN and not br.allow()
+
+    clock.t += 10
+    assert br.allow() and br.state == HALF_OPEN
+    br.success(started)
+    assert br.state == HALF_OPEN
+    assert not br.failure(started)            # lỗi muộn cũng không mở lại
+    assert br.state == HALF_OPEN
+    br.success(clock())                       # request thử
+    assert br.state == CLOSED
+
+
+# ----------------------------------------------------------------------
+# ModelPolicy
+# ----------------------------------------------------------------------
+def _policy(clock, hedge_after=None) -> ModelPolicy:
+    pol = ModelPolicy(FALLBACK, hedge=hedge_after is not None, clock=clock)
+    pol.hedge_after = lambda model: hedge_after
+    return pol
+
+
+def test_record_late_success_keeps_breaker_open(clock):
+    pol = _policy(clock)
+    started = clock()
+    clock.t += 1
+    for _ in range(pol._breaker(PRIMARY).failures):
+        pol.record(PRIMARY, 5.0, False, clock())
+    pol.record(PRIMARY, 900.0, True, started)
+    assert pol.snapshot()["models"][PRIMARY]["breaker"] == OPEN
+    assert pol.route(PRIMARY) == FALLBACK and pol.routed == 1
+
+
+def test_run_falls_back_on_error_then_routes_while_open(clock):
+    pol = _policy(clock)
+    calls = []
+
+    def call(model, fallback):
+        calls.append((model, fallback))
+        if model == PRIMARY:
+            raise RuntimeError("503")
+        return model
+
+    n = pol._breaker(PRIMARY).failures
+    for _ in range(n):
+        assert pol.run(call, PRIMARY) == FALLBACK
+    assert pol.run(call, PRIMARY) == FALLBACK
+    assert calls[-1] == (FALLBACK, "breaker")
+    assert [c for c in calls if c[0] == PRIMARY] == [(PRIMARY, False)] * n
+
+
+def _gated_call(release: dict[str, threading.Event]):
+    def call(model, fallback):
+        if not release[model].wait(5):
+            raise TimeoutError(model)
+        return model
+    return call
+
+
+def test_hedge_not_sent_when_primary_is_fast(clock):
+    pol = _policy(clock, hedge_after=1.0)
+    ev = {PRIMARY: threading.Event(), FALLBACK: threading.Event()}
+    ev[PRIMARY].set()
+    assert pol.run(_gated_call(ev), PRIMARY) == PRIMARY
+    assert pol.hedged == 0
+
+
+def test_hedge_wins_when_primary_is_slow(clock):
+    pol = _policy(clock, hedge_after=0.02)
+    ev = {PRIMARY: threading.Event(), FALLBACK: threading.Event()}
+    ev[FALLBACK].set()
+    try:
+        assert pol.run(_gated_call(ev), PRIMARY) == FALLBACK
+        assert (pol.hedged, pol.hedge_wins) == (1, 1)
+    finally:
+        ev[PRIMARY].set()
+
+
+def test_primary_wins_if_it_answers_before_the_hedge(clock):
+    pol = _policy(clock, hedge_after=0.02)
+    ev = {PRIMARY: threading.Event(), FALLBACK: threading.Event()}
+
+    def call(model, fallback):
+        if model == FALLBACK:
+            ev[PRIMARY].set()                 # primary trả lời khi hedge vừa được gửi
+        return _gated_call(ev)(model, fallback)
+
+    try:
+        assert pol.run(call, PRIMARY) == PRIMARY
+        assert (pol.hedged, pol.hedge_wins) == (1, 0)
+    finally:
+        ev[FALLBACK].set()
+
+
+def test_async_hedge_wins_when_primary_is_slow(clock):
+    pol = _policy(clock, hedge_after=0.02)
+
+    async def call(model, fallback):
+        await asyncio.sleep(5 if model == PRIMARY else 0)
+        return model
+
+    async def main():
+        res = await pol.run_async(call, PRIMARY)
+        for t in list(pol._background):       # primary thua cuộc vẫn chạy nền
+            t.cancel()
+        return res
+
+    assert asyncio.run(main()) == FALLBACK
+    assert (pol.hedged, pol.hedge_wins) == (1, 1)
@@ -0,0 +1,51 @@
+import os
+
+from ocr_cache import OCRCache
+
+
+def _cache(tmp_path, max_bytes=10_000):
+    return OCRCache(tmp_path / "ocr", max_bytes)
+
+
+def test_get_put_roundtrip(tmp_path):
+    c = _cache(tmp_path)
+    key = OCRCache.make_key(b"img", ["vi"], "text")
+    assert c.get(key) is None
+    c.put(key, {"blocks": [1, 2]})
+    assert c.get(key) == {"blocks": [1, 2]}
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 1
+
+
+def test_key_depends_on_mode_and_hints():
+    k = OCRCache.make_key(b"img", ["vi"], "text")
+    assert k != OCRCache.make_key(b"img", ["vi"], "document")
+    assert k != OCRCache.make_key(b"img", ["en"], "text")
+    assert k != OCRCache.make_key(b"img2", ["vi"], "text")
+
+
+def test_overwrite_does_not_inflate_total(tmp_path):
+    c = _cache(tmp_path)
+    c.put("aa1", {"x": "a" * 100})          # lần đầu: quét thư mục
+    c.put("bb1", {"x": "b" * 100})
+    before = c.stats()["bytes"]
+    for _ in range(20):
+        c.put("bb1", {"x": "b" * 100})
+    assert c.stats()["bytes"] == before == c._scan_size()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    c = _cache(tmp_path, max_bytes=1000)
+    keys = [f"k{i:02d}" for i in range(8)]
+    for t, key in enumerate(keys):
+        c.put(key, {"x": "z" * 200})
+        os.utime(c._path(key), (1000 + t, 1000 + t))
+    assert c.stats()["bytes"] <= 1000
+    assert c.get(keys[-1]) is not None       # mới nhất còn lại
+    assert c.get(keys[0]) is None            # cũ nhất bị xoá
+
+
+def test_disabled_cache_is_noop(tmp_path):
+    c = _cache(tmp_path, max_bytes=0)
+    c.put("k", {"x": 1})
+    assert c.get("k") is None
+    assert not (tmp_path / "ocr").exists()
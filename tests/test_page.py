@@ -0,0 +1,36 @@
+import numpy as np
+
+from page import Page
+
+
+def _page(tmp_path) -> Page:
+    img = np.full((300, 200, 3), 255, np.uint8)
+    img[100:120, 20:180] = 0
+    return Page(image=img, path=tmp_path / "p.jpg")
+
+
+def test_release_drops_pixels_after_save(tmp_path):
+    p = _page(tmp_path)
+    p.upload()
+    p.release()
+    assert p.path.exists()
+    assert p.image is None
+    assert p.size == (200, 300)
+
+
+def test_upload_bytes_survive_release(tmp_path):
+    # key cache OCR "page|…" tính trên bytes upload → phải giống hệt sau release
+    p = _page(tmp_path)
+    before = p.upload()
+    p.release()
+    assert p.upload() == before
+
+
+def test_upload_after_release_reads_file_once(tmp_path):
+    p = _page(tmp_path)
+    p.release()
+    data, scale = p.upload()
+    assert data
+    assert scale > 0
+    p.path.unlink()                      # lần sau không đọc lại file
+    assert p.upload() == (data, scale)
@@ -0,0 +1,42 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+import reportlab
+
+from blocks import BlockStore
+from pdf_export import ExportPage, PdfExporter
+
+# font đi kèm reportlab (không có dấu tiếng Việt – đủ cho test cấu trúc file)
+FONT = Path(reportlab.__file__).parent / "fonts" / "Vera.ttf"
+
+
+def _page(n: int) -> ExportPage:
+    return ExportPage(BlockStore(np.array([[10, 10, 200, 30]]), [f"page {n}"]), (800, 1100),
+                      np.full((1100, 800, 3), 230, np.uint8))
+
+
+def _tmp_dirs() -> set[str]:
+    return {p.name for p in Path(tempfile.gettempdir()).glob("pdf_export_*")}
+
+
+@pytest.mark.parametrize("pages, parts", [(5, 3), (4, 2), (1, 1)])
+def test_chunks_are_concatenated_in_order(tmp_path, pages, parts):
+    pypdf = pytest.importorskip("pypdf")
+    out = tmp_path / "out.pdf"
+    with PdfExporter(out, font=FONT, chunk_pages=2, title="T") as ex:
+        for n in range(pages):
+            ex.add_page(_page(n))
+    assert ex.stats["pages"] == pages and ex.stats["parts"] == parts
+    reader = pypdf.PdfReader(out)
+    assert [p.extract_text().strip() for p in reader.pages] == [f"page {n}" for n in range(pages)]
+
+
+def test_error_still_removes_temp_dir(tmp_path):
+    before = _tmp_dirs()
+    with pytest.raises(ValueError):
+        with PdfExporter(tmp_path / "out.pdf", font=FONT, chunk_pages=1):
+            raise ValueError
+    assert _tmp_dirs() == before
+    assert not (tmp_path / "out.pdf").exists()
@@ -0,0 +1,22 @@
+import numpy as np
+
+from quality import assess, assess_many, best_frame
+
+
+def _frame(h: int, w: int, sharp: bool) -> np.ndarray:
+    img = np.full((h, w, 3), 160, np.uint8)
+    if sharp:
+        img[::8] = 20
+    return img
+
+
+def test_mixed_shapes_are_scored_per_frame():
+    frames = [_frame(480, 640, False), _frame(640, 480, True)]
+    best, scores = best_frame(frames)
+    assert best == 1
+    assert scores == [assess(f) for f in frames]
+
+
+def test_batch_matches_single():
+    frames = [_frame(480, 640, s) for s in (False, True, False)]
+    assert assess_many(frames) == [assess(f) for f in frames]
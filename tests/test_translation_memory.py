@@ -0,0 +1,58 @@
+import pytest
+
+from translation_memory import TranslationMemory, fold, normalize
+from translator import _tm_split, tm_suggestions
+
+
+@pytest.fixture
+def tm(tmp_path):
+    t = TranslationMemory(tmp_path / "tm.sqlite3")
+    yield t
+    t.close()
+
+
+def test_normalize_keeps_diacritics():
+    assert normalize("  Xin   CHÀO ") == "xin chào"
+    assert normalize("ma") != normalize("má")
+    assert fold("Đường phố") == "duong pho"
+
+
+def test_exact_lookup(tm):
+    tm.add("Xin chào", "Hello")
+    m = tm.lookup("  xin   CHÀO")
+    assert m.target == "Hello" and m.exact
+    assert tm.stats()["hits"] == 1
+
+
+def test_fuzzy_only_when_enabled(tm):
+    tm.add("Điều 5. Quyền và nghĩa vụ của các bên", "Article 5. Rights and obligations of the parties")
+    text = "Điều 6. Quyền và nghĩa vụ của các bên"
+    assert tm.lookup(text, fuzzy=False) is None
+    m = tm.lookup(text)
+    assert m is not None and not m.exact and m.score >= 0.85
+    assert tm.stats()["fuzzy_hits"] == 1 and tm.stats()["misses"] == 1
+
+
+def test_diacritics_only_difference_is_never_exact(tm):
+    tm.add("ma", "ghost")
+    m = tm.lookup("má", threshold=0.1)
+    assert m is None or not m.exact
+
+
+def test_split_uses_exact_hits_only(tm):
+    tm.add("Điều 5. Quyền và nghĩa vụ của các bên", "Article 5. Rights and obligations of the parties")
+    tm.add("Xin chào", "Hello")
+    texts = ["Xin chào", "Điều 6. Quyền và nghĩa vụ của các bên", ""]
+    out, todo = _tm_split(texts, tm)
+    assert out == ["Hello", "", ""]
+    assert list(todo.values()) == [[1]]
+
+
+def test_suggestions_skip_the_block_itself(tm):
+    src5 = "Điều 5. Quyền và nghĩa vụ của các bên"
+    src6 = "Điều 6. Quyền và nghĩa vụ của các bên"
+    tm.add_many([(src5, "Article 5"), (src6, "Article 6")])   # src6 vừa được dịch xong
+    sug = tm_suggestions(["Xin chào", src6], tm)
+    assert list(sug) == [1]
+    assert sug[1].source == src5 and sug[1].target == "Article 5"
+    assert tm.stats()["fuzzy_hits"] == 0      # gợi ý không tính vào thống kê tra cứu
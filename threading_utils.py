@@ -1,3 +1,6 @@
+import asyncio
+import threading
+
 from PyQt5.QtCore import QObject, pyqtSignal, QRunnable
 
 class WorkerSignals(QObject):
@@ -18,3 +21,64 @@ class CallableWorker(QRunnable):
             self.sig.done.emit(res)
         except Exception as e:
             self.sig.error.emit(str(e))
+
+
+class AsyncTask:
+    """Coroutine đang chạy trên AsyncBridge; kết quả báo về GUI qua `sig`."""
+
+    def __init__(self):
+        self.future = None
+        self.sig = WorkerSignals()
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+
+class AsyncBridge:
+    """Event loop asyncio chạy trong 1 thread nền, dùng chung cho cả app.
+
+    GUI không block: `run(coro, on_done, on_error)` trả về `AsyncTask`
+    (slot được nối trước khi coroutine chạy nên không lỡ kết quả).
+    Nhiều request có thể cùng bay trên 1 thread.
+    """
+
+    _instance: "AsyncBridge | None" = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        name="asyncio-bridge", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls) -> "AsyncBridge":
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = AsyncBridge()
+            return cls._instance
+
+    def submit(self, coro):
+        """Trả về concurrent.futures.Future (dùng được từ thread thường)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, on_done=None, on_error=None) -> AsyncTask:
+        task = AsyncTask()
+        if on_done is not None:
+            task.sig.done.connect(on_done)
+        if on_error is not None:
+            task.sig.error.connect(on_error)
+        task.future = self.submit(coro)
+
+        def _finish(fut):
+            if fut.cancelled():
+                return
+            exc = fut.exception()
+            if exc is not None:
+                task.sig.error.emit(str(exc) or type(exc).__name__)
+            else:
+                task.sig.done.emit(fut.result())
+
+        task.future.add_done_callback(_finish)
+        return task
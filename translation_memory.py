@@ -0,0 +1,170 @@
+# translation_memory.py – bộ nhớ dịch (TM) cục bộ cho cặp câu Việt → Anh
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from config import CONFIG, TM_PATH
+
+
+def normalize(text: str) -> str:
+    """NFC + gộp khoảng trắng + casefold – giữ nguyên dấu (ma ≠ má)."""
+    return " ".join(unicodedata.normalize("NFC", text).split()).casefold()
+
+
+def fold(text: str) -> str:
+    """Bỏ dấu tiếng Việt (kể cả đ → d); chỉ dùng để lọc ứng viên fuzzy."""
+    nfd = unicodedata.normalize("NFD", normalize(text))
+    base = "".join(ch for ch in nfd if not unicodedata.combining(ch))
+    return base.replace("đ", "d")
+
+
+@dataclass(frozen=True)
+class TMMatch:
+    source: str
+    target: str
+    score: float        # 1.0 = khớp tuyệt đối
+
+    @property
+    def exact(self) -> bool:
+        return self.score >= 1.0
+
+
+class TranslationMemory:
+    """TM lưu trong SQLite.
+
+    * Tra cứu exact theo khoá đã `normalize`.
+    * Tra cứu fuzzy: lọc ứng viên có độ dài gần bằng, chấm điểm bằng
+      `SequenceMatcher` trên text còn dấu, cộng điểm nhẹ nếu bản bỏ dấu trùng.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            src_key TEXT PRIMARY KEY,
+            src     TEXT NOT NULL,
+            tgt     TEXT NOT NULL,
+            fold    TEXT NOT NULL,
+            len     INTEGER NOT NULL,
+            hits    INTEGER NOT NULL DEFAULT 0,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_segments_len ON segments(len);
+    """
+
+    def __init__(self, path: Path | str = TM_PATH):
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(self._SCHEMA)
+        self._lock = threading.Lock()
+        self._pending_hits: dict[str, int] = {}   # ghi dồn cùng lần add tiếp theo
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    def lookup(self, text: str, threshold: float = CONFIG.tm_fuzzy_threshold, *,
+               fuzzy: bool = True) -> TMMatch | None:
+        """Khớp exact, không có thì (nếu `fuzzy`) bản gần đúng nhất có điểm ≥ `threshold`.
+
+        Bản gần đúng là của câu KHÁC (vd. "Điều 5" ↔ "Điều 6") – chỉ để gợi ý.
+        """
+        key = normalize(text)
+        if not key:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT src, tgt FROM segments WHERE src_key = ?", (key,)
+            ).fetchone()
+            if row:
+                self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+                self.hits += 1
+                return TMMatch(row[0], row[1], 1.0)
+
+            match = self._fuzzy(key, threshold) if fuzzy else None
+            if match:
+                self.fuzzy_hits += 1
+            else:
+                self.misses += 1
+            return match
+
+    def suggest(self, text: str, threshold: float = CONFIG.tm_fuzzy_threshold) -> TMMatch | None:
+        """Bản gần đúng nhất của một câu KHÁC trong TM (bỏ qua chính `text`).
+
+        Dùng sau khi dịch xong (lúc đó `text` đã có trong TM); không tính vào hits/misses.
+        """
+        key = normalize(text)
+        if not key:
+            return None
+        with self._lock:
+            return self._fuzzy(key, threshold, exclude=key)
+
+    def _fuzzy(self, key: str, threshold: float, exclude: str | None = None) -> TMMatch | None:
+        n = len(key)
+        # ratio ≥ t  ⇒  độ dài 2 chuỗi không chênh quá (1 - t) / t
+        slack = int(n * (1 - threshold) / max(threshold, 1e-6)) + 1
+        rows = self._db.execute(
+            "SELECT src_key, src, tgt, fold FROM segments "
+            "WHERE len BETWEEN ? AND ? ORDER BY hits DESC LIMIT 500",
+            (n - slack, n + slack),
+        ).fetchall()
+
+        key_fold = fold(key)
+        best, best_score = None, threshold
+        sm = SequenceMatcher(autojunk=False)
+        sm.set_seq2(key)
+        for src_key, src, tgt, src_fold in rows:
+            if src_key == exclude:
+                continue
+            sm.set_seq1(src_key)
+            if sm.real_quick_ratio() < best_score or sm.quick_ratio() < best_score:
+                continue
+            score = sm.ratio()
+            if src_fold == key_fold:
+                # chỉ khác dấu → gần đúng nhưng KHÔNG bao giờ coi là exact
+                score = min(0.99, score + 0.05)
+            if score >= best_score:
+                best, best_score = TMMatch(src, tgt, round(score, 4)), score
+        return best
+
+    # ------------------------------------------------------------------
+    def add(self, source: str, target: str) -> None:
+        self.add_many([(source, target)])
+
+    def add_many(self, pairs: list[tuple[str, str]]) -> None:
+        now = time.time()
+        rows = []
+        for src, tgt in pairs:
+            key = normalize(src)
+            if key and tgt.strip():
+                rows.append((key, unicodedata.normalize("NFC", src.strip()),
+                             tgt.strip(), fold(key), len(key), now))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO segments (src_key, src, tgt, fold, len, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(src_key) DO UPDATE SET tgt = excluded.tgt, updated = excluded.updated",
+                rows,
+            )
+            self._flush_hits()
+
+    def _flush_hits(self) -> None:
+        if self._pending_hits:
+            self._db.executemany(
+                "UPDATE segments SET hits = hits + ? WHERE src_key = ?",
+                [(n, k) for k, n in self._pending_hits.items()],
+            )
+            self._pending_hits.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()
+            return {"segments": size, "hits": self.hits,
+                    "fuzzy_hits": self.fuzzy_hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            with self._db:
+                self._flush_hits()
+            self._db.close()
@@ -1,25 +1,237 @@
 import logging
-from groq import Groq
-from config import GROQ_API_KEY, MODEL_NAME
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import metrics
+from block_protocol import encode_request, parse_response
+from chunking import pack_chunks
+from config import BACKEND, CONFIG, GROQ_API_KEY, MODEL_NAME, TM_PATH
+from model_policy import ModelPolicy
+from replay import ReplayGroqClient, wrap
+from translation_memory import TMMatch, TranslationMemory, normalize
 
-groq_client = Groq(api_key=GROQ_API_KEY)
 
-def translate_vi2en(text: str, model: str = MODEL_NAME) -> str:
-    prompt = (
+@lru_cache(maxsize=1)
+def groq_client():
+    """Client Groq (sync) theo BACKEND – SDK chỉ được import ở lần gọi đầu."""
+    if BACKEND == "replay":
+        return ReplayGroqClient()
+    from groq import Groq
+    return wrap(Groq(api_key=GROQ_API_KEY), "groq", BACKEND)
+
+
+# replay: bản dịch giả lập không được lọt vào bộ nhớ dịch thật
+TM = TranslationMemory(":memory:" if BACKEND == "replay" else TM_PATH)
+
+BLOCK_SEP = " ### "
+FALLBACK_MODEL = "openai/gpt-oss-8b-instant"
+# latency/lỗi theo model + circuit breaker, dùng chung với services.GroqService
+POLICY = ModelPolicy(FALLBACK_MODEL)
+
+def build_prompt(text: str) -> str:
+    return (
         "Bạn là một dịch giả chuyên nghiệp cho các giấy tờ của bộ phận 1 cửa tại trung tâm hành chỉnh công, dịch chính xác và tự nhiên..."
         f"\n\n{text.strip()}\n\nEnglish:"
     )
-    try:
-        resp = groq_client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-    except Exception as e:
-        logging.warning("%s failed (%s), fallback to 8B", model, e)
-        resp = groq_client.chat.completions.create(
-            model="openai/gpt-oss-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-        )
-    return resp.choices[0].message.content.strip()
+
+
+def translate_vi2en(text: str, model: str = MODEL_NAME) -> str:
+    return _complete(build_prompt(text), model)
+
+
+def _complete(prompt: str, model: str = MODEL_NAME) -> str:
+    """Gọi chat completion theo POLICY: hedge sang model dự phòng khi chậm/lỗi."""
+    def call(m: str, fallback) -> str:
+        with metrics.span("groq", model=m, bytes=len(prompt), fallback=fallback):
+            resp = groq_client().chat.completions.create(
+                model=m,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+            )
+        return resp.choices[0].message.content.strip()
+
+    return POLICY.run(call, model)
+
+
+def translate_blocks(
+    texts: list[str],
+    model: str = MODEL_NAME,
+    *,
+    tm: TranslationMemory | None = TM,
+) -> list[str]:
+    """Dịch từng block, trả về list cùng độ dài/thứ tự với `texts`.
+
+    Block đã có trong TM được lấy ngay; chỉ các block còn thiếu
+    (gộp trùng) mới được gửi lên model theo `CONFIG.translate_protocol`.
+    """
+    out, todo = _tm_split(texts, tm)
+    if not todo:
+        logging.info("TM: %d/%d block lấy từ bộ nhớ dịch", len(texts), len(texts))
+        return out
+
+    srcs = [texts[idx[0]].strip() for idx in todo.values()]
+    with metrics.span("translate", blocks=len(srcs)):
+        parts = _translate_chunked(srcs, model, tm)
+    return _tm_merge(texts, out, todo, parts)
+
+
+def _tm_split(
+    texts: list[str], tm: TranslationMemory | None
+) -> tuple[list[str], dict[str, list[int]]]:
+    """Lấy bản dịch exact trong TM; trả về (out, todo: khoá normalize → các vị trí cần dịch)."""
+    out = [""] * len(texts)
+    todo: dict[str, list[int]] = {}
+    for i, txt in enumerate(texts):
+        if not txt.strip():
+            continue
+        m = tm.lookup(txt, fuzzy=False) if tm else None
+        if m:
+            out[i] = m.target
+        else:
+            todo.setdefault(normalize(txt), []).append(i)
+    return out, todo
+
+
+def tm_suggestions(
+    texts: list[str], tm: TranslationMemory | None = TM,
+    threshold: float = CONFIG.tm_fuzzy_threshold,
+) -> dict[int, TMMatch]:
+    """Bản gần đúng trong TM cho từng block – để user xem và chọn.
+
+    Không bao giờ được ghép vào kết quả dịch: câu trong TM là câu khác.
+    """
+    out: dict[int, TMMatch] = {}
+    if tm is None:
+        return out
+    for i, txt in enumerate(texts):
+        if txt.strip():
+            m = tm.suggest(txt, threshold)
+            if m is not None:
+                out[i] = m
+    return out
+
+
+def _tm_merge(texts: list[str], out: list[str], todo: dict[str, list[int]], parts: list[str]) -> list[str]:
+    for idx, en in zip(todo.values(), parts):
+        for i in idx:
+            out[i] = en
+    logging.info("TM: %d block từ bộ nhớ dịch, %d block gửi lên model",
+                 sum(1 for t in texts if t.strip()) - sum(map(len, todo.values())), len(parts))
+    return out
+
+
+def _translate_chunked(srcs: list[str], model: str, tm: TranslationMemory | None) -> list[str]:
+    """Chia `srcs` theo `CONFIG.translate_chunk_tokens` và dịch các chunk song song.
+
+    Độ trễ tổng ≈ chunk lớn nhất thay vì cả trang; kết quả ghép lại đúng thứ tự.
+    """
+    chunks = pack_chunks(srcs, CONFIG.translate_chunk_tokens)
+    n_workers = max(1, min(CONFIG.translate_concurrency, len(chunks)))
+    page = metrics.current_page()
+
+    def one(idx: list[int]) -> list[str]:
+        with metrics.page_scope(page):
+            return _translate_chunk([srcs[i] for i in idx], model, tm)
+
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        results = list(pool.map(one, chunks))
+    if len(chunks) > 1:
+        logging.info("Dịch %d block trong %d chunk (tối đa %d song song)",
+                     len(srcs), len(chunks), n_workers)
+
+    return merge_chunks(len(srcs), chunks, results)
+
+
+def _translate_chunk(srcs: list[str], model: str, tm: TranslationMemory | None) -> list[str]:
+    if CONFIG.translate_protocol == "jsonl":
+        return _translate_chunk_ids(srcs, model, tm)
+    return _translate_chunk_delim(srcs, model, tm)
+
+
+def _translate_chunk_ids(srcs: list[str], model: str, tm: TranslationMemory | None) -> list[str]:
+    """Gửi block kèm ID (JSON Lines); chỉ gửi lại những ID thiếu/hỏng."""
+    job = IdRetry(srcs)
+    for pending in job.rounds():
+        res = parse_response(_complete(encode_request(pending), model), set(pending))
+        tm_add(tm, job.accept(res))
+    return job.result()
+
+
+def _translate_chunk_delim(srcs: list[str], model: str, tm: TranslationMemory | None) -> list[str]:
+    """1 request: nối block bằng `BLOCK_SEP`, tách lại và lưu vào TM nếu khớp số lượng."""
+    parts, pairs = split_delimited(_complete(delim_prompt(srcs), model), srcs)
+    tm_add(tm, pairs)
+    return parts
+
+
+# ----------------------------------------------------------------------
+# Dùng chung với services.GroqService (đường async): retry theo ID, ghép
+# chunk, tách " ### ", ghi TM – nơi gọi tự quyết chạy ở thread nào
+# ----------------------------------------------------------------------
+class IdRetry:
+    """Trạng thái gửi/gửi lại các block theo ID của 1 chunk.
+
+        job = IdRetry(srcs)
+        for pending in job.rounds():            # {id: text} cần gửi lượt này
+            pairs = job.accept(parse_response(...))
+        return job.result()
+    """
+
+    def __init__(self, srcs: list[str]):
+        self.srcs = srcs
+        self.pending = dict(enumerate(srcs))
+        self.got: dict[int, str] = {}
+
+    def rounds(self):
+        for attempt in range(1 + CONFIG.translate_max_retries):
+            yield self.pending
+            if not self.pending:
+                return
+            _log_missing(self.pending, len(self.srcs), attempt)
+
+    def accept(self, res: dict[int, str]) -> list[tuple[str, str]]:
+        """Ghi nhận bản dịch của lượt vừa gửi; trả về các cặp (vi, en) mới để lưu TM."""
+        pairs = [(self.pending[i], en) for i, en in res.items() if i in self.pending]
+        self.got.update(res)
+        self.pending = {i: t for i, t in self.pending.items() if i not in res}
+        return pairs
+
+    def result(self) -> list[str]:
+        return [self.got.get(i, "") for i in range(len(self.srcs))]
+
+
+def _log_missing(pending: dict[int, str], total: int, attempt: int) -> None:
+    """Sau lần gửi thứ `attempt` (đếm từ 0) vẫn thiếu `pending`: sẽ gửi lại, hay bỏ qua."""
+    if attempt < CONFIG.translate_max_retries:
+        logging.warning("Thiếu %d/%d block (ID %s) – gửi lại lần %d",
+                        len(pending), total, sorted(pending)[:10], attempt + 1)
+    else:
+        logging.warning("Thiếu %d/%d block (ID %s) sau %d lần gửi – bỏ qua, để trống",
+                        len(pending), total, sorted(pending)[:10], attempt + 1)
+
+
+def tm_add(tm: TranslationMemory | None, pairs: list[tuple[str, str]]) -> None:
+    """Lưu bản dịch model trả về vào TM (ghi SQLite – chặn, không gọi trên event loop)."""
+    if tm is not None and pairs:
+        tm.add_many(pairs)
+
+
+def merge_chunks(n: int, chunks: list[list[int]], results: list[list[str]]) -> list[str]:
+    """Ghép kết quả từng chunk về đúng vị trí trong `srcs` (n block)."""
+    parts = [""] * n
+    for idx, res in zip(chunks, results):
+        for i, en in zip(idx, res):
+            parts[i] = en
+    return parts
+
+
+def delim_prompt(srcs: list[str]) -> str:
+    return build_prompt(BLOCK_SEP.join(srcs))
+
+
+def split_delimited(full_en: str, srcs: list[str]) -> tuple[list[str], list[tuple[str, str]]]:
+    """Tách bản dịch nối bằng `BLOCK_SEP` → (parts, cặp lưu TM – chỉ khi khớp số lượng)."""
+    parts = [p.strip() for p in full_en.split(BLOCK_SEP.strip())]
+    if len(parts) == len(srcs):
+        return parts, list(zip(srcs, parts))
+    logging.warning("Số block trả về (%d) khác số gửi đi (%d)", len(parts), len(srcs))
+    return (parts + [""] * len(srcs))[:len(srcs)], []
@@ -1,15 +1,49 @@
-from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox
-from PyQt5.QtGui import QPixmap, QImage, QKeySequence
+from PyQt5.QtWidgets import QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QMessageBox, QCheckBox, QSpinBox
+from PyQt5.QtGui import QPixmap, QImage, QKeySequence, QPainter, QPen, QPolygonF, QColor
+from PyQt5.QtCore import QPointF
 from PyQt5.QtCore import Qt, QTimer, QThreadPool
 from PyQt5.QtGui import QGuiApplication
 from pathlib import Path
 from datetime import datetime
+import time
 import cv2
 import logging
+import numpy as np
+import metrics
+from camera import FrameGrabber, RateMeter
 from config import CONFIG
+from quality import assess, best_frame
+from threading_utils import CallableWorker
 from ui.document_cropper import rectify_to_a4
-import numpy as np
+from ui.quad_tracker import PageWatcher, TrackState
 from config import CAPTURE_DIR
+from page import Page
+
+def open_webcam() -> cv2.VideoCapture:
+    """Mở webcam + khoá exposure (DirectShow mất 1–3 s) – gọi ở worker, không ở GUI thread."""
+    cap = cv2.VideoCapture(CONFIG.webcam_index, cv2.CAP_DSHOW)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open webcam {CONFIG.webcam_index}")
+
+    # --- Thiết lập độ phân giải + khóa manual-exposure ---
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH,  CONFIG.capture_width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CONFIG.capture_height)
+
+    # 1) tắt hoàn toàn auto-exposure
+    cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)     # 1 = Manual (DirectShow)
+
+    # 2) giảm 1 bước exposure (≈ tối đi 1 stop)
+    cap.set(cv2.CAP_PROP_EXPOSURE, -5)         # gốc thường là –5
+
+    # 3) bù lại ~0,3-0,5 stop bằng gain nhỏ
+    cap.set(cv2.CAP_PROP_GAIN, 1)
+
+    # (tùy chọn) in log để kiểm chứng
+    # print("AutoExp =", cap.get(cv2.CAP_PROP_AUTO_EXPOSURE))
+    # print("Exposure =", cap.get(cv2.CAP_PROP_EXPOSURE))
+    # print("Gain     =", cap.get(cv2.CAP_PROP_GAIN))
+    return cap
+
 
 class CaptureTab(QWidget):
     def __init__(self, on_captured):
@@ -22,29 +56,6 @@ class CaptureTab(QWidget):
         self.on_captured = on_captured
         self.rotate_deg = 0
 
-        # --- Mở webcam ---
-        self.cap = cv2.VideoCapture(CONFIG.webcam_index, cv2.CAP_DSHOW)
-        if not self.cap.isOpened():
-            raise RuntimeError(f"Cannot open webcam {CONFIG.webcam_index}")
-
-        # --- Thiết lập độ phân giải + khóa manual-exposure ---
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH,  CONFIG.capture_width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CONFIG.capture_height)
-
-        # 1) tắt hoàn toàn auto-exposure
-        self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)     # 1 = Manual (DirectShow)
-
-        # 2) giảm 1 bước exposure (≈ tối đi 1 stop)
-        self.cap.set(cv2.CAP_PROP_EXPOSURE, -5)         # gốc thường là –5
-
-        # 3) bù lại ~0,3-0,5 stop bằng gain nhỏ
-        self.cap.set(cv2.CAP_PROP_GAIN, 1)
-
-        # (tùy chọn) in log để kiểm chứng
-        # print("AutoExp =", self.cap.get(cv2.CAP_PROP_AUTO_EXPOSURE))
-        # print("Exposure =", self.cap.get(cv2.CAP_PROP_EXPOSURE))
-        # print("Gain     =", self.cap.get(cv2.CAP_PROP_GAIN))
-
         # --- Phần giao diện hiển thị ---
         self.view = QLabel(alignment=Qt.AlignCenter)
         self.view.setFixedSize(self.preview_w, self.preview_h)
@@ -55,16 +66,34 @@ class CaptureTab(QWidget):
             "color:white; background-color:rgba(0,0,0,120); padding:4px;"
         )
         self.overlay_lbl.move(10, 10)
-        self.overlay_lbl.setFixedWidth(300)
 
         self.rot_l_btn  = QPushButton("⟲")
         self.rot_r_btn  = QPushButton("⟳")
         self.capture_btn = QPushButton("📸 Capture")
+        self.spec_chk    = QCheckBox("Auto OCR + translate")
+        self.spec_chk.setToolTip("Chạy OCR và dịch ở background ngay sau khi chụp")
+        self.spec_chk.setChecked(CONFIG.speculative)
+        self.session_chk = QCheckBox("Multi-page")
+        self.session_chk.setToolTip("Thêm trang vào hồ sơ (tab Document) và chụp tiếp, "
+                                    "OCR + dịch chạy nền")
+        self.auto_chk    = QCheckBox("Auto-capture")
+        self.auto_chk.setToolTip("Tự chụp khi khung trang đứng yên và đủ nét")
+        self.auto_chk.setChecked(CONFIG.auto_capture)
+
+        self.burst_spin  = QSpinBox()
+        self.burst_spin.setRange(1, 15)
+        self.burst_spin.setValue(CONFIG.burst_frames)
+        self.burst_spin.setPrefix("Burst ")
+        self.burst_spin.setToolTip("Số frame mỗi lần chụp – giữ frame nét nhất")
 
         btn_row = QHBoxLayout()
         btn_row.addWidget(self.rot_l_btn)
         btn_row.addWidget(self.rot_r_btn)
         btn_row.addStretch()
+        btn_row.addWidget(self.burst_spin)
+        btn_row.addWidget(self.session_chk)
+        btn_row.addWidget(self.auto_chk)
+        btn_row.addWidget(self.spec_chk)
         btn_row.addWidget(self.capture_btn)
 
         lay = QVBoxLayout(self)
@@ -80,62 +109,220 @@ class CaptureTab(QWidget):
         self.rot_r_btn.setShortcut(QKeySequence("Ctrl+R"))
 
         # --- Bắt đầu luồng preview ---
+        # webcam mở ở worker sau khi cửa sổ đã hiện (xem `_open_camera`); tới lúc đó
+        # chưa có grabber, nút chụp bị khoá
+        # webcam đọc ở thread riêng (đã xoay + thu nhỏ sẵn); GUI chỉ lấy frame mới nhất
+        # khung trang được dò + làm mượt ngay trong thread webcam (mỗi N frame)
+        self.watcher = PageWatcher()
+        self.cap: cv2.VideoCapture | None = None
+        self.grabber: FrameGrabber | None = None
+        self._closed = False
+        self._disp_rate = RateMeter()
+        self._latency_ms = 0.0
+        self._track: TrackState | None = None
+        self._track_scale = 1.0
+        self._auto_armed = True            # chụp xong phải đổi trang mới chụp tiếp
+        self._capturing = False
+        self._accepting = True             # phiên nhiều trang còn chỗ trong hàng đợi OCR
+        self.session_chk.toggled.connect(self._update_capture_btn)
+        self.capture_btn.setEnabled(False)
+        self.overlay_lbl.setText("Opening webcam…")
+        self.overlay_lbl.adjustSize()
+
         self.timer = QTimer(self)
         self.timer.timeout.connect(self._update_frame)
-        self.timer.start(30)
+        QTimer.singleShot(0, self._open_camera)    # chạy khi event loop bắt đầu (cửa sổ đã show)
+
+    def _open_camera(self):
+        w = CallableWorker(open_webcam)
+        w.sig.done.connect(self._on_camera_ready)
+        w.sig.error.connect(self._on_camera_error)
+        QThreadPool.globalInstance().start(w)
+
+    def _on_camera_ready(self, cap):
+        if self._closed:                    # cửa sổ đã đóng trong lúc đang mở webcam
+            cap.release()
+            return
+        self.cap = cap
+        self.grabber = FrameGrabber(cap, analyze=self.watcher)
+        self.grabber.set_preview_size(self.preview_w, self.preview_h)
+        self.grabber.rotate_deg = self.rotate_deg
+        self.grabber.start()
+        self._update_capture_btn()
+        self.timer.start(15)
+
+    def _on_camera_error(self, msg: str):
+        logging.error("Webcam: %s", msg)
+        self.overlay_lbl.setText(f"Webcam error: {msg}")
+        self.overlay_lbl.adjustSize()
 
     def _update_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
+        f = self.grabber.acquire_preview()
+        if f is None:
             return
-        frame = self._apply_rotation(frame)
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
-        qimg = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
-        pix = QPixmap.fromImage(qimg)
-        self.view.setPixmap(
-            pix.scaled(self.view.width(), self.view.height(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        )
+        try:
+            h, w = f.rgb.shape[:2]
+            qimg = QImage(f.rgb.data, w, h, 3 * w, QImage.Format_RGB888)
+            pix = QPixmap.fromImage(qimg)   # fromImage copy → trả buffer ngay
+        finally:
+            self.grabber.release_preview()
+
+        self._track, self._track_scale = f.info, f.scale
+        ready = self._auto_ready()
+        if self._track is not None and self._track.quad is not None:
+            self._draw_quad(pix, self._track.quad, ready)
+        self.view.setPixmap(pix)
+
+        now = time.perf_counter()
+        self._disp_rate.tick(now)
+        lat = (now - f.t_capture) * 1000
+        self._latency_ms = lat if not self._latency_ms else 0.9 * self._latency_ms + 0.1 * lat
 
         # Cập nhật overlay thông tin
-        self.overlay_lbl.setText(f"Rotation: {self.rotate_deg}° | Resolution: {w}x{h}")
-
-    def _apply_rotation(self, frame):
-        if self.rotate_deg == 0:
-            return frame
-        rot_map = {
-            90: cv2.ROTATE_90_CLOCKWISE,
-            180: cv2.ROTATE_180,
-            270: cv2.ROTATE_90_COUNTERCLOCKWISE
-        }
-        return cv2.rotate(frame, rot_map[self.rotate_deg])
+        fw, fh = f.full_size
+        self.overlay_lbl.setText(
+            f"Rotation: {self.rotate_deg}° | Resolution: {fw}x{fh}\n"
+            f"Cam {self.grabber.cam_rate.fps:.1f} fps | View {self._disp_rate.fps:.1f} fps"
+            f" | Latency {self._latency_ms:.0f} ms\n{self._track_text()}"
+        )
+        self.overlay_lbl.adjustSize()
+
+        if ready and self.auto_chk.isChecked() and self._auto_armed and not self._held():
+            self._auto_armed = False
+            self._capture()
+
+    # ------------------------------------------------------------------
+    # Khung trang trên preview + auto-capture
+    # ------------------------------------------------------------------
+    def _auto_ready(self) -> bool:
+        st = self._track
+        if st is None or st.quad is None or st.stable_for < CONFIG.auto_capture_stable_s / 2:
+            self._auto_armed = True         # trang đã bị lấy ra / đổi → cho chụp lần sau
+        return (st is not None and st.quad is not None
+                and st.stable_for >= CONFIG.auto_capture_stable_s
+                and st.sharpness >= CONFIG.auto_capture_min_sharpness)
+
+    def _track_text(self) -> str:
+        st = self._track
+        if st is None or st.quad is None:
+            return "Page: not found"
+        return f"Page: stable {st.stable_for:.1f}s | sharpness {st.sharpness:.0f}"
+
+    @staticmethod
+    def _draw_quad(pix: QPixmap, quad, ready: bool):
+        p = QPainter(pix)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setPen(QPen(QColor(0, 220, 0) if ready else QColor(255, 200, 0), 3))
+        p.drawPolygon(QPolygonF([QPointF(float(x), float(y)) for x, y in quad]))
+        p.end()
 
     def _rotate(self, deg: int):
         self.rotate_deg = (self.rotate_deg + deg) % 360
+        if self.grabber is not None:
+            self.grabber.rotate_deg = self.rotate_deg
+        self.watcher.reset()
+
+    def shutdown(self):
+        """Dừng thread webcam và giải phóng thiết bị (gọi khi đóng cửa sổ)."""
+        self._closed = True
+        self.timer.stop()
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.cap.release()
+
+    # ------------------------------------------------------------------
+    # Phiên nhiều trang: hàng đợi OCR đầy → tạm khoá chụp (trang chờ OCR nằm trong RAM)
+    # ------------------------------------------------------------------
+    def set_accepting(self, ok: bool):
+        self._accepting = ok
+        self._update_capture_btn()
+
+    def _held(self) -> bool:
+        return not self._accepting and self.session_chk.isChecked()
+
+    def _update_capture_btn(self, *_):
+        self.capture_btn.setEnabled(self.grabber is not None and not self._capturing
+                                    and not self._held())
+        self.capture_btn.setToolTip("Chờ OCR các trang trước…" if self._held() else "")
 
     def _capture(self):
-        ret, frame = self.cap.read()
-        if not ret:
+        if self._capturing or self.grabber is None or self._held():
             return
+        # quad đang theo dõi → toạ độ ảnh gốc (dùng chấm burst + dự phòng khi rectify không dò được)
+        st = self._track
+        quad = None if st is None or st.quad is None else st.quad / self._track_scale
+        self._capturing = True
+        self.capture_btn.setEnabled(False)
 
-        # 1️⃣ áp dụng góc xoay do người dùng chọn
-        frame = self._apply_rotation(frame)                # ← thêm dòng này
+        page_id = f"capture_{datetime.now():%Y%m%d_%H%M%S}"     # = tên file ảnh
+        w = CallableWorker(self._capture_job, quad, self.burst_spin.value(), page_id)
+        w.sig.done.connect(self._on_capture_done)
+        w.sig.error.connect(self._on_capture_error)
+        QThreadPool.globalInstance().start(w)
 
-        # 2️⃣ hiệu chỉnh về A4
-        try:
-            warped, H = rectify_to_a4(frame)
-        except RuntimeError as e:
-            QMessageBox.warning(self, "Capture error", str(e))
-            return
+    def _capture_job(self, quad, n: int, page_id: str) -> dict:
+        """Chạy ở worker: burst → chọn frame nét nhất → rectify → chấm trang."""
+        with metrics.page_scope(page_id):
+            res = self._capture_stages(quad, n)
+        res["page_id"] = page_id
+        return res
+
+    def _capture_stages(self, quad, n: int) -> dict:
+        # 1️⃣ burst từ thread webcam (đã xoay theo góc user chọn)
+        with metrics.span("grab", frames=n) as sp:
+            frames = self.grabber.grab_burst(max(1, n))
+            sp.set(read_ms=round(self.grabber.read_ms, 2))
+        if not frames:
+            raise RuntimeError("Không lấy được frame từ webcam")
+        rect = None if quad is None else cv2.boundingRect(quad.astype(np.int32))
+        with metrics.span("select", frames=len(frames)):
+            best, scores = best_frame(frames, rect)
+        frame = frames[best]
+        logging.info("Burst %d frame, chọn #%d (điểm %s)", len(frames), best,
+                     ", ".join(f"{q.score:.0f}" for q in scores))
+
+        # 2️⃣ hiệu chỉnh về A4 (dò lại trên ảnh gốc; không thấy thì dùng khung đang theo dõi)
+        with metrics.span("rectify") as sp:
+            try:
+                warped, H = rectify_to_a4(frame)
+            except RuntimeError:
+                if quad is None:
+                    raise
+                logging.info("Rectify dùng khung trang từ preview")
+                warped, H = rectify_to_a4(frame, quad=quad,
+                                          quad_scale=self.watcher.detect_scale(frame.shape))
+                sp.set(tracked_quad=True)
+
+        # 3️⃣ chấm chính trang đã rectify (nền bàn không tính)
+        with metrics.span("quality"):
+            quality = assess(warped)
+        return {"image": warped, "H": H, "quality": quality}
+
+    def _on_capture_done(self, res: dict):
+        self._capturing = False
+        self._update_capture_btn()
+        q = res["quality"]
+        reason = q.problem() if CONFIG.quality_gate else None
+        if reason is not None:
+            logging.warning("Trang bị loại: %s", reason)
+            box = QMessageBox(QMessageBox.Warning, "Page rejected",
+                              f"Trang không đạt: {reason}.\nChụp lại?", parent=self)
+            retake = box.addButton("Retake", QMessageBox.AcceptRole)
+            box.addButton("Use anyway", QMessageBox.DestructiveRole)
+            box.exec_()
+            if box.clickedButton() is retake:
+                return
+
+        # 4️⃣ giữ trang trong RAM; ghi ảnh + homography và encode upload ở background
+        img_path = (CAPTURE_DIR / res["page_id"]).with_suffix(".jpg")
 
-        # 3️⃣ lưu ảnh + homography như trước
-        ts   = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base = CAPTURE_DIR / f"capture_{ts}"
-        img_path = base.with_suffix(".jpg")
-        npy_path = base.with_name(base.name + "_H.npy")
+        page = Page(image=res["image"], path=img_path, H=res["H"])
+        page.save_async()
+        page.prepare_async()
 
-        cv2.imwrite(str(img_path), warped,
-                    [int(cv2.IMWRITE_JPEG_QUALITY), CONFIG.jpeg_quality])
-        np.save(npy_path, H)
+        self.on_captured(page)
 
-        self.on_captured(img_path)
\ No newline at end of file
+    def _on_capture_error(self, msg: str):
+        self._capturing = False
+        self._update_capture_btn()
+        QMessageBox.warning(self, "Capture error", msg)
@@ -1,7 +1,8 @@
 # document_cropper.py
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
+
+from config import CONFIG
 
 A4_PX_PORTRAIT  = (2480, 3508)   # 210×297 mm @300 dpi  (w, h)
 A4_PX_LANDSCAPE = (3508, 2480)   # hoán đổi khi trang xoay ngang
@@ -17,17 +18,16 @@ def _order_points(pts: np.ndarray) -> np.ndarray:
         pts[np.argmax(diff)],       # BL
     ], dtype=np.float32)
 
-def rectify_to_a4(img_bgr, debug=False):
-    """
-    Tìm khung giấy A4, warp về đúng tỉ lệ.
-    Trả về: warped_img (np.ndarray), homography H (3×3)
+def find_page_quad(gray: np.ndarray, min_area: float = 0.3) -> np.ndarray | None:
+    """Contour 4 góc lớn nhất (≥ `min_area` diện tích ảnh) → 4 điểm TL, TR, BR, BL.
+
+    Dùng chung cho rectify (ảnh gốc) và dò trang trên preview (ảnh đã thu nhỏ).
     """
-    gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
     blur = cv2.GaussianBlur(gray, (7, 7), 0)
     edges = cv2.Canny(blur, 50, 150)
 
     cnts, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    img_area = img_bgr.shape[0] * img_bgr.shape[1]
+    img_area = gray.shape[0] * gray.shape[1]
     doc_cnt  = None
     max_area = 0
 
@@ -35,13 +35,70 @@ def rectify_to_a4(img_bgr, debug=False):
         peri  = cv2.arcLength(c, True)
         approx = cv2.approxPolyDP(c, 0.02 * peri, True)
         area   = cv2.contourArea(approx)
-        if len(approx) == 4 and area > max_area and area > 0.3 * img_area:
+        if len(approx) == 4 and area > max_area and area > min_area * img_area:
             doc_cnt, max_area = approx, area
 
     if doc_cnt is None:
+        return None
+    return _order_points(doc_cnt.reshape(4, 2).astype(np.float32))
+
+
+def _detect_pyramid(gray: np.ndarray, max_side: int) -> tuple[np.ndarray | None, int]:
+    """Dò quad trên tầng pyramid đầu tiên có cạnh dài ≤ `max_side`.
+
+    Trả về (quad theo toạ độ ảnh gốc, số tầng đã pyrDown).
+    """
+    levels = 0
+    small = gray
+    while max_side > 0 and max(small.shape[:2]) > max_side:
+        small = cv2.pyrDown(small)
+        levels += 1
+    quad = find_page_quad(small)
+    if quad is None:
+        return None, levels
+    return quad * (2 ** levels), levels
+
+
+def refine_corners(gray: np.ndarray, quad: np.ndarray, win: int) -> np.ndarray:
+    """Tinh chỉnh 4 góc tới sub-pixel trên ảnh gốc (`cv2.cornerSubPix`)."""
+    pts = np.ascontiguousarray(quad, dtype=np.float32).reshape(-1, 1, 2)
+    crit = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_COUNT, 40, 0.01)
+    cv2.cornerSubPix(gray, pts, (win, win), (-1, -1), crit)
+    return pts.reshape(4, 2)
+
+
+def rectify_to_a4(
+    img_bgr,
+    debug=False,
+    quad: np.ndarray | None = None,
+    *,
+    quad_scale: float = 1.0,
+    detect_side: int = CONFIG.rectify_detect_side,
+    subpix: bool = True,
+    gray: bool = CONFIG.rectify_gray,
+):
+    """
+    Tìm khung giấy A4, warp về đúng tỉ lệ.
+
+    * Dò quad trên ảnh pyramid (cạnh dài ≤ `detect_side`; 0 = dò trên ảnh gốc),
+      rồi tinh chỉnh góc sub-pixel trên ảnh gốc, warp đúng 1 lần.
+    * `quad` (TL, TR, BR, BL theo pixel ảnh gốc) – bỏ bước dò, chỉ tinh chỉnh;
+      `quad_scale` = quad được dò trên ảnh nhỏ hơn ảnh gốc bao nhiêu lần
+      (vd. khung từ preview thu nhỏ) để nới cửa sổ sub-pixel tương ứng.
+    * `gray=True` → chỉ warp kênh xám (nhanh ~3×, đủ cho OCR).
+    Trả về: warped_img (np.ndarray), homography H (3×3)
+    """
+    g = img_bgr if img_bgr.ndim == 2 else cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+    if quad is None:
+        quad, levels = _detect_pyramid(g, detect_side)
+        quad_scale = 2 ** levels
+    if quad is None:
         raise RuntimeError("Không tìm được contour 4 góc đủ lớn của trang")
 
-    ordered = _order_points(doc_cnt.reshape(4, 2).astype(np.float32))
+    ordered = _order_points(np.asarray(quad, dtype=np.float32).reshape(4, 2))
+    if subpix:
+        # cửa sổ đủ phủ sai số của ảnh đã dò (tầng pyramid ×2, preview thu nhỏ …)
+        ordered = refine_corners(g, ordered, win=max(5, round(3 * quad_scale)))
 
     # Xác định trang đang portrait hay landscape
     (tl, tr, br, bl) = ordered
@@ -62,13 +119,15 @@ def rectify_to_a4(img_bgr, debug=False):
                     dtype=np.float32)
 
     H = cv2.getPerspectiveTransform(ordered, dest)
-    warped = cv2.warpPerspective(img_bgr, H, (w, h))
+    warped = cv2.warpPerspective(g if gray else img_bgr, H, (w, h))
 
     if debug:
-        dbg = img_bgr.copy()
-        cv2.drawContours(dbg, [doc_cnt], -1, (0, 255, 0), 3)
+        import matplotlib.pyplot as plt     # chỉ cần khi debug
+        dbg = cv2.cvtColor(g, cv2.COLOR_GRAY2BGR) if img_bgr.ndim == 2 else img_bgr.copy()
+        cv2.polylines(dbg, [ordered.astype(np.int32)], True, (0, 255, 0), 3)
+        shown = warped if warped.ndim == 2 else cv2.cvtColor(warped, cv2.COLOR_BGR2RGB)
         plt.subplot(1, 2, 1); plt.imshow(cv2.cvtColor(dbg, cv2.COLOR_BGR2RGB)); plt.title("Contour")
-        plt.subplot(1, 2, 2); plt.imshow(cv2.cvtColor(warped, cv2.COLOR_BGR2RGB)); plt.title("Warped")
+        plt.subplot(1, 2, 2); plt.imshow(shown, cmap="gray"); plt.title("Warped")
         plt.show()
 
     return warped, H
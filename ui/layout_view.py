@@ -4,12 +4,35 @@ from PyQt5.QtWidgets import (
     QGraphicsScene,
     QGraphicsTextItem,
 )
-from PyQt5.QtGui import QPixmap, QFont, QPainter
-from PyQt5.QtCore import Qt, QSizeF, QRectF
-from statistics import median
+from PyQt5.QtGui import QPixmap, QFont, QPainter, QPen, QColor
+from PyQt5.QtCore import Qt, QSizeF, QRectF, QPointF, pyqtSignal
 from pathlib import Path
 import logging
 
+import numpy as np
+
+import metrics
+from blocks import BlockStore
+from layout import PageLayout
+
+
+class BlockItem(QGraphicsTextItem):
+    """Text item gắn với 1 block OCR; báo cho view khi bị sửa hoặc kéo đi."""
+
+    def __init__(self, idx: int, text: str, on_dirty, on_moved):
+        super().__init__(text)
+        self.idx = idx
+        self._on_dirty = on_dirty
+        self._on_moved = on_moved
+        self.setFlag(QGraphicsTextItem.ItemSendsGeometryChanges, True)
+        self.document().contentsChanged.connect(lambda: self._on_dirty(self.idx))
+
+    def itemChange(self, change, value):
+        if change == QGraphicsTextItem.ItemPositionHasChanged:
+            self._on_moved(self.idx, self.pos())
+            self._on_dirty(self.idx)
+        return super().itemChange(change, value)
+
 
 class LayoutView(QGraphicsView):
     """Canvas A4:
@@ -17,9 +40,14 @@ class LayoutView(QGraphicsView):
     * Hiển thị box OCR đúng toạ độ tuyệt đối.
     * Ctrl + Wheel để zoom tuỳ ý.
     * Luôn auto-fit trang bên trong khung view.
+    * Ghi nhận block nào đã bị sửa/di chuyển (dirty) để dịch lại riêng.
     """
 
     A4_SIZE = QSizeF(595, 842)  # pt (210×297 mm @72 dpi)
+    PENDING_COLOR = QColor(150, 150, 150)   # block đang chờ bản dịch (stream)
+
+    dirtyChanged = pyqtSignal(int)      # số block dirty hiện tại
+    regionSelected = pyqtSignal(QRectF) # vùng user vừa kéo chọn (toạ độ scene, pt)
 
     # ------------------------------------------------------------------
     # INIT
@@ -43,23 +71,41 @@ class LayoutView(QGraphicsView):
 
         self._bg_item   = None          # ảnh nền mờ
         self._editable  = editable
+        self._items: dict[int, BlockItem] = {}   # chỉ số block → item
+        self._dirty: set[int] = set()
+        self._layout: PageLayout | None = None   # dòng / thứ tự đọc (pt)
+        self._font_pt   = 12
+        self._loading   = False
+        self._region_mode   = False     # đang chờ user kéo chọn vùng
+        self._band_origin   = None
+        self._band_item     = None
 
     # ------------------------------------------------------------------
     # LOAD LAYOUT
     # ------------------------------------------------------------------
     def load_layout(
         self,
-        blocks: list[dict],
+        blocks: BlockStore,
         img_size: tuple[int, int],
         img_path: Path,
+        background: QPixmap | None = None,
     ):
-        """Vẽ lại toàn bộ trang (nền + text boxes)"""
+        """Vẽ lại toàn bộ trang (nền + text boxes); `background` dùng thay cho đọc file."""
+        page = Path(img_path).stem if img_path else None
+        with metrics.span("scene", page=page, blocks=len(blocks)):
+            self._load_layout(blocks, img_size, img_path, background)
+
+    def _load_layout(self, blocks: BlockStore, img_size: tuple[int, int],
+                     img_path: Path, background: QPixmap | None):
         scn = self.scene()
         scn.clear()
+        self._items.clear()
+        self._dirty.clear()
+        self._loading = True
 
         # 1. Background (ảnh mờ)
         try:
-            pix = QPixmap(str(img_path)).scaled(
+            pix = (background if background is not None else QPixmap(str(img_path))).scaled(
                 self.A4_SIZE.toSize(),
                 Qt.KeepAspectRatio,
                 Qt.SmoothTransformation,
@@ -74,36 +120,103 @@ class LayoutView(QGraphicsView):
         sx = self.A4_SIZE.width() / img_w
         sy = self.A4_SIZE.height() / img_h
 
-        h_pts = [(b["box"][3] - b["box"][1]) * sy for b in blocks]
-        base_pt = max(6, min(28, int((median(h_pts) if h_pts else 12) * 0.7)))
+        # box [x, y, w, h] (px) → pt, tính 1 lần cho cả trang
+        box_pt = blocks.box * np.array([sx, sy, sx, sy])
+        # cỡ chữ theo chiều cao từ (block dòng/đoạn cao hơn chữ nhiều)
+        glyph_pt = blocks.glyph_height(12 / sy) * sy
+        base_pt = max(6, min(28, int(glyph_pt * 0.7)))
         logging.info("Auto font size ≈ %s pt", base_pt)
+        self._font_pt = base_pt
+
+        keep = [i for i, t in enumerate(blocks.text) if t.strip()]
+        self._layout = PageLayout(box_pt[keep], keep, h_ref=glyph_pt)
+        for idx in keep:
+            x, y, w, _ = box_pt[idx].tolist()
+            self._add_block_item(idx, blocks.text[idx].strip(), QPointF(x, y), w)
 
-        for blk in blocks:
-            x1, y1, x2, y2 = blk["box"]
-            txt = blk["text"].strip()
-            if not txt:
-                continue
-
-            item = QGraphicsTextItem(txt)
-            item.setFont(QFont("Times New Roman", base_pt))
-            item.setPos(x1 * sx, y1 * sy)
-            item.setTextWidth((x2 - x1) * sx)
-
-            # Flags
-            if self._editable:
-                item.setTextInteractionFlags(Qt.TextEditorInteraction)                
-                item.setFlag(QGraphicsTextItem.ItemIsMovable, True)
-                item.setFlag(QGraphicsTextItem.ItemIsFocusable, True)
-                item.setFlag(QGraphicsTextItem.ItemIsSelectable, True)
-            else:
-                item.setTextInteractionFlags(Qt.TextSelectableByMouse)
-                item.setFlag(QGraphicsTextItem.ItemIsFocusable, False)
-            
-            scn.addItem(item)
+        self._loading = False
+        self.dirtyChanged.emit(0)
 
         # 3. Fit trang vào khung
         self._fit_page()
 
+    def _add_block_item(self, idx: int, txt: str, pos: QPointF, width: float) -> BlockItem:
+        item = BlockItem(idx, txt, self._mark_dirty, self._on_item_moved)
+        item.setFont(QFont("Times New Roman", self._font_pt))
+        item.setPos(pos)
+        item.setTextWidth(width)
+
+        # Flags
+        if self._editable:
+            item.setTextInteractionFlags(Qt.TextEditorInteraction)
+            item.setFlag(QGraphicsTextItem.ItemIsMovable, True)
+            item.setFlag(QGraphicsTextItem.ItemIsFocusable, True)
+            item.setFlag(QGraphicsTextItem.ItemIsSelectable, True)
+        else:
+            item.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            item.setFlag(QGraphicsTextItem.ItemIsFocusable, False)
+
+        self.scene().addItem(item)
+        self._items[idx] = item
+        return item
+
+    # ------------------------------------------------------------------
+    # DIRTY TRACKING (block bị sửa text hoặc bị kéo đi)
+    # ------------------------------------------------------------------
+    def _mark_dirty(self, idx: int):
+        if self._loading or idx in self._dirty:
+            return
+        self._dirty.add(idx)
+        self.dirtyChanged.emit(len(self._dirty))
+
+    def _on_item_moved(self, idx: int, pos: QPointF):
+        if not self._loading and self._layout is not None and idx in self._layout:
+            self._layout.move(idx, pos.x(), pos.y())
+
+    def dirty_blocks(self) -> list[int]:
+        return sorted(self._dirty)
+
+    def clear_dirty(self, indices=None):
+        if indices is None:
+            self._dirty.clear()
+        else:
+            self._dirty.difference_update(indices)
+        self.dirtyChanged.emit(len(self._dirty))
+
+    def block_texts(self) -> dict[int, str]:
+        """Text hiện tại (kể cả phần user đã sửa) của từng block."""
+        return {i: it.toPlainText().strip() for i, it in self._items.items()}
+
+    def block_geometry(self, idx: int) -> tuple[QPointF, float] | None:
+        it = self._items.get(idx)
+        return (it.pos(), it.textWidth()) if it else None
+
+    def set_block(self, idx: int, text: str, pos: QPointF, width: float):
+        """Cập nhật tại chỗ 1 block (tạo mới nếu chưa có) – không vẽ lại cả trang."""
+        self._loading = True
+        it = self._items.get(idx)
+        if it is None:
+            if text:
+                self._add_block_item(idx, text, pos, width)
+        else:
+            it.setPlainText(text)
+            it.setPos(pos)
+            it.setTextWidth(width)
+        if self._layout is not None and idx in self._items:
+            h = self._layout.box(idx)[3] if idx in self._layout else self._font_pt / 0.7
+            self._layout.upsert(idx, (pos.x(), pos.y(), width, h))
+        self._loading = False
+
+    def set_block_text(self, idx: int, text: str, *, pending: bool = False):
+        """Chỉ đổi text 1 block (giữ vị trí/bề rộng); `pending` tô xám."""
+        it = self._items.get(idx)
+        if it is None:
+            return
+        self._loading = True
+        it.setPlainText(text)
+        it.setDefaultTextColor(self.PENDING_COLOR if pending else QColor(Qt.black))
+        self._loading = False
+
     # ------------------------------------------------------------------
     # RESIZE EVENT  →  luôn fit lại
     # ------------------------------------------------------------------
@@ -111,6 +224,55 @@ class LayoutView(QGraphicsView):
         super().resizeEvent(ev)
         self._fit_page()
 
+    # ------------------------------------------------------------------
+    # REGION SELECT (rubber-band) → phát regionSelected
+    # ------------------------------------------------------------------
+    def start_region_select(self):
+        self._region_mode = True
+        self.viewport().setCursor(Qt.CrossCursor)
+
+    def _end_region_select(self):
+        if self._band_item is not None:
+            self.scene().removeItem(self._band_item)
+        self._band_item = self._band_origin = None
+        self._region_mode = False
+        self.viewport().unsetCursor()
+
+    def mousePressEvent(self, e):
+        if self._region_mode and e.button() == Qt.LeftButton:
+            self._band_origin = self.mapToScene(e.pos())
+            self._band_item = self.scene().addRect(
+                QRectF(self._band_origin, self._band_origin),
+                QPen(Qt.red, 1, Qt.DashLine),
+            )
+            e.accept()
+            return
+        super().mousePressEvent(e)
+
+    def mouseMoveEvent(self, e):
+        if self._band_item is not None:
+            self._band_item.setRect(
+                QRectF(self._band_origin, self.mapToScene(e.pos())).normalized())
+            e.accept()
+            return
+        super().mouseMoveEvent(e)
+
+    def mouseReleaseEvent(self, e):
+        if self._band_item is not None:
+            rect = self._band_item.rect()
+            self._end_region_select()
+            if rect.width() > 2 and rect.height() > 2:
+                self.regionSelected.emit(rect)
+            e.accept()
+            return
+        super().mouseReleaseEvent(e)
+
+    def keyPressEvent(self, e):
+        if self._region_mode and e.key() == Qt.Key_Escape:
+            self._end_region_select()
+            return
+        super().keyPressEvent(e)
+
     # ------------------------------------------------------------------
     # ZOOM (Ctrl + wheel)
     # ------------------------------------------------------------------
@@ -125,25 +287,11 @@ class LayoutView(QGraphicsView):
     # COLLECT TEXT (trả về plain-text sau khi user chỉnh)
     # ------------------------------------------------------------------
     def gather_text_lines(self) -> str:
-        items = [i for i in self.scene().items()
-                 if isinstance(i, QGraphicsTextItem)]
-        items.sort(key=lambda it: (it.pos().y(), it.pos().x()))
-
-        lines, buf, cur_y = [], [], None
-        thresh = 14  # pt – ngưỡng cùng dòng
-
-        for it in items:
-            y = it.pos().y()
-            if cur_y is None or abs(y - cur_y) <= thresh:
-                buf.append(it.toPlainText().strip())
-                cur_y = y if cur_y is None else cur_y
-            else:
-                lines.append(" ".join(buf))
-                buf = [it.toPlainText().strip()]
-                cur_y = y
-        if buf:
-            lines.append(" ".join(buf))
-        return "\n".join(lines)
+        """Text theo thứ tự đọc (dòng / cột lấy từ `PageLayout`, cache sẵn)."""
+        if self._layout is None:
+            return "\n".join(i.toPlainText().strip() for i in self.scene().items()
+                             if isinstance(i, QGraphicsTextItem))
+        return self._layout.text(self.block_texts())
 
     # ------------------------------------------------------------------
     # SHOW PLAIN TEXT (dùng cho canvas tiếng Anh readonly)
@@ -151,6 +299,9 @@ class LayoutView(QGraphicsView):
     def show_plain_text(self, text: str):
         scn = self.scene()
         scn.clear()
+        self._items.clear()
+        self._layout = None
+        self.clear_dirty()
 
         item = QGraphicsTextItem(text)
         item.setFont(QFont("Times New Roman", 12))
@@ -1,6 +1,16 @@
+import logging
+import time
+
+from PyQt5.QtCore import QThreadPool, QTimer
 from PyQt5.QtWidgets import QMainWindow, QTabWidget
 from ui.capture_tab   import CaptureTab
 from ui.ocr_tab       import OCRTab           # NEW
+from ui.speculative   import SpeculativeRunner
+from ui.session       import DocumentSession
+from ui.session_tab   import SessionTab
+from ui.metrics_panel import MetricsPanel
+import metrics
+from threading_utils import CallableWorker
 # Không cần import TranslatorTab; OCRTab sẽ tạo tab đó khi người dùng nhấn “Confirm”
 
 class MainWindow(QMainWindow):
@@ -10,13 +20,74 @@ class MainWindow(QMainWindow):
         self.resize(1280,800)
 
         self.tabs     = QTabWidget()
+        self.spec     = SpeculativeRunner()
         self.cap_tab  = CaptureTab(self._on_captured)
-        self.ocr_tab  = OCRTab()
+        self.ocr_tab  = OCRTab(spec=self.spec)
+        self.session  = DocumentSession()
+        self.doc_tab  = SessionTab(self.session)
+        self.cap_tab.spec_chk.toggled.connect(self.spec.set_enabled)
+        self.doc_tab.pageOpened.connect(self._open_session_page)
+        self.session.acceptingChanged.connect(self.cap_tab.set_accepting)
 
         self.tabs.addTab(self.cap_tab,"Capture")   # tab 1
         self.tabs.addTab(self.ocr_tab,"OCR")       # tab 2
+        self.tabs.addTab(self.doc_tab,"Document")  # tab 3 – phiên nhiều trang
+        self.tabs.addTab(MetricsPanel(),"Metrics") # thời gian từng stage
         self.setCentralWidget(self.tabs)
+        # SDK Vision/Groq + client: tạo nền sau khi cửa sổ hiện, không chặn lúc mở app
+        QTimer.singleShot(0, self._warm_up)
+
+    def _warm_up(self):
+        w = CallableWorker(warm_up_clients)
+        w.sig.done.connect(self._on_warm_up)
+        QThreadPool.globalInstance().start(w)
+
+    def _on_warm_up(self, errors: list):
+        if errors:
+            self.statusBar().showMessage("Backend chưa sẵn sàng – " + "; ".join(errors))
+
+    def closeEvent(self, e):
+        self.cap_tab.shutdown()
+        self.session.shutdown()
+        metrics.flush()
+        super().closeEvent(e)
+
+    def _on_captured(self, page):
+        if self.cap_tab.session_chk.isChecked():
+            # nhiều trang: đưa vào pipeline rồi ở lại tab Capture chụp tiếp
+            self.session.granularity = self.ocr_tab.granularity
+            self.session.add(page)
+            return
+        self.spec.start(page)       # chụp lại → kết quả chạy trước của trang cũ bị bỏ
+        self.ocr_tab.load_page(page)
+        self.tabs.setCurrentWidget(self.ocr_tab)
 
-    def _on_captured(self, path):
-        self.ocr_tab.load_image(path)
+    def _open_session_page(self, sp):
+        if sp.blocks is None:
+            self.ocr_tab.load_page(sp.page)
+        else:
+            self.ocr_tab.load_result(sp.page, {"blocks": sp.blocks, "img_size": sp.img_size,
+                                               "granularity": self.session.granularity}, en=sp.en)
         self.tabs.setCurrentWidget(self.ocr_tab)
+
+
+def warm_up_clients() -> list[str]:
+    """Chạy ở worker: import SDK + tạo client OCR/dịch trước khi user cần tới.
+
+    Lỗi (thiếu credentials, API key…) chỉ được ghi log + trả về để hiện trên
+    status bar; lần OCR/dịch thật sẽ thử tạo lại client và báo lỗi như thường.
+    """
+    import ocr
+    import translator
+
+    errors = []
+    for name, make in (("Vision", ocr.vision_client), ("Groq", translator.groq_client)):
+        t0 = time.perf_counter()
+        try:
+            make()
+        except Exception as e:
+            logging.warning("%s client: %s", name, e)
+            errors.append(f"{name}: {e}")
+        else:
+            logging.info("%s client sẵn sàng (%.0f ms)", name, (time.perf_counter() - t0) * 1000)
+    return errors
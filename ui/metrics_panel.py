@@ -0,0 +1,99 @@
+# ui/metrics_panel.py – thời gian từng stage của N trang gần nhất (metrics.py)
+from PyQt5.QtWidgets import (
+    QWidget,
+    QLabel,
+    QCheckBox,
+    QVBoxLayout,
+    QHBoxLayout,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+)
+from PyQt5.QtCore import Qt, QTimer
+
+import metrics
+from config import METRICS_DIR
+
+# thứ tự cột theo pipeline; stage lạ (nếu có) thêm vào cuối
+STAGE_ORDER = ["grab", "select", "rectify", "quality", "jpeg_write", "encode",
+               "vision", "parse", "scene", "translate", "groq"]
+
+
+class MetricsPanel(QWidget):
+    """Bảng trang × stage (ms), tự làm mới khi đang hiển thị."""
+
+    def __init__(self):
+        super().__init__()
+        self.record_chk = QCheckBox("Record timings")
+        self.record_chk.setChecked(metrics.enabled())
+        self.record_chk.toggled.connect(self._on_toggle)
+        self.path_lbl = QLabel(f"{METRICS_DIR / 'spans.jsonl'} · {METRICS_DIR / 'metrics.prom'}")
+        self.path_lbl.setTextInteractionFlags(Qt.TextSelectableByMouse)
+
+        self.table = QTableWidget(0, 0)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+
+        top = QHBoxLayout()
+        top.addWidget(self.record_chk)
+        top.addWidget(self.path_lbl, 1)
+        lay = QVBoxLayout(self)
+        lay.addLayout(top)
+        lay.addWidget(QLabel("ms per stage – translate includes its groq calls"))
+        lay.addWidget(self.table, 1)
+        self.models_lbl = QLabel()         # latency/lỗi theo model + hedge/breaker (model_policy.py)
+        self.models_lbl.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        lay.addWidget(self.models_lbl)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+
+    def _on_toggle(self, on: bool):
+        metrics.enable(on)
+        self.refresh()
+
+    def showEvent(self, e):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(e)
+
+    def hideEvent(self, e):
+        self.timer.stop()
+        super().hideEvent(e)
+
+    def refresh(self):
+        pages = metrics.recent_pages()
+        seen = {s for _, st in pages for s in st}
+        stages = [s for s in STAGE_ORDER if s in seen] + sorted(seen - set(STAGE_ORDER))
+        cols = ["Page"] + stages
+        self.table.setColumnCount(len(cols))
+        self.table.setHorizontalHeaderLabels(cols)
+        self.table.setRowCount(len(pages))
+        for r, (page, st) in enumerate(pages):
+            self.table.setItem(r, 0, QTableWidgetItem(page))
+            for c, s in enumerate(stages, 1):
+                ms = st.get(s)
+                item = QTableWidgetItem("" if ms is None else f"{ms:.0f}")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(r, c, item)
+
+        self.models_lbl.setText(self._models_text())
+
+    @staticmethod
+    def _models_text() -> str:
+        from translator import POLICY     # import muộn: tab Metrics không kéo theo translator
+
+        snap = POLICY.snapshot()
+        lines = []
+        for model, st in sorted(snap["models"].items()):
+            p50, p95 = st["p50_ms"], st["p95_ms"]
+            lines.append(f"{model}: {st['calls']} calls, {st['errors']} errors "
+                         f"({100 * st['error_rate']:.0f}% recent)"
+                         + (f", p50 {p50:.0f} ms, p95 {p95:.0f} ms" if p95 is not None else "")
+                         + (f", breaker {st['breaker']}" if "breaker" in st else ""))
+        lines.append(f"hedged {snap['hedged']} (fallback first {snap['hedge_wins']}), "
+                     f"routed by breaker {snap['routed']}")
+        return "\n".join(lines)
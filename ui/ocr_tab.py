@@ -2,18 +2,23 @@ from PyQt5.QtWidgets import (
     QWidget,
     QLabel,
     QPushButton,
+    QCheckBox,
+    QComboBox,
     QVBoxLayout,
     QHBoxLayout,
     QMessageBox,
     QTabWidget,
 )
-from PyQt5.QtGui import QPixmap, QKeySequence
-from PyQt5.QtCore import Qt, QThreadPool
+from PyQt5.QtGui import QPixmap, QImage, QKeySequence
+from PyQt5.QtCore import Qt, QThreadPool, QRectF
 from pathlib import Path
-from ocr import ocr_vi_layout
+from ocr import GRANULARITIES, ocr_vi_layout, ocr_vi_page, ocr_vi_region, merge_region_blocks
+from page import Page
+from blocks import BlockStore, write_boxes
 from threading_utils import CallableWorker
 from config import CONFIG
-import logging, json
+import logging
+import numpy as np
 from ui.layout_view import LayoutView
 
 # -----------------------------------------------------------------------------
@@ -23,10 +28,16 @@ from ui.layout_view import LayoutView
 class OCRTab(QWidget):
     """Tab OCR – OCR & xác nhận dịch sang English ở tab mới."""
 
-    def __init__(self):
+    def __init__(self, spec=None):
         super().__init__()
         self.img_path: Path | None = None
-        self._ocr_blocks: list[dict] | None = None
+        self.page: Page | None = None       # trang trong RAM (từ CaptureTab)
+        self._page_pix: QPixmap | None = None
+        self._ocr_blocks: BlockStore | None = None
+        self._prefetched = None
+        self._tr_tab = None                 # tab Translator đang mở (chỉ giữ 1)
+        self.spec = spec                    # SpeculativeRunner (tuỳ chọn)
+        self._waiting_spec = False
 
         # Widgets trái/phải
         self.image_lbl = QLabel("No image", alignment=Qt.AlignCenter)
@@ -38,10 +49,27 @@ class OCRTab(QWidget):
         self.ocr_btn = QPushButton("Run OCR (Ctrl+O)")
         self.confirm_btn = QPushButton("✔ Confirm → Translate")
         self.confirm_btn.setEnabled(False) 
+        self.region_btn = QPushButton("Re-OCR region")
+        self.region_btn.setToolTip("Kéo chọn 1 vùng trên trang để OCR lại riêng vùng đó")
+        self.region_btn.setEnabled(False)
+        self.upscale_chk = QCheckBox("Upscale ×2")
+        # word: text_detection (1 item / từ); line/paragraph: document_text_detection,
+        # ít item hơn nhiều, từ vẫn giữ làm block con
+        self.granularity = CONFIG.ocr_granularity
+        self.gran_cb = QComboBox()
+        self.gran_cb.addItems([g.capitalize() for g in GRANULARITIES])
+        self.gran_cb.setCurrentIndex(GRANULARITIES.index(self.granularity))
+        self.gran_cb.setToolTip("Đơn vị block OCR")
+        if self.spec is not None:
+            self.spec.granularity = self.granularity
 
         # Layout
         btn_row = QHBoxLayout()
         btn_row.addStretch()
+        btn_row.addWidget(QLabel("Blocks:"))
+        btn_row.addWidget(self.gran_cb)
+        btn_row.addWidget(self.upscale_chk)
+        btn_row.addWidget(self.region_btn)
         btn_row.addWidget(self.ocr_btn)
         btn_row.addWidget(self.confirm_btn)
 
@@ -58,20 +86,72 @@ class OCRTab(QWidget):
         self.ocr_btn.clicked.connect(self._run_ocr)
         self.confirm_btn.clicked.connect(self._confirm)
         self.ocr_btn.setShortcut(QKeySequence("Ctrl+O"))
+        self.region_btn.clicked.connect(self.layout_view.start_region_select)
+        self.region_btn.setShortcut(QKeySequence("Ctrl+Shift+O"))
+        self.layout_view.regionSelected.connect(self._run_region_ocr)
+        self.gran_cb.currentIndexChanged.connect(self._on_granularity)
         self.pool = QThreadPool.globalInstance()
+        if self.spec is not None:
+            self.spec.ocrReady.connect(self._on_spec_ocr)
+            self.spec.failed.connect(self._on_spec_failed)
 
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
+    def load_page(self, page: Page):
+        """Nhận trang vừa chụp trực tiếp từ RAM (file JPEG được ghi song song)."""
+        image = page.image
+        if image is None:                   # phiên nhiều trang: ảnh đã bỏ khỏi RAM
+            self._show(page.path, QPixmap(str(page.wait_saved())), page)
+            return
+        h, w = image.shape[:2]
+        if image.ndim == 2:                 # rectify_gray: trang chỉ có kênh xám
+            img = np.ascontiguousarray(image)
+            qimg = QImage(img.data, w, h, w, QImage.Format_Grayscale8)
+        else:
+            img = np.ascontiguousarray(image[:, :, ::-1])
+            qimg = QImage(img.data, w, h, 3 * w, QImage.Format_RGB888)
+        pix = QPixmap.fromImage(qimg)
+        self._show(page.path, pix, page)
+
+    def load_result(self, page: Page, res: dict, en: list[str] | None = None):
+        """Trang đã OCR (và có thể đã dịch) trong phiên nhiều trang – ảnh đọc lại từ file."""
+        self.load_page(page)
+        self._on_ocr_done(res)
+        self._prefetched = (res["blocks"], en) if en is not None else None
+
     def load_image(self, path: Path):
+        self._show(path, QPixmap(str(path)), None)
+
+    def _show(self, path: Path, pix: QPixmap, page: Page | None):
         self.img_path = path
-        pix = QPixmap(str(path))
+        self.page = page
+        self._page_pix = pix if page is not None else None
         self.image_lbl.setPixmap(
             pix.scaled(self.image_lbl.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
         )
         self.layout_view.scene().clear()
         self._ocr_blocks = None
         self._translated_en = None
+        self._prefetched = None             # (blocks, bản dịch) từ phiên nhiều trang
+        self._waiting_spec = False
+
+        # OCR chạy trước đã xong (user chuyển tab chậm) → gắn luôn
+        res = self._spec_result()
+        if res is not None:
+            self._on_ocr_done(res)
+
+    def _spec_result(self) -> dict | None:
+        """Kết quả speculative cho ảnh hiện tại, nếu cùng độ chi tiết block."""
+        res = self.spec.ocr_result(self.img_path) if self.spec else None
+        return res if res is not None and res.get("granularity") == self.granularity else None
+
+    def _on_granularity(self, i: int):
+        self.granularity = GRANULARITIES[i]
+        if self.spec is not None:
+            self.spec.granularity = self.granularity
+        if self._ocr_blocks is not None:
+            self._run_ocr()                 # line ↔ paragraph lấy lại từ cache OCR
 
     # ------------------------------------------------------------------
     # OCR thread
@@ -81,22 +161,80 @@ class OCRTab(QWidget):
             return
         self._set_btns(False)
 
+        if self.spec is not None:
+            res = self._spec_result()
+            if res is not None:
+                self._on_ocr_done(res)
+                return
+            if self.spec.ocr_pending(self.img_path) and self.spec.granularity == self.granularity:
+                # đã có request đang bay – chờ nó thay vì gửi lần 2
+                self._waiting_spec = True
+                return
+
+        img_path, page, granularity = self.img_path, self.page, self.granularity
+
         def do_ocr():
-            blocks, img_size = ocr_vi_layout(self.img_path)
-            base = self.img_path.with_suffix("")
-            box_path = base.with_name(f"{base.name}_boxes.json")
-            box_path.write_text(json.dumps(blocks, ensure_ascii=False, indent=2), encoding="utf-8")
-            return {"blocks": blocks, "img_size": img_size}
+            if page is not None:
+                blocks, img_size = ocr_vi_page(page, granularity=granularity)
+            else:
+                blocks, img_size = ocr_vi_layout(img_path, granularity=granularity)
+            write_boxes(img_path, blocks)
+            return {"blocks": blocks, "img_size": img_size, "granularity": granularity}
 
         w = CallableWorker(do_ocr)
         w.sig.done.connect(self._on_ocr_done)
         w.sig.error.connect(self._on_error)
         self.pool.start(w)
 
+    # ------------------------------------------------------------------
+    # Region re-OCR: chỉ upload vùng được chọn, thay các block chồng lấn
+    # ------------------------------------------------------------------
+    def _run_region_ocr(self, rect: QRectF):
+        if not self.img_path or not self._ocr_blocks or not self._img_size:
+            return
+        img_w, img_h = self._img_size
+        sx = img_w / LayoutView.A4_SIZE.width()
+        sy = img_h / LayoutView.A4_SIZE.height()
+        rect_px = (round(rect.x() * sx), round(rect.y() * sy),
+                   round(rect.width() * sx), round(rect.height() * sy))
+        upscale = 2.0 if self.upscale_chk.isChecked() else 1.0
+        blocks, img_path, img_size = self._ocr_blocks, self.img_path, self._img_size
+        page, granularity = self.page, self.granularity
+        self._set_btns(False)
+
+        def do_region():
+            if page is not None:
+                page.wait_saved()           # crop đọc từ file đã lưu
+            new_blocks = ocr_vi_region(img_path, rect_px, upscale=upscale,
+                                       granularity=granularity)
+            merged = merge_region_blocks(blocks, new_blocks, rect_px)
+            write_boxes(img_path, merged)
+            return {"blocks": merged, "img_size": img_size, "granularity": granularity}
+
+        w = CallableWorker(do_region)
+        w.sig.done.connect(self._on_ocr_done)
+        w.sig.error.connect(self._on_error)
+        self.pool.start(w)
+
+    # ------------------------------------------------------------------
+    # Kết quả OCR chạy trước (speculative)
+    # ------------------------------------------------------------------
+    def _on_spec_ocr(self, path: Path, res: dict):
+        if (path == self.img_path and self._ocr_blocks is None
+                and res.get("granularity") == self.granularity):
+            self._waiting_spec = False
+            self._on_ocr_done(res)
+
+    def _on_spec_failed(self, path: Path, msg: str):
+        if path == self.img_path and self._waiting_spec:
+            self._waiting_spec = False
+            self._run_ocr()
+
     def _on_ocr_done(self, res: dict):
         self._ocr_blocks = res["blocks"]
         self._img_size   = res["img_size"]
-        self.layout_view.load_layout(res["blocks"], res["img_size"], self.img_path)
+        self.layout_view.load_layout(res["blocks"], res["img_size"], self.img_path,
+                                     background=self._page_pix)
         self._set_btns(True)
 
     # ---------------- Confirm → open Translator tab ------------------
@@ -116,12 +254,23 @@ class OCRTab(QWidget):
 
         from ui.translator_tab import TranslatorTab   # tránh vòng lặp import
         self._save_texts()
+        pre = self._prefetched
         new_tab = TranslatorTab(
             blocks=self._ocr_blocks,
             img_size=self._img_size,
             img_path=self.img_path,
+            spec=self.spec,
+            en_parts=pre[1] if pre and pre[0] is self._ocr_blocks else None,
         )
-        tabw.addTab(new_tab, "Translator")
+        # thay tab Translator cũ thay vì mở thêm tab mới mỗi lần Confirm
+        idx = tabw.indexOf(self._tr_tab) if self._tr_tab is not None else -1
+        if idx >= 0:
+            tabw.removeTab(idx)
+            self._tr_tab.deleteLater()
+            tabw.insertTab(idx, new_tab, "Translator")
+        else:
+            tabw.addTab(new_tab, "Translator")
+        self._tr_tab = new_tab
         tabw.setCurrentWidget(new_tab)
 
     def _find_tab_widget(self) -> QTabWidget | None:
@@ -157,3 +306,5 @@ class OCRTab(QWidget):
     def _set_btns(self, enabled: bool):
         self.ocr_btn.setEnabled(enabled)
         self.confirm_btn.setEnabled(enabled and self._ocr_blocks is not None)
+        self.region_btn.setEnabled(enabled and self._ocr_blocks is not None)
+        self.gran_cb.setEnabled(enabled)
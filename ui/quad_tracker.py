@@ -0,0 +1,103 @@
+# ui/quad_tracker.py – dò khung trang trên preview + theo dõi độ ổn định
+#
+# Chạy trong thread webcam (camera.FrameGrabber, mỗi N frame), trên ảnh đã thu
+# nhỏ về `CONFIG.detect_max_side` nên tốn vài ms / lần.
+from dataclasses import dataclass
+import threading
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+from ui.document_cropper import find_page_quad
+
+
+@dataclass(frozen=True)
+class TrackState:
+    quad: np.ndarray | None   # (4, 2) TL, TR, BR, BL – toạ độ ảnh preview
+    stable_for: float         # số giây quad đứng yên (0 nếu vừa đổi / mất)
+    sharpness: float          # phương sai Laplacian trong vùng trang
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Độ nét: phương sai Laplacian (ảnh mờ/rung → giá trị nhỏ)."""
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+class QuadTracker:
+    """Làm mượt quad theo thời gian (EMA) và đo thời gian nó đứng yên.
+
+    * Dịch chuyển góc > `jump` (tỉ lệ đường chéo) → coi là trang mới, đặt lại.
+    * Dịch chuyển > `tol` → vẫn bám theo nhưng tính lại thời gian ổn định.
+    * Mất quad quá `max_missed` lần dò liên tiếp → xoá.
+    """
+
+    def __init__(self, alpha: float = CONFIG.quad_smoothing,
+                 tol: float = CONFIG.quad_stable_tol,
+                 jump: float = 0.08, max_missed: int = 3):
+        self.alpha, self.tol, self.jump, self.max_missed = alpha, tol, jump, max_missed
+        self.quad: np.ndarray | None = None
+        self._since = 0.0
+        self._missed = 0
+
+    def reset(self):
+        self.quad = None
+        self._missed = 0
+
+    def update(self, quad: np.ndarray | None, t: float, diag: float) -> float:
+        """Cập nhật với quad vừa dò (hoặc None); trả về số giây đã ổn định."""
+        if quad is None:
+            self._missed += 1
+            if self._missed > self.max_missed:
+                self.quad = None
+            return 0.0 if self.quad is None else t - self._since
+        self._missed = 0
+
+        if self.quad is None:
+            self.quad, self._since = quad, t
+            return 0.0
+        move = float(np.linalg.norm(quad - self.quad, axis=1).max()) / max(diag, 1.0)
+        if move > self.jump:
+            self.quad, self._since = quad, t
+        else:
+            self.quad = self.quad + self.alpha * (quad - self.quad)
+            if move > self.tol:
+                self._since = t
+        return t - self._since
+
+
+class PageWatcher:
+    """Analyzer cho `FrameGrabber`: ảnh preview (BGR) → `TrackState`."""
+
+    def __init__(self, max_side: int = CONFIG.detect_max_side):
+        self.max_side = max_side
+        self.tracker = QuadTracker()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.tracker.reset()
+
+    def detect_scale(self, shape: tuple[int, ...]) -> float:
+        """Ảnh cỡ `shape` lớn gấp mấy lần ảnh dùng để dò quad (≥ 1)."""
+        return max(1.0, max(shape[:2]) / self.max_side)
+
+    def __call__(self, bgr: np.ndarray, t: float) -> TrackState:
+        h, w = bgr.shape[:2]
+        k = 1.0 / self.detect_scale(bgr.shape)
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        if k < 1.0:
+            # INTER_LINEAR: nhanh hơn INTER_AREA nhiều, Canny sau GaussianBlur không cần hơn
+            gray = cv2.resize(gray, (round(w * k), round(h * k)), interpolation=cv2.INTER_LINEAR)
+
+        quad = find_page_quad(gray)
+        sharp = 0.0
+        if quad is not None:
+            x, y, qw, qh = cv2.boundingRect(quad.astype(np.int32))
+            sharp = sharpness(gray[max(0, y):y + qh, max(0, x):x + qw])
+            quad = quad / k
+
+        with self._lock:
+            stable = self.tracker.update(quad, t, float(np.hypot(w, h)))
+            smooth = None if self.tracker.quad is None else self.tracker.quad.copy()
+        return TrackState(smooth, stable, sharp)
@@ -0,0 +1,182 @@
+# ui/session.py – phiên nhiều trang: capture → OCR → dịch chạy gối đầu
+#
+# Chụp (GUI + worker rectify) đẩy trang vào hàng đợi OCR; worker OCR xong
+# đẩy tiếp sang hàng đợi dịch. Mọi stage chạy trên event loop của `AsyncBridge`.
+#
+# Bộ nhớ: mỗi trang chờ OCR giữ ảnh gốc + bản upload trong RAM. Hàng đợi OCR
+# đầy → `acceptingChanged(False)`, GUI khoá nút chụp tới khi có chỗ; OCR xong
+# thì ảnh được bỏ khỏi RAM (`Page.release`), xem lại trang thì đọc từ file.
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import time
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import metrics
+from blocks import BlockStore, write_boxes
+from config import CONFIG
+from page import Page
+from threading_utils import AsyncBridge
+
+# trạng thái của 1 trang
+QUEUED_OCR = "queued OCR"
+OCR = "OCR…"
+QUEUED_TR = "queued translate"
+TRANSLATING = "translating…"
+DONE = "done"
+ERROR = "error"
+
+
+@dataclass(eq=False)
+class SessionPage:
+    index: int
+    page: Page
+    status: str = QUEUED_OCR
+    blocks: BlockStore | None = None
+    img_size: tuple[int, int] | None = None
+    en: list[str] | None = None
+    error: str | None = None
+    t_added: float = field(default_factory=time.perf_counter)
+    t_done: float | None = None
+    ocr_s: float | None = None
+    tr_s: float | None = None
+
+
+class DocumentSession(QObject):
+    """Danh sách trang có thứ tự + pipeline OCR/dịch với hàng đợi giới hạn."""
+
+    pageAdded = pyqtSignal(int)
+    pageChanged = pyqtSignal(int)
+    acceptingChanged = pyqtSignal(bool)     # False: hàng đợi OCR đầy, tạm ngừng chụp
+    _taken = pyqtSignal()                   # worker OCR nhận 1 trang (từ thread asyncio)
+
+    def __init__(self, *, ocr_workers: int = CONFIG.session_ocr_workers,
+                 translate_workers: int = CONFIG.session_translate_workers,
+                 queue_size: int = CONFIG.session_queue_size,
+                 translate: bool = True):
+        super().__init__()
+        self.pages: list[SessionPage] = []
+        self.granularity = CONFIG.ocr_granularity
+        self.translate = translate
+        self._bridge = AsyncBridge.instance()
+        self._ocr_q: asyncio.Queue = asyncio.Queue(queue_size)
+        self._tr_q: asyncio.Queue = asyncio.Queue(queue_size)
+        self._n_workers = (ocr_workers, translate_workers)
+        self._workers: list = []
+        self._queue_size = max(1, queue_size)
+        self._waiting = 0                   # đã add() nhưng worker OCR chưa nhận (chỉ GUI thread)
+        self._taken.connect(self._on_taken)
+
+    # ------------------------------------------------------------------
+    # Từ GUI thread
+    # ------------------------------------------------------------------
+    def accepting(self) -> bool:
+        """Còn chỗ trong hàng đợi OCR (GUI chỉ nên chụp trang mới khi True)."""
+        return self._waiting < self._queue_size
+
+    def add(self, page: Page) -> SessionPage:
+        if not self.accepting():
+            raise RuntimeError("Hàng đợi OCR đầy – chờ trang trước OCR xong")
+        if not self._workers:
+            self._start()
+        sp = SessionPage(len(self.pages), page)
+        self.pages.append(sp)
+        self.pageAdded.emit(sp.index)
+        self._count_waiting(+1)
+        # luôn còn chỗ (đã chặn ở trên) → put_nowait, không có coroutine nào phải chờ
+        self._bridge.loop.call_soon_threadsafe(self._ocr_q.put_nowait, sp)
+        return sp
+
+    def _on_taken(self):
+        self._count_waiting(-1)
+
+    def _count_waiting(self, d: int):
+        was = self.accepting()
+        self._waiting += d
+        if self.accepting() != was:
+            self.acceptingChanged.emit(not was)
+
+    def clear(self):
+        """Bắt đầu hồ sơ mới; trang cũ còn trong hàng đợi bị bỏ qua."""
+        self.pages = []
+
+    def stats(self) -> dict:
+        """Thời gian thực (từ trang đầu tới trang cuối xong) so với tổng thời gian các stage."""
+        done = [p for p in self.pages if p.t_done is not None]
+        if not done:
+            return {"pages": len(self.pages), "done": 0}
+        wall = max(p.t_done for p in done) - min(p.t_added for p in self.pages)
+        stages = sum((p.ocr_s or 0) + (p.tr_s or 0) for p in done)
+        return {"pages": len(self.pages), "done": len(done), "wall_s": wall, "stage_s": stages}
+
+    def shutdown(self):
+        for fut in self._workers:
+            fut.cancel()
+        self._workers = []
+
+    # ------------------------------------------------------------------
+    # Pipeline (chạy trên event loop của AsyncBridge)
+    # ------------------------------------------------------------------
+    def _start(self):
+        n_ocr, n_tr = self._n_workers
+        self._workers = ([self._bridge.submit(self._ocr_worker()) for _ in range(n_ocr)]
+                         + [self._bridge.submit(self._tr_worker()) for _ in range(n_tr)])
+
+    def _set(self, sp: SessionPage, status: str):
+        sp.status = status
+        if sp in self.pages:
+            self.pageChanged.emit(sp.index)
+
+    async def _ocr_worker(self):
+        from ocr import ocr_vi_page     # import muộn: tạo client Vision khi cần
+
+        while True:
+            sp = await self._ocr_q.get()
+            self._taken.emit()
+            try:
+                if sp in self.pages:
+                    self._set(sp, OCR)
+                    t0 = time.perf_counter()
+                    blocks, img_size = await asyncio.to_thread(
+                        ocr_vi_page, sp.page, granularity=self.granularity)
+                    await asyncio.to_thread(write_boxes, sp.page.path, blocks)
+                    sp.ocr_s = time.perf_counter() - t0
+                    sp.blocks, sp.img_size = blocks, img_size
+                    # đã có file + kết quả OCR → không giữ ảnh gốc/upload trong RAM nữa
+                    await asyncio.to_thread(sp.page.release)
+                    if self.translate and any(blocks.texts()):
+                        self._set(sp, QUEUED_TR)
+                        await self._tr_q.put(sp)
+                    else:
+                        sp.t_done = time.perf_counter()
+                        self._set(sp, DONE)
+            except Exception as e:
+                self._fail(sp, "OCR", e)
+            finally:
+                self._ocr_q.task_done()
+
+    async def _tr_worker(self):
+        from services import groq_service
+
+        while True:
+            sp = await self._tr_q.get()
+            try:
+                if sp in self.pages:
+                    self._set(sp, TRANSLATING)
+                    t0 = time.perf_counter()
+                    with metrics.page_scope(sp.page.path.stem):
+                        sp.en = await groq_service().translate_blocks(sp.blocks.texts())
+                    sp.tr_s = time.perf_counter() - t0
+                    sp.t_done = time.perf_counter()
+                    self._set(sp, DONE)
+            except Exception as e:
+                self._fail(sp, "translate", e)
+            finally:
+                self._tr_q.task_done()
+
+    def _fail(self, sp: SessionPage, stage: str, e: Exception):
+        logging.error("Page %d %s failed: %s", sp.index + 1, stage, e)
+        sp.error = f"{stage}: {e}"
+        sp.t_done = time.perf_counter()
+        self._set(sp, ERROR)
@@ -0,0 +1,147 @@
+# ui/session_tab.py – bảng trạng thái từng trang của phiên nhiều trang
+from PyQt5.QtWidgets import (
+    QWidget,
+    QLabel,
+    QPushButton,
+    QVBoxLayout,
+    QHBoxLayout,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+    QFileDialog,
+    QMessageBox,
+)
+from PyQt5.QtGui import QColor
+from PyQt5.QtCore import QThreadPool, pyqtSignal
+
+from config import CAPTURE_DIR
+from threading_utils import CallableWorker
+from ui.session import DONE, ERROR, DocumentSession, SessionPage
+
+_COLS = ["#", "File", "Status", "Blocks", "OCR s", "Translate s"]
+_COLORS = {DONE: QColor(200, 240, 200), ERROR: QColor(250, 200, 200)}
+
+
+class SessionTab(QWidget):
+    """Mỗi dòng = 1 trang; double-click để mở trang đó ở tab OCR."""
+
+    pageOpened = pyqtSignal(object)     # SessionPage
+
+    def __init__(self, session: DocumentSession):
+        super().__init__()
+        self.session = session
+
+        self.table = QTableWidget(0, len(_COLS))
+        self.table.setHorizontalHeaderLabels(_COLS)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+
+        self.summary_lbl = QLabel("No pages")
+        self.new_btn = QPushButton("New document")
+        self.pdf_btn = QPushButton("Export PDF…")
+
+        top = QHBoxLayout()
+        top.addWidget(self.summary_lbl, 1)
+        top.addWidget(self.pdf_btn)
+        top.addWidget(self.new_btn)
+
+        lay = QVBoxLayout(self)
+        lay.addLayout(top)
+        lay.addWidget(self.table, 1)
+
+        session.pageAdded.connect(self._on_added)
+        session.pageChanged.connect(self._refresh_row)
+        self.new_btn.clicked.connect(self._new_document)
+        self.pdf_btn.clicked.connect(self._export_pdf)
+        self.table.cellDoubleClicked.connect(self._open_row)
+
+    # ------------------------------------------------------------------
+    def _on_added(self, idx: int):
+        self.table.insertRow(idx)
+        self._refresh_row(idx)
+        self.table.scrollToBottom()
+
+    def _refresh_row(self, idx: int):
+        if idx >= len(self.session.pages):
+            return
+        sp = self.session.pages[idx]
+        fmt = lambda v: "" if v is None else f"{v:.1f}"
+        vals = [str(idx + 1), sp.page.path.name,
+                sp.error if sp.status == ERROR else sp.status,
+                "" if sp.blocks is None else str(len(sp.blocks)),
+                fmt(sp.ocr_s), fmt(sp.tr_s)]
+        color = _COLORS.get(sp.status)
+        for c, v in enumerate(vals):
+            item = QTableWidgetItem(v)
+            if color is not None:
+                item.setBackground(color)
+            self.table.setItem(idx, c, item)
+        self._update_summary()
+
+    def _update_summary(self):
+        st = self.session.stats()
+        if not st["pages"]:
+            self.summary_lbl.setText("No pages")
+        elif not st["done"]:
+            self.summary_lbl.setText(f"{st['pages']} pages")
+        else:
+            self.summary_lbl.setText(
+                f"{st['done']}/{st['pages']} pages done | wall {st['wall_s']:.0f} s"
+                f" | stages {st['stage_s']:.0f} s"
+            )
+
+    def _new_document(self):
+        self.session.clear()
+        self.table.setRowCount(0)
+        self._update_summary()
+
+    def _open_row(self, row: int, _col: int):
+        if row < len(self.session.pages):
+            sp: SessionPage = self.session.pages[row]
+            self.pageOpened.emit(sp)
+
+    # ------------------------------------------------------------------
+    # Xuất PDF: các trang đã dịch xong, theo thứ tự chụp
+    # ------------------------------------------------------------------
+    def _export_pdf(self):
+        pages = [sp for sp in self.session.pages if sp.status == DONE and sp.en is not None]
+        if not pages:
+            QMessageBox.warning(self, "Warning", "No translated pages yet.")
+            return
+        out, _ = QFileDialog.getSaveFileName(self, "Export PDF",
+                                             str(CAPTURE_DIR / "document.pdf"), "PDF (*.pdf)")
+        if not out:
+            return
+        skipped = len(self.session.pages) - len(pages)
+
+        def do_export():
+            from pdf_export import ExportPage, export_pdf   # import muộn: reportlab + font
+
+            def gen():
+                for sp in pages:
+                    sp.page.wait_saved()    # nền đọc từ JPEG đã lưu, không giữ ảnh trong RAM
+                    yield ExportPage(sp.blocks.with_text(sp.en), sp.img_size, sp.page.path)
+
+            return export_pdf(gen(), out)
+
+        self.pdf_btn.setEnabled(False)
+        w = CallableWorker(do_export)
+        w.sig.done.connect(lambda st: self._on_pdf_done(out, st, skipped))
+        w.sig.error.connect(self._on_pdf_error)
+        QThreadPool.globalInstance().start(w)
+
+    def _on_pdf_done(self, out: str, st: dict, skipped: int):
+        self.pdf_btn.setEnabled(True)
+        msg = (f"{st['pages']} pages → {out}\n"
+               f"{st['page_ms_avg']:.0f} ms/page (max {st['page_ms_max']:.0f} ms), "
+               f"write {st['save_ms']:.0f} ms, {st['bytes'] / 1e6:.1f} MB")
+        if skipped:
+            msg += f"\n{skipped} page(s) not translated yet were skipped."
+        QMessageBox.information(self, "PDF exported", msg)
+
+    def _on_pdf_error(self, msg: str):
+        self.pdf_btn.setEnabled(True)
+        QMessageBox.critical(self, "Error", msg)
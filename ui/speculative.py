@@ -0,0 +1,126 @@
+# ui/speculative.py – chạy trước OCR + dịch ngay sau khi chụp
+from pathlib import Path
+import logging
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal
+
+from blocks import BlockStore, write_boxes
+from config import CONFIG
+from ocr import ocr_vi_page
+from page import Page
+from services import translate_blocks_async
+from threading_utils import AsyncBridge, CallableWorker
+
+
+class SpeculativeRunner(QObject):
+    """OCR trang vừa chụp ở background, OCR xong thì dịch luôn.
+
+    * Kết quả được giữ lại để OCRTab/TranslatorTab lấy ngay khi user tới.
+    * Chụp trang mới → tăng `generation`, mọi kết quả của lần trước bị bỏ;
+      request dịch đang bay bị huỷ, `_boxes.json` chỉ ghi cho kết quả còn hiệu lực.
+    """
+
+    ocrReady = pyqtSignal(object, dict)          # (img_path, {"blocks", "img_size", "granularity"})
+    translationReady = pyqtSignal(object, list)  # (img_path, list bản dịch theo block)
+    failed = pyqtSignal(object, str)             # (img_path, lỗi)
+
+    def __init__(self, pool: QThreadPool | None = None):
+        super().__init__()
+        self.enabled = CONFIG.speculative
+        self.granularity = CONFIG.ocr_granularity   # OCRTab đổi theo lựa chọn của user
+        self.pool = pool or QThreadPool.globalInstance()
+        self._gen = 0
+        self._path: Path | None = None
+        self._ocr: dict | None = None
+        self._en: list[str] | None = None
+        self._ocr_pending = False
+        self._task = None                           # AsyncTask dịch đang chạy
+
+    # ------------------------------------------------------------------
+    def set_enabled(self, on: bool):
+        self.enabled = on
+        if not on:
+            self.discard()
+
+    def start(self, page: Page):
+        self.discard()
+        if not self.enabled:
+            return
+        img_path = page.path
+        self._path = img_path
+        self._ocr_pending = True
+        gen = self._gen
+        granularity = self.granularity
+
+        def do_ocr():
+            # chưa ghi _boxes ở đây: lần chạy này có thể bị bỏ trước khi xong
+            blocks, img_size = ocr_vi_page(page, granularity=granularity)
+            return {"blocks": blocks, "img_size": img_size, "granularity": granularity}
+
+        w = CallableWorker(do_ocr)
+        w.sig.done.connect(lambda res: self._on_ocr(gen, res))
+        w.sig.error.connect(lambda msg: self._on_error(gen, msg))
+        self.pool.start(w)
+        logging.info("Speculative OCR started for %s", img_path.name)
+
+    def discard(self):
+        """Bỏ mọi kết quả; huỷ request dịch đang bay (worker OCR cũ chạy nốt nhưng bị bỏ qua)."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._gen += 1
+        self._path = self._ocr = self._en = None
+        self._ocr_pending = False
+
+    # ------------------------------------------------------------------
+    # Truy vấn từ các tab
+    # ------------------------------------------------------------------
+    def ocr_pending(self, img_path: Path | None) -> bool:
+        return self._ocr_pending and img_path == self._path
+
+    def ocr_result(self, img_path: Path | None) -> dict | None:
+        return self._ocr if img_path == self._path else None
+
+    def translation_for(self, img_path: Path | None, blocks: BlockStore) -> list[str] | None:
+        """Bản dịch đã chạy trước – chỉ khi đúng ảnh và đúng bộ block đó."""
+        if img_path != self._path or self._ocr is None or self._en is None:
+            return None
+        return self._en if blocks is self._ocr["blocks"] else None
+
+    # ------------------------------------------------------------------
+    def _on_ocr(self, gen: int, res: dict):
+        if gen != self._gen:
+            return
+        self._ocr_pending = False
+        self._ocr = res
+        try:
+            write_boxes(self._path, res["blocks"])
+        except OSError as e:
+            logging.warning("Không ghi được boxes của %s: %s", self._path.name, e)
+        self.ocrReady.emit(self._path, res)
+
+        texts = res["blocks"].texts()
+        if not any(texts):
+            return
+
+        self._task = AsyncBridge.instance().run(
+            translate_blocks_async(texts, self._path.stem),
+            on_done=lambda parts: self._on_translated(gen, parts),
+            on_error=lambda msg: self._on_error(gen, msg),
+        )
+
+    def _on_translated(self, gen: int, parts: list):
+        if gen != self._gen:
+            return
+        self._task = None
+        self._en = parts
+        self.translationReady.emit(self._path, parts)
+        logging.info("Speculative translation ready for %s", self._path.name)
+
+    def _on_error(self, gen: int, msg: str):
+        if gen != self._gen:
+            return
+        logging.warning("Speculative run failed: %s", msg)
+        self._task = None
+        self._ocr_pending = False
+        self.failed.emit(self._path, msg)
@@ -0,0 +1,64 @@
+# ui/tm_dialog.py – xem + chọn bản dịch gần đúng từ TM cho từng block
+from __future__ import annotations
+
+from PyQt5.QtWidgets import (
+    QDialog,
+    QDialogButtonBox,
+    QLabel,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+from PyQt5.QtCore import Qt
+
+from translation_memory import TMMatch
+
+
+class TMSuggestionsDialog(QDialog):
+    """Bảng: block | câu Việt | câu gần đúng trong TM | điểm | bản dịch TM | bản dịch hiện tại.
+
+    Chỉ các dòng được tick mới thay vào bản Anh (mặc định không tick dòng nào).
+    """
+
+    COLS = ("Block", "Vietnamese", "TM source", "Score", "TM translation", "Current")
+
+    def __init__(self, suggestions: dict[int, TMMatch], texts: dict[int, str],
+                 current: dict[int, str], parent=None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle("TM suggestions")
+        self.resize(900, 400)
+        self._order = sorted(suggestions)
+        self._suggestions = suggestions
+
+        self.table = QTableWidget(len(self._order), len(self.COLS))
+        self.table.setHorizontalHeaderLabels(self.COLS)
+        self.table.setWordWrap(True)
+        for row, idx in enumerate(self._order):
+            m = suggestions[idx]
+            cells = (str(idx), texts.get(idx, ""), m.source, f"{m.score:.2f}",
+                     m.target, current.get(idx, ""))
+            for col, val in enumerate(cells):
+                it = QTableWidgetItem(val)
+                it.setFlags(it.flags() & ~Qt.ItemIsEditable)
+                self.table.setItem(row, col, it)
+            self.table.item(row, 0).setFlags(
+                self.table.item(row, 0).flags() | Qt.ItemIsUserCheckable)
+            self.table.item(row, 0).setCheckState(Qt.Unchecked)
+        self.table.resizeColumnsToContents()
+        self.table.resizeRowsToContents()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("Use selected")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        lay = QVBoxLayout(self)
+        lay.addWidget(QLabel("Câu gần giống đã dịch trước đây – tick để dùng bản dịch trong TM:"))
+        lay.addWidget(self.table, 1)
+        lay.addWidget(buttons)
+
+    def selected(self) -> dict[int, str]:
+        """{chỉ số block: bản dịch TM} của các dòng được tick."""
+        return {idx: self._suggestions[idx].target
+                for row, idx in enumerate(self._order)
+                if self.table.item(row, 0).checkState() == Qt.Checked}
@@ -1,6 +1,8 @@
 # ui/translator_tab.py
 from __future__ import annotations
 
+import logging
+import time
 import unicodedata
 from pathlib import Path
 from typing import List, Tuple
@@ -12,13 +14,24 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QPushButton,
     QMessageBox,
+    QFileDialog,
     QGraphicsTextItem,          # ← đúng module
 )
-from PyQt5.QtCore import QThreadPool, Qt
+from PyQt5.QtCore import Qt, QObject, QThreadPool, pyqtSignal
 from PyQt5.QtGui  import QFont
-from threading_utils import CallableWorker
-from translator      import translate_vi2en
+from threading_utils import AsyncBridge, CallableWorker
+from services        import translate_blocks_async
+from translator      import tm_suggestions
 from ui.layout_view  import LayoutView
+from ui.tm_dialog    import TMSuggestionsDialog
+from blocks          import BlockStore
+from config          import CONFIG
+
+PENDING_TEXT = "…"
+
+
+class _StreamSignals(QObject):
+    block = pyqtSignal(int, int, str)   # (lượt dịch, chỉ số block, bản dịch) – từ thread asyncio
 
 
 class TranslatorTab(QWidget):
@@ -28,9 +41,11 @@ class TranslatorTab(QWidget):
     def __init__(
         self,
         *,
-        blocks: List[dict],
+        blocks: BlockStore,
         img_size: Tuple[int, int],
         img_path: Path | str,
+        spec=None,
+        en_parts: List[str] | None = None,
     ) -> None:
         super().__init__()
 
@@ -48,8 +63,43 @@ class TranslatorTab(QWidget):
         self.trans_btn.setShortcut("Ctrl+T")
         self.trans_btn.clicked.connect(self._translate)
 
+        # bản dịch stream về từng block; Cancel bỏ phần còn lại
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setShortcut("Esc")
+        self.cancel_btn.hide()
+        self.cancel_btn.clicked.connect(self._cancel)
+        self._stream_sig = _StreamSignals()
+        self._stream_sig.block.connect(self._on_stream_block)
+        self._run = 0                       # tăng mỗi lượt dịch / khi huỷ → bỏ block đến muộn
+        self._pending: set[int] = set()     # block đang chờ bản dịch
+        self._sent: dict[int, str] = {}     # text Việt của lượt đang stream
+
+        # re-translate: chỉ các block đã sửa/di chuyển
+        self.retrans_btn = QPushButton("Re-translate edited")
+        self.retrans_btn.setShortcut("Ctrl+Shift+T")
+        self.retrans_btn.setEnabled(False)
+        self.retrans_btn.clicked.connect(self._retranslate_dirty)
+        self.vi_view.dirtyChanged.connect(self._on_dirty_changed)
+        self._en_loaded = False
+
+        # xuất trang đang xem (bản Anh, kể cả block đã kéo đi) ra PDF
+        self.pdf_btn = QPushButton("Export PDF…")
+        self.pdf_btn.setEnabled(False)
+        self.pdf_btn.clicked.connect(self._export_pdf)
+        self._busy = False
+
+        # bản dịch gần đúng trong TM: chỉ gợi ý, user chọn mới thay vào bản Anh
+        self.tm_btn = QPushButton("TM suggestions")
+        self.tm_btn.hide()
+        self.tm_btn.clicked.connect(self._show_suggestions)
+        self._suggestions: dict = {}
+        self._suggest_texts: dict[int, str] = {}
+
         # layout
-        top = QHBoxLayout(); top.addStretch(); top.addWidget(self.trans_btn)
+        top = QHBoxLayout(); top.addStretch()
+        top.addWidget(self.tm_btn)
+        top.addWidget(self.pdf_btn); top.addWidget(self.retrans_btn)
+        top.addWidget(self.cancel_btn); top.addWidget(self.trans_btn)
 
         left  = QVBoxLayout(); left.addWidget(QLabel("Vietnamese OCR:"))
         left.addWidget(self.vi_view, 1)
@@ -61,46 +111,243 @@ class TranslatorTab(QWidget):
 
         root = QVBoxLayout(self); root.addLayout(top); root.addLayout(panes, 1)
 
-        self.pool = QThreadPool.globalInstance()
+        self._task = None                   # AsyncTask đang chạy (nếu có)
+
+        # bản dịch chạy trước (speculative): có rồi thì hiện ngay, chưa thì chờ
+        self._img_path = Path(img_path)
+        self._spec = spec
+        if en_parts is not None:            # đã dịch sẵn (phiên nhiều trang)
+            self._attach_prefetched(en_parts)
+        elif spec is not None:
+            parts = spec.translation_for(self._img_path, blocks)
+            if parts is not None:
+                self._attach_prefetched(parts)
+            else:
+                spec.translationReady.connect(self._on_spec_translation)
 
     # ------------------------------------------------------------------
-    # TRANSLATE: dịch toàn bộ văn bản (sau khi user đã chỉnh)
+    # TRANSLATE: dịch toàn bộ văn bản (lấy text đang hiển thị, kể cả phần user đã sửa)
     # ------------------------------------------------------------------
     def _translate(self) -> None:
-        texts = [blk["text"].strip() for blk in self._blocks_orig]
+        cur = self.vi_view.block_texts()
+        texts = [cur.get(i, "") for i in range(len(self._blocks_orig))]
         if not any(texts):
             QMessageBox.warning(self, "Warning", "No Vietnamese text!")
             return
 
-        joined = " ### ".join(texts)
-
         self._set_busy(True)
-        worker = CallableWorker(translate_vi2en, joined)
-        worker.sig.done.connect(self._show_en_blocks)
-        worker.sig.error.connect(self._show_err)        # slot đã có
-        self.pool.start(worker)
+        self.tm_btn.hide()
+        sent = self._sent = dict(enumerate(texts))
+        # khung bản Anh hiện ngay; block chờ bản dịch để "…" màu xám, điền dần khi stream về
+        self._render_en([PENDING_TEXT if t.strip() else "" for t in texts])
+        self._pending = {i for i, t in sent.items() if t.strip()}
+        for i in self._pending:
+            self.en_view.set_block_text(i, PENDING_TEXT, pending=True)
+        self._run += 1
+        run = self._run
+        self._t0, self._first_ms = time.perf_counter(), None
+        self._update_cancel()
+        self.cancel_btn.show()
+        self._task = AsyncBridge.instance().run(
+            translate_blocks_async(texts, self._img_path.stem,
+                                   on_block=lambda i, en: self._stream_sig.block.emit(run, i, en)),
+            on_done=lambda parts: self._finish_stream(run, parts),
+            on_error=lambda msg: self._stream_failed(run, msg),
+        )
 
     # ------------------------------------------------------------------
     # HIỂN THỊ English theo đúng vị trí box gốc (readonly)
     # ------------------------------------------------------------------
-    def _show_en_blocks(self, full_en: str) -> None:
-        parts = [p.strip().replace("*", "") for p in full_en.split(" ### ")]
-        if len(parts) < len(self._blocks_orig):
-            parts += [""] * (len(self._blocks_orig) - len(parts))
-
-        blocks_en = []
-        for blk, en_txt in zip(self._blocks_orig, parts):
-            new_blk = dict(blk)
-            new_blk["text"] = en_txt
-            blocks_en.append(new_blk)
-
+    def _render_en(self, parts: List[str]) -> None:
         self.en_view.load_layout(
-            blocks   = blocks_en,
+            blocks   = self._blocks_orig.with_text(parts),
             img_size = self._img_size,
             img_path = None,            # không cần nền ảnh
         )
+
+        # block đã bị kéo đi ở bản Việt → đặt bản Anh theo vị trí mới
+        for idx in self.vi_view.dirty_blocks():
+            geo = self.vi_view.block_geometry(idx)
+            if geo and idx < len(parts):
+                self.en_view.set_block(idx, parts[idx], *geo)
+
+    def _show_en_blocks(self, parts_en: List[str], sent: dict[int, str]) -> None:
+        self._render_en([p.replace("*", "") for p in parts_en])
+        self._en_loaded = True
+        self._clear_sent_dirty(sent)
+        self._set_busy(False)
+
+    # ------------------------------------------------------------------
+    # STREAM: block nào dịch xong thì điền ngay vào bản Anh
+    # ------------------------------------------------------------------
+    def _on_stream_block(self, run: int, idx: int, en: str) -> None:
+        if run != self._run or idx not in self._pending:
+            return
+        self._pending.discard(idx)
+        self.en_view.set_block_text(idx, en.replace("*", ""))
+        if self._first_ms is None:
+            self._first_ms = (time.perf_counter() - self._t0) * 1000
+        self._update_cancel()
+
+    def _finish_stream(self, run: int, parts_en: List[str]) -> None:
+        if run != self._run:
+            return
+        for idx in sorted(self._pending):           # phòng khi block nào không đi qua stream
+            if idx < len(parts_en):
+                self.en_view.set_block_text(idx, parts_en[idx].replace("*", ""))
+        self._pending.clear()
+        logging.info("Bản dịch: block đầu sau %.0f ms, xong sau %.0f ms",
+                     self._first_ms or 0.0, (time.perf_counter() - self._t0) * 1000)
+        self._end_stream()
+
+    def _stream_failed(self, run: int, msg: str) -> None:
+        if run != self._run:
+            return
+        self._end_stream()
+        self._show_err(msg)
+
+    def _cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._run += 1                               # block còn trong hàng đợi signal bị bỏ qua
+        logging.info("Huỷ dịch: %d block chưa có bản dịch", len(self._pending))
+        self._end_stream()
+
+    def _end_stream(self) -> None:
+        """Block chưa có bản dịch để trống; block đã dịch thì hết dirty."""
+        for idx in self._pending:
+            self.en_view.set_block_text(idx, "")
+        done = {i: t for i, t in self._sent.items() if i not in self._pending}
+        self._en_loaded = self._en_loaded or any(t.strip() for t in done.values())
+        self._pending.clear()
+        self.cancel_btn.hide()
+        self._clear_sent_dirty(done)
+        self._set_busy(False)
+        self._find_suggestions(done)
+
+    def _update_cancel(self) -> None:
+        self.cancel_btn.setText(f"Cancel ({len(self._pending)} left)")
+
+    def _attach_prefetched(self, parts: List[str]) -> None:
+        self._show_en_blocks(parts, dict(enumerate(self._blocks_orig.texts())))
+
+    def _on_spec_translation(self, path, parts: list) -> None:
+        if self._en_loaded or self._busy or self.vi_view.dirty_blocks():
+            return
+        if self._spec.translation_for(self._img_path, self._blocks_orig) is parts:
+            self._attach_prefetched(parts)
+
+    # ------------------------------------------------------------------
+    # RE-TRANSLATE: chỉ gửi các block dirty, vá bản Anh tại chỗ
+    # ------------------------------------------------------------------
+    def _retranslate_dirty(self) -> None:
+        if not self._en_loaded:
+            self._translate()
+            return
+        cur = self.vi_view.block_texts()
+        sent = {i: cur.get(i, "") for i in self.vi_view.dirty_blocks()}
+        if not sent:
+            return
+
+        self._set_busy(True)
+        self._task = AsyncBridge.instance().run(
+            translate_blocks_async(list(sent.values()), self._img_path.stem),
+            on_done=lambda parts: self._patch_en_blocks(parts, sent),
+            on_error=self._show_err,
+        )
+
+    def _patch_en_blocks(self, parts_en: List[str], sent: dict[int, str]) -> None:
+        for idx, en_txt in zip(sent, parts_en):
+            geo = self.vi_view.block_geometry(idx)
+            if geo:
+                self.en_view.set_block(idx, en_txt.replace("*", ""), *geo)
+        self._clear_sent_dirty(sent)
         self._set_busy(False)
 
+    def _clear_sent_dirty(self, sent: dict[int, str]) -> None:
+        # block bị sửa tiếp trong lúc đang dịch thì vẫn giữ dirty
+        cur = self.vi_view.block_texts()
+        self.vi_view.clear_dirty([i for i, t in sent.items() if cur.get(i, "") == t])
+
+    def _on_dirty_changed(self, n: int) -> None:
+        self.retrans_btn.setText(f"Re-translate edited ({n})" if n else "Re-translate edited")
+        self.retrans_btn.setEnabled(bool(n) and not self._busy)
+
+    # ------------------------------------------------------------------
+    # TM SUGGESTIONS: tìm trong worker (SQLite + SequenceMatcher), hiện khi user bấm
+    # ------------------------------------------------------------------
+    def _find_suggestions(self, sent: dict[int, str]) -> None:
+        self._suggestions = {}
+        self.tm_btn.hide()
+        sent = {i: t for i, t in sent.items() if t.strip()}
+        if not CONFIG.tm_suggest or not sent:
+            return
+        run, idx = self._run, list(sent)
+        w = CallableWorker(lambda: tm_suggestions(list(sent.values())))
+        w.sig.done.connect(lambda res: self._on_suggestions(
+            run, sent, {idx[k]: m for k, m in res.items()}))
+        w.sig.error.connect(lambda msg: logging.warning("TM suggestions: %s", msg))
+        QThreadPool.globalInstance().start(w)
+
+    def _on_suggestions(self, run: int, sent: dict[int, str], found: dict) -> None:
+        if run != self._run:
+            return
+        cur = self.en_view.block_texts()
+        # bản TM trùng bản dịch đang hiện thì không cần gợi ý
+        self._suggestions = {i: m for i, m in found.items() if m.target != cur.get(i)}
+        self._suggest_texts = sent
+        self.tm_btn.setText(f"TM suggestions ({len(self._suggestions)})")
+        self.tm_btn.setVisible(bool(self._suggestions))
+
+    def _show_suggestions(self) -> None:
+        dlg = TMSuggestionsDialog(self._suggestions, self._suggest_texts,
+                                  self.en_view.block_texts(), self)
+        if not dlg.exec_():
+            return
+        chosen = dlg.selected()
+        for idx, en in chosen.items():
+            self.en_view.set_block_text(idx, en.replace("*", ""))
+            self._suggestions.pop(idx, None)
+        self.tm_btn.setText(f"TM suggestions ({len(self._suggestions)})")
+        self.tm_btn.setVisible(bool(self._suggestions))
+
+    # ------------------------------------------------------------------
+    # EXPORT PDF: vị trí lấy từ canvas English (pt → px ảnh gốc)
+    # ------------------------------------------------------------------
+    def _export_pdf(self) -> None:
+        out, _ = QFileDialog.getSaveFileName(self, "Export PDF",
+                                             str(self._img_path.with_suffix(".pdf")), "PDF (*.pdf)")
+        if not out:
+            return
+        img_w, img_h = self._img_size
+        sx = LayoutView.A4_SIZE.width() / img_w
+        sy = LayoutView.A4_SIZE.height() / img_h
+        box = self._blocks_orig.box.copy()
+        text = [""] * len(box)
+        for idx, txt in self.en_view.block_texts().items():
+            geo = self.en_view.block_geometry(idx)
+            if geo is None or idx >= len(box):
+                continue
+            pos, width = geo
+            box[idx, :3] = round(pos.x() / sx), round(pos.y() / sy), round(width / sx)
+            text[idx] = txt
+        blocks = BlockStore(box, text, words=self._blocks_orig.words)
+
+        def do_export():
+            from pdf_export import ExportPage, export_pdf   # import muộn: reportlab + font
+            return export_pdf([ExportPage(blocks, self._img_size, self._img_path)], out)
+
+        self.pdf_btn.setEnabled(False)
+        w = CallableWorker(do_export)
+        w.sig.done.connect(lambda st: self._on_pdf_done(out, st))
+        w.sig.error.connect(self._show_err)
+        QThreadPool.globalInstance().start(w)
+
+    def _on_pdf_done(self, out: str, st: dict) -> None:
+        self.pdf_btn.setEnabled(True)
+        QMessageBox.information(self, "PDF exported",
+                                f"{out}\n{st['total_s'] * 1000:.0f} ms, {st['bytes'] / 1e6:.1f} MB")
+
     # ------------------------------------------------------------------
     # ERROR handler
     # ------------------------------------------------------------------
@@ -110,4 +357,7 @@ class TranslatorTab(QWidget):
 
     # ------------------------------------------------------------------
     def _set_busy(self, busy: bool) -> None:
+        self._busy = busy
         self.trans_btn.setEnabled(not busy)
+        self.pdf_btn.setEnabled(not busy and self._en_loaded)
+        self.retrans_btn.setEnabled(not busy and bool(self.vi_view.dirty_blocks()))